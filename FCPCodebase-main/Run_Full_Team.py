@@ -3,11 +3,18 @@ script = Script() # Initialize: load config file, parse arguments, build cpp mod
 a = script.args
 
 from agent.Agent import Agent
+from scripts.commons.Event_Loop import Event_Loop
+import os
 
 # Args: Server IP, Agent Port, Monitor Port, Uniform No., Team name, Enable Log, Enable Draw
 team_args = ((a.i, a.p, a.m, u, a.t, True, True) for u in range(1,12))
 script.batch_create(Agent,team_args)
 
-while True:
-    script.batch_execute_agent()
-    script.batch_receive()
+# Optional batched inference (environment variable FCP_INFERENCE_BROKER=1, default: 0): the neural networks of all
+# agents that are ready at the same time run in batches (less CPU time), but each agent's command is only sent
+# after all of them have thought (more latency), see Inference_Broker
+if os.environ.get("FCP_INFERENCE_BROKER", "0") == "1":
+    script.batch_enable_inference_broker()
+
+# Process each agent as soon as its message arrives (see Event_Loop), reporting queueing delays every 10s
+Event_Loop(script.players, 10).run()
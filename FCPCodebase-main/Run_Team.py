@@ -0,0 +1,35 @@
+from time import perf_counter
+start_time = perf_counter()
+
+from scripts.commons.Script import Script
+script = Script() # Initialize: load config file, parse arguments, build cpp modules (once for the whole team)
+a = script.args
+
+if a.P: # penalty shootout
+    from agent.Agent_Penalty import Agent
+else: # normal agent
+    from agent.Agent import Agent
+
+from scripts.commons.Team_Launcher import Team_Launcher
+import os
+
+# Worker configuration (environment variables):
+#   FCP_AGENTS_PER_WORKER - number of agents per worker process (default: 1)
+#   FCP_CORES             - comma-separated list of CPU cores to which workers are pinned, round-robin (default: no pinning)
+#   FCP_INFERENCE_BROKER  - 1 to run the neural networks of the agents of each worker in batches (default: 0),
+#                           which saves CPU time but delays each command until all ready agents have thought (see Inference_Broker)
+agents_per_worker = int(os.environ.get("FCP_AGENTS_PER_WORKER", 1))
+cores = [int(c) for c in os.environ["FCP_CORES"].split(",")] if os.environ.get("FCP_CORES") else None
+inference_broker = os.environ.get("FCP_INFERENCE_BROKER", "0") == "1"
+
+unums = (1,11) if a.P else range(1,12) # penalty shootout: goalkeeper and kicker
+
+# Args: Server IP, Agent Port, Monitor Port, Uniform No., Team name, Enable Log, Enable Draw, Wait for Server, is magmaFatProxy
+if a.D: # debug mode
+    team_args = [(a.i, a.p, a.m, u, a.t, True, True, False, a.F) for u in unums]
+else:
+    team_args = [(a.i, a.p, None, u, a.t, False, False, False, a.F) for u in unums]
+
+launcher = Team_Launcher(Agent, agents_per_worker, cores, start_time, inference_broker)
+launcher.preload()
+launcher.launch(team_args, 10 if a.D else None)
@@ -143,23 +143,19 @@ class Agent(Base_Agent):
 
         slow_ball_pos = w.get_predicted_ball_pos(0.5) # predicted future 2D ball position when ball speed <= 0.5 m/s
 
-        # list of squared distances between teammates (including self) and slow ball (sq distance is set to 1000 in some conditions)
-        teammates_ball_sq_dist = [np.sum((p.state_abs_pos[:2] - slow_ball_pos) ** 2)  # squared distance between teammate and ball
-                                  if p.state_last_update != 0 and (w.time_local_ms - p.state_last_update <= 360 or p.is_self) and not p.state_fallen
-                                  else 1000 # force large distance if teammate does not exist, or its state info is not recent (360 ms), or it has fallen
-                                  for p in w.teammates ]
+        # squared distances between all players (teammates including self, and opponents) and slow ball (sq distance is set to 1000 in some conditions)
+        players = w.players_state
+        players_ball_sq_dist = players.get_sq_dist_2d(slow_ball_pos)
+        is_valid = (players.last_update != 0) & ((w.time_local_ms - players.last_update <= 360) | players.is_self) & ~players.fallen
+        players_ball_sq_dist[~is_valid] = 1000 # force large distance if player does not exist, or its state info is not recent (360 ms), or it has fallen
+        teammates_ball_sq_dist = players_ball_sq_dist[players.TEAMMATES]
+        opponents_ball_sq_dist = players_ball_sq_dist[players.OPPONENTS]
 
-        # list of squared distances between opponents and slow ball (sq distance is set to 1000 in some conditions)
-        opponents_ball_sq_dist = [np.sum((p.state_abs_pos[:2] - slow_ball_pos) ** 2)  # squared distance between teammate and ball
-                                  if p.state_last_update != 0 and w.time_local_ms - p.state_last_update <= 360 and not p.state_fallen
-                                  else 1000 # force large distance if opponent does not exist, or its state info is not recent (360 ms), or it has fallen
-                                  for p in w.opponents ]
+        active_player_idx = np.argmin(teammates_ball_sq_dist)
+        self.min_teammate_ball_dist = math.sqrt(teammates_ball_sq_dist[active_player_idx]) # distance between ball and closest teammate
+        self.min_opponent_ball_dist = math.sqrt(np.min(opponents_ball_sq_dist))           # distance between ball and closest opponent
 
-        min_teammate_ball_sq_dist = min(teammates_ball_sq_dist)
-        self.min_teammate_ball_dist = math.sqrt(min_teammate_ball_sq_dist)   # distance between ball and closest teammate
-        self.min_opponent_ball_dist = math.sqrt(min(opponents_ball_sq_dist)) # distance between ball and closest opponent
-
-        active_player_unum = teammates_ball_sq_dist.index(min_teammate_ball_sq_dist) + 1
+        active_player_unum = int(active_player_idx) + 1
 
 
         #--------------------------------------- 2. Decide action
@@ -215,7 +211,7 @@ class Agent(Base_Agent):
         
         #--------------------------------------- 4. Send to server
         if self.fat_proxy_cmd is None: # normal behavior
-            self.scom.commit_and_send( r.get_command() )
+            self.send_robot_command()
         else: # fat proxy behavior
             self.scom.commit_and_send( self.fat_proxy_cmd.encode() ) 
             self.fat_proxy_cmd = ""
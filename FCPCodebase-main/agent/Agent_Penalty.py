@@ -73,7 +73,7 @@ class Agent(Base_Agent):
         self.communicator.broadcast()
 
         #--------------------------------------- 3. Send to server
-        self.scom.commit_and_send( r.get_command() )
+        self.send_robot_command()
 
         #---------------------- annotations for debugging
         if self.enable_draw: 
@@ -31,6 +31,15 @@ class Base_Agent():
         pass
         
 
+    def send_robot_command(self):
+        ''' Commit robot command and send it to the server (deferred until the inference broker is flushed, if enabled) '''
+        broker = self.behavior.inference_broker
+        if broker is None:
+            self.scom.commit_and_send( self.world.robot.get_command() )
+        else:
+            broker.defer(lambda: self.scom.commit_and_send( self.world.robot.get_command() ))
+
+
     def hear_message(self, msg:bytearray, direction, timestamp:float) -> None:
         if direction != "self" and self.communicator is not None:
             self.communicator.receive(msg)
@@ -38,11 +47,15 @@ class Base_Agent():
     def terminate(self):
         # close shared monitor socket if this is the last agent on this thread
         self.scom.close(close_monitor_socket=(len(Base_Agent.all_agents)==1))
+        self.logger.close()
+        self.communicator.telemetry.close()
         Base_Agent.all_agents.remove(self)
 
     @staticmethod
     def terminate_all():
         for o in Base_Agent.all_agents:
             o.scom.close(True) # close shared monitor socket, if it exists
+            o.logger.close()
+            o.communicator.telemetry.close()
         Base_Agent.all_agents = []
 
@@ -0,0 +1,260 @@
+'''
+Vectorized analytics of the collaborative ball consensus
+
+Input: Parquet dataset written by metrics_logger.py, its CSV output, or binary telemetry files (logs/Telemetry.py)
+(a telemetry file, or a directory searched recursively for *.tlm files).
+Each row is a ball update of one agent. Rows are grouped by match (directory of the source log file)
+and by batch (first directory of the source log file, e.g. one directory per voting strategy).
+
+Metrics:
+    vision error    - distance between the consensus and the ball seen by the agent (agents with vision)
+    blind error     - distance between the consensus and the mean ball position seen by teammates in the same cycle
+                      (agents without vision, in cycles where at least one teammate sees the ball)
+    coverage        - fraction of the cycles of a match in which the agent updated the ball position
+    staleness       - number of cycles without update before each update of the agent
+    sent per cycle  - messages sent by the team in each cycle
+    delivery        - messages received by the agent / messages sent by its teammates (same cycle)
+                      (only teammates with logs in the same match are counted)
+
+All metrics are computed with numpy/pandas vectorized operations (no Python loop over rows),
+and summarized in a single table, with one row per agent (or per batch) and one row for all data.
+
+Usage:
+    python consensus_analytics.py input [--by agent|batch] [-o summary.csv] [--plot consensus.png]
+'''
+import argparse
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+
+def load(path):
+    ''' Load Parquet dataset, CSV file, or telemetry files into a DataFrame (with a categorical 'source' column) '''
+    is_telemetry = path.endswith(".tlm") or (os.path.isdir(path) and not any(
+        f.endswith(".parquet") for f in os.listdir(path)))
+    if is_telemetry:
+        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # repository root
+        from logs.Telemetry import Telemetry
+        df = Telemetry.load(path)
+        df["source"] = df["source"].cat.rename_categories(lambda s: os.path.relpath(s, path) if os.path.isdir(path) else s)
+    elif path.endswith(".csv"):
+        df = pd.read_csv(path, engine="pyarrow" if _has_pyarrow() else "c")
+    else:
+        df = pd.read_parquet(path)
+    if "source" not in df:
+        df["source"] = "" # legacy CSV (single match)
+    df["source"] = df["source"].astype("category")
+    return df
+
+
+def _has_pyarrow():
+    try:
+        import pyarrow
+        return True
+    except ModuleNotFoundError:
+        return False
+
+
+def _directories(source:pd.Series):
+    ''' Returns codes of match (directory of source) and batch (first directory of source), computed on the categories only '''
+    categories = source.cat.categories.astype(str)
+    match = pd.Index([os.path.dirname(c) for c in categories])
+    batch = pd.Index([os.path.normpath(c).split(os.sep)[0] if os.sep in os.path.normpath(c) else "" for c in categories])
+    codes = source.cat.codes.to_numpy()
+    match_codes, match_names = pd.factorize(match)
+    batch_codes, batch_names = pd.factorize(batch)
+    return match_codes[codes], batch_codes[codes], batch_names
+
+
+def compute_metrics(df:pd.DataFrame):
+    '''
+    Compute per-row and per-(agent, cycle) metrics
+
+    Returns
+    -------
+    rows : pandas.DataFrame
+        one row per ball update: match, batch, agent_id, cycle, vision_error, blind_error
+    agent_cycles : pandas.DataFrame
+        one row per (match, agent, cycle) (first update of the cycle): match, batch, agent_id, cycle,
+        staleness (cycles without update before this one), team_sent, delivery
+    matches : pandas.DataFrame
+        one row per (match, agent): match, batch, agent_id, cycles (with update), match_cycles (cycles of the match)
+    batch_names : pandas.Index
+        name of each batch code
+    '''
+    if df["cycle"].hasnans:
+        df = df[df["cycle"].notna()] # rows logged before the first CYCLE_COMPLETE record
+    if df.empty: # e.g. telemetry files without records
+        empty = lambda *columns: pd.DataFrame(columns=["match", "batch", "agent_id"] + list(columns))
+        return (empty("cycle", "vision_error", "blind_error"),
+                empty("cycle", "sent", "received", "staleness", "team_sent", "delivery"),
+                empty("cycles", "match_cycles"), pd.Index([]))
+    match, batch, batch_names = _directories(df["source"])
+    agent = df["agent_id"].to_numpy(np.int64)
+    cycle = df["cycle"].to_numpy(np.int64)
+    ex, ey = df["estimated_x"].to_numpy(np.float32), df["estimated_y"].to_numpy(np.float32) # float32 halves the memory of each array
+    vx, vy = df["vision_x"].to_numpy(np.float32), df["vision_y"].to_numpy(np.float32)
+    has_vision = ~(np.isnan(vx) | np.isnan(vy))
+
+    #------------------------------------------- Consensus error
+    vision_error = np.hypot(ex - vx, ey - vy) # NaN without vision
+
+    # Reference ball position of each (match, cycle): mean position seen by the agents with vision
+    key = (match.astype(np.int64) << 32) | (cycle - (cycle.min() if len(cycle) else 0)) # (match, cycle) as a single integer
+    mc, _ = pd.factorize(key)
+    n_mc = int(mc.max()) + 1 if len(mc) else 0
+    seen = np.bincount(mc, has_vision, n_mc)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ref_x = (np.bincount(mc, np.where(has_vision, vx, 0), n_mc) / seen).astype(np.float32)
+        ref_y = (np.bincount(mc, np.where(has_vision, vy, 0), n_mc) / seen).astype(np.float32)
+    blind_error = np.where(has_vision, np.nan, np.hypot(ex - ref_x[mc], ey - ref_y[mc])) # NaN if nobody sees the ball
+
+    rows = pd.DataFrame({"match":match, "batch":batch, "agent_id":agent.astype(np.int8), "cycle":cycle.astype(np.int32),
+                         "vision_error":vision_error, "blind_error":blind_error})
+
+    #------------------------------------------- Per (match, agent, cycle): staleness and message efficiency
+    # Rows are sorted by (match, agent, cycle). Log files are already sorted by cycle, so the stable sort is almost linear
+    key = (match.astype(np.int64) << 40) | (agent << 32) | (cycle - (cycle.min() if len(cycle) else 0))
+    order = np.argsort(key, kind="stable")
+    first = order[np.r_[True, np.diff(key[order]) != 0]] # first update of each (match, agent, cycle)
+    ac = pd.DataFrame({"match":match[first], "batch":batch[first], "agent_id":agent[first], "cycle":cycle[first],
+                       "sent":df["messages_sent"].to_numpy(np.float32)[first],
+                       "received":df["messages_received"].to_numpy(np.float32)[first], "mc":mc[first]})
+
+    same_agent = np.r_[False, (np.diff(ac["match"].to_numpy()) == 0) & (np.diff(ac["agent_id"].to_numpy()) == 0)]
+    gap = np.r_[0, np.diff(ac["cycle"].to_numpy())] - 1
+    ac["staleness"] = np.where(same_agent, gap, np.nan) # unknown for the first update of each agent
+
+    team_sent = np.bincount(ac["mc"].to_numpy(), ac["sent"].to_numpy(), n_mc)
+    others_sent = team_sent[ac["mc"].to_numpy()] - ac["sent"].to_numpy()
+    ac["team_sent"] = team_sent[ac["mc"].to_numpy()]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ac["delivery"] = np.where(others_sent > 0, ac["received"].to_numpy() / others_sent, np.nan)
+
+    #------------------------------------------- Per (match, agent): coverage
+    matches = ac.groupby(["match", "batch", "agent_id"], sort=False)["cycle"].size().rename("cycles").reset_index()
+    span = ac.groupby("match", sort=False)["cycle"].agg(["min", "max"]) # cycles between the first and last update of the match
+    matches["match_cycles"] = matches["match"].map(span["max"] - span["min"] + 1).to_numpy()
+
+    return rows, ac.drop(columns="mc"), matches, batch_names
+
+
+def _percentile(groups, values, q:float, resolution:float=0.01, max_value:float=50.0):
+    '''
+    Percentile `q` (0-100) of `values` in each group, computed from a histogram with `resolution` (NaN values are ignored)
+    (a single bincount, instead of sorting the values of each group)
+
+    Parameters
+    ----------
+    groups : ndarray
+        non-negative integer group of each value
+
+    Returns
+    -------
+    percentile : ndarray
+        percentile of each group 0..groups.max() (NaN for groups without values)
+    '''
+    n_groups = int(groups.max()) + 1 if len(groups) else 0
+    bins = int(max_value / resolution) + 1
+    valid = ~np.isnan(values)
+    b = np.minimum(values[valid] / resolution, bins - 1).astype(np.int64) # values above max_value are in the last bin
+    cum = np.cumsum(np.bincount(groups[valid] * bins + b, minlength=n_groups * bins).reshape(n_groups, bins), axis=1)
+    rank = np.ceil(cum[:,-1] * q / 100)
+    with np.errstate(invalid="ignore"):
+        return np.where(cum[:,-1] > 0, ((cum < rank[:,None]).sum(axis=1) + 0.5) * resolution, np.nan)
+
+
+def _table(rows, agent_cycles, matches, by):
+    ''' Summary metrics grouped by column `by` (non-negative integers), or a single group if `by` is None '''
+    key = lambda df: np.zeros(len(df), np.int64) if by is None else df[by].to_numpy(np.int64)
+    r, ac, m = rows.groupby(key(rows)), agent_cycles.groupby(key(agent_cycles)), matches.groupby(key(matches))
+    size = r.size()
+    return pd.DataFrame({
+        "updates":         size,
+        "vision_%":        r["vision_error"].count() / size * 100,
+        "vision_err_mean": r["vision_error"].mean(),
+        "vision_err_p95":  _percentile(key(rows), rows["vision_error"].to_numpy(), 95)[size.index],
+        "blind_err_mean":  r["blind_error"].mean(),
+        "blind_err_p95":   _percentile(key(rows), rows["blind_error"].to_numpy(), 95)[size.index],
+        "coverage_%":      m["cycles"].sum() / m["match_cycles"].sum() * 100,
+        "staleness_mean":  ac["staleness"].mean(),
+        "staleness_max":   ac["staleness"].max(),
+        "sent_per_cycle":  ac["team_sent"].mean(),
+        "delivery_%":      ac["delivery"].mean() * 100,
+    })
+
+
+def summarize(rows, agent_cycles, matches, batch_names, by:str="agent_id"):
+    ''' Summary table with one row per value of `by` ("agent_id" or "batch"), and a final row ("All") for all data '''
+    summary = _table(rows, agent_cycles, matches, by)
+    if by == "batch":
+        summary.index = batch_names[summary.index]
+    total = _table(rows, agent_cycles, matches, None)
+    total.index = ["All"]
+    summary = pd.concat([summary, total])
+    summary.index.name = by
+    return summary
+
+
+def per_cycle(rows, agent_cycles, matches):
+    ''' Mean metrics of each cycle (over all matches): vision_error, blind_error, coverage, team_sent '''
+    agents = matches.groupby("match")["agent_id"].nunique()
+    mc = agent_cycles.groupby(["match", "cycle"]).agg(updates=("agent_id", "size"), team_sent=("team_sent", "first"))
+    mc["coverage"] = mc["updates"].to_numpy() / agents.reindex(mc.index.get_level_values("match")).to_numpy()
+    cycles = mc.groupby(level="cycle")[["coverage", "team_sent"]].mean()
+    return rows.groupby("cycle")[["vision_error", "blind_error"]].mean().join(cycles)
+
+
+def plot(cycles, path):
+    ''' Plot metrics of each cycle (see per_cycle) '''
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, axes = plt.subplots(3, 1, sharex=True, figsize=(10, 8))
+    axes[0].plot(cycles.index, cycles["vision_error"], label="vision error")
+    axes[0].plot(cycles.index, cycles["blind_error"], label="blind error")
+    axes[0].set_ylabel("Error (m)")
+    axes[0].legend()
+    axes[1].plot(cycles.index, cycles["coverage"] * 100)
+    axes[1].set_ylabel("Coverage (%)")
+    axes[2].plot(cycles.index, cycles["team_sent"])
+    axes[2].set_ylabel("Messages sent")
+    axes[2].set_xlabel("Cycle")
+    fig.tight_layout()
+    fig.savefig(path)
+    plt.close(fig)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vectorized analytics of the collaborative ball consensus")
+    parser.add_argument("input", help="Parquet dataset or CSV file (metrics_logger.py), or telemetry file/directory")
+    parser.add_argument("--by", choices=["agent", "batch"], default="agent", help="group summary by agent or by batch")
+    parser.add_argument("-o", "--output", default=None, help="write summary table to a CSV file")
+    parser.add_argument("--plot", default=None, help="write plot of the metrics of each cycle (requires matplotlib)")
+    args = parser.parse_args()
+
+    df = load(args.input)
+    rows, agent_cycles, matches, batch_names = compute_metrics(df)
+    if rows.empty:
+        print("No ball updates found!")
+        return
+
+    summary = summarize(rows, agent_cycles, matches, batch_names, "agent_id" if args.by == "agent" else "batch")
+    with pd.option_context("display.max_columns", None, "display.width", 250):
+        print(summary.to_string(float_format=lambda x: f"{x:.2f}"))
+
+    if args.output is not None:
+        summary.to_csv(args.output)
+        print(f"\nSaved as {args.output}")
+    if args.plot is not None:
+        try:
+            plot(per_cycle(rows, agent_cycles, matches), args.plot)
+            print(f"Saved as {args.plot}")
+        except ModuleNotFoundError:
+            print("Error: the matplotlib module is required to plot (pip install matplotlib)")
+
+
+if __name__ == "__main__":
+    main()
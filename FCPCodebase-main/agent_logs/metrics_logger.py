@@ -1,134 +1,359 @@
-import os
-import re
-import pandas as pd
-
-# Directory containing all agent log files
-LOG_DIR = "."
-OUTPUT_JSON = "parsed_logs.json"
-OUTPUT_CSV = "parsed_logs.csv"
-
-# Regex pattern for BALL_UPDATE lines
-BALL_PATTERN = re.compile(
-    r'\[BALL_UPDATE\]\s+Agent\s+(\d+)\s+\|\s+'
-    r'Sent ball=(?:\(([-\d.]+),\s*([-\d.]+)\)|N/A)\s+\|\s+'
-    r'Vision Ball=(?:\(([-\d.]+),\s*([-\d.]+)\)|N/A)\s+\|\s+'
-    r'Estimated Ball=\[\s*([-\d.]+),\s*([-\d.]+)\s*\]\s+'
-    r'Agent Pos=\(([-\d.]+),\s*([-\d.]+)\)'
-)
-
-
-# Regex pattern for CYCLE_COMPLETE lines
-CYCLE_PATTERN = re.compile(
-    r'\[CYCLE_COMPLETE\]\s+Cycle\s+(\d+)\s+\|\s+'
-    r'Messages Sent:\s+(\d+)\s+\|\s+'
-    r'Messages Received:\s+(\d+)'
-)
-
-data = []
-total_lines = 0
-log_files_found = 0
-
-# Loop through all log files in the directory
-for filename in os.listdir(LOG_DIR):
-    if filename.endswith(".log"):
-        log_files_found += 1
-        filepath = os.path.join(LOG_DIR, filename)
-        print(f"Processing: {filename}")
-        
-        with open(filepath, "r") as f:
-            lines = f.readlines()
-            total_lines += len(lines)
-            
-            # Track current cycle info
-            current_cycle = None
-            current_messages_sent = None
-            current_messages_received = None
-            
-            for line_num, line in enumerate(lines, 1):
-                # Check for CYCLE_COMPLETE to update cycle info
-                cycle_match = CYCLE_PATTERN.search(line)
-                if cycle_match:
-                    current_cycle = int(cycle_match.group(1))
-                    current_messages_sent = int(cycle_match.group(2))
-                    current_messages_received = int(cycle_match.group(3))
-                    continue
-                
-                # Check for BALL_UPDATE
-                ball_match = BALL_PATTERN.search(line)
-                if ball_match:
-                    (
-                        agent,
-                        sent_x, sent_y,
-                        vision_x, vision_y,
-                        est_x, est_y,
-                        agent_pos_x, agent_pos_y
-                    ) = ball_match.groups()
-
-                    # Convert to floats or None
-                    #
-                    sent_x = float(sent_x) if sent_x else None
-                    sent_y = float(sent_y) if sent_y else None
-                    vision_x = float(vision_x) if vision_x else None
-                    vision_y = float(vision_y) if vision_y else None
-                    est_x = float(est_x)
-                    est_y = float(est_y)
-                    agent_pos_x = float(agent_pos_x)
-                    agent_pos_y = float(agent_pos_y)
-     
-                    # Determine agent status
-                    agent_with_vision = vision_x is not None and vision_y is not None
-                    agent_who_broadcasted = sent_x is not None and sent_y is not None
-                    
-                    data.append({
-                        "agent_id": int(agent),
-                        "cycle": current_cycle,
-                        "messages_sent": current_messages_sent,
-                        "messages_received": current_messages_received,
-                        "vision_x": vision_x,
-                        "vision_y": vision_y,
-                        "estimated_x": est_x,
-                        "estimated_y": est_y,
-                        "sent_x": sent_x,
-                        "sent_y": sent_y,
-                        "agent_with_vision": agent_with_vision,
-                        "agent_who_broadcasted": agent_who_broadcasted,
-                        "agent_pos_x": agent_pos_x,
-                        "agent_pos_y": agent_pos_y
-                    })
-
-print(f"\n{'='*60}")
-print(f"Summary:")
-print(f"  Log files found: {log_files_found}")
-print(f"  Total lines processed: {total_lines}")
-print(f"  Matched ball update entries: {len(data)}")
-print(f"{'='*60}\n")
-
-# Convert to DataFrame safely
-if data:
-    df = pd.DataFrame(data)
-    print("Columns found:", df.columns.tolist())
-    print(f"\nFirst few rows:")
-    print(df.head(10))
-    
-    # Sort by cycle, then agent_id
-    df = df.sort_values(by=["cycle", "agent_id"]).reset_index(drop=True)
-    
-    # Export to JSON and CSV
-    df.to_json(OUTPUT_JSON, orient="records", indent=4)
-    df.to_csv(OUTPUT_CSV, index=False)
-    
-    print(f"\n Parsed {len(df)} entries from logs in '{LOG_DIR}'")
-    print(f"Saved as {OUTPUT_JSON} and {OUTPUT_CSV}")
-    
-    # Some useful statistics
-    print(f"\nStatistics:")
-    print(f"  Unique agents: {df['agent_id'].nunique()}")
-    print(f"  Cycles covered: {df['cycle'].min()} to {df['cycle'].max()}")
-    print(f"  Entries with vision: {df['agent_with_vision'].sum()}")
-    print(f"  Entries with broadcast: {df['agent_who_broadcasted'].sum()}")
-else:
-    print("No log entries matched the pattern!")
-    print("\nPlease check:")
-    print("1. Are there .log files in the directory?")
-    print("2. Do the log files contain [BALL_UPDATE] lines?")
-    print("3. Is the log format exactly as shown in the pattern?")
\ No newline at end of file
+'''
+Streaming ingestion of the communication logs written by Communicator (see logs/Comm_Logger.py)
+
+Note: Communicator writes the same data to binary telemetry files (agent_<unum>.tlm), which are loaded
+without parsing by logs/Telemetry.py (Telemetry.load). The BALL_UPDATE and CYCLE_COMPLETE records used by this script
+are only logged with FCP_COMM_LOG_LEVEL=DEBUG (or in logs of previous versions).
+
+Log files (agent_<unum>.log in text format, or agent_<unum>.jsonl) are searched recursively in the given directories
+(e.g. one directory per match). Each file is read line by line by a process pool worker, which writes its rows
+to a Parquet part file in batches, so that memory usage is bounded regardless of the number of matches.
+The output is a Parquet dataset (a directory of part files), which can be loaded with pandas.read_parquet(path).
+
+Incremental mode (-i): the dataset keeps a sidecar index (_index.json) with the state of each log file
+(inode, byte offset of the last complete line, last CYCLE_COMPLETE record, part files). Each run only parses
+the bytes appended since the previous run and writes them to a new part file, so the analysis can be repeated
+while matches are still writing logs. Files that were rewritten (e.g. by a new match) are parsed again from the start,
+and the rows of files that no longer exist are removed from the dataset.
+
+Usage:
+    python metrics_logger.py [directories] [-o parsed_logs.parquet] [--csv parsed_logs.csv] [-j workers] [-i]
+'''
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import json
+import os
+import re
+import zlib
+
+# Default directory containing the agent log files
+LOG_DIR = "."
+OUTPUT_PARQUET = "parsed_logs.parquet"
+BATCH_ROWS = 65536 # rows per Parquet row group (bounds the memory used by each worker)
+INDEX_FILE = "_index.json" # sidecar index of the dataset (files starting with '_' are ignored by Parquet readers)
+HEAD_BYTES = 64    # size of the file head whose checksum identifies a log file (detects rewritten files)
+MAX_PARTS = 8      # maximum number of part files per log file (more parts are merged into one)
+
+# Regex pattern for BALL_UPDATE lines
+BALL_PATTERN = re.compile(
+    r'\[BALL_UPDATE\]\s+Agent\s+(\d+)\s+\|\s+'
+    r'Sent ball=(?:\(([-\d.]+),\s*([-\d.]+)\)|N/A)\s+\|\s+'
+    r'Vision Ball=(?:\(([-\d.]+),\s*([-\d.]+)\)|N/A)\s+\|\s+'
+    r'Estimated Ball=\[\s*([-\d.]+),\s*([-\d.]+)\s*\]\s+'
+    r'Agent Pos=\(([-\d.]+),\s*([-\d.]+)\)'
+)
+
+
+# Regex pattern for CYCLE_COMPLETE lines
+CYCLE_PATTERN = re.compile(
+    r'\[CYCLE_COMPLETE\]\s+Cycle\s+(\d+)\s+\|\s+'
+    r'Messages Sent:\s+(\d+)\s+\|\s+'
+    r'Messages Received:\s+(\d+)'
+)
+
+# Output columns (name, pyarrow type name)
+COLUMNS = [
+    ("source", "string"),             # log file, relative to its input directory
+    ("agent_id", "int8"),
+    ("cycle", "int32"),               # cycle, messages_sent and messages_received refer to the last CYCLE_COMPLETE record
+    ("messages_sent", "int16"),
+    ("messages_received", "int16"),
+    ("vision_x", "float32"),
+    ("vision_y", "float32"),
+    ("estimated_x", "float32"),
+    ("estimated_y", "float32"),
+    ("sent_x", "float32"),
+    ("sent_y", "float32"),
+    ("agent_with_vision", "bool_"),
+    ("agent_who_broadcasted", "bool_"),
+    ("agent_pos_x", "float32"),
+    ("agent_pos_y", "float32"),
+]
+
+
+def find_log_files(directories):
+    ''' Generator of (log file path, path relative to its input directory), excluding error logs '''
+    for d in directories:
+        for root, dirs, files in os.walk(d):
+            dirs.sort()
+            for f in sorted(files):
+                if f.endswith((".log", ".jsonl")) and not f.endswith(("_errors.log", "_errors.jsonl")):
+                    path = os.path.join(root, f)
+                    yield path, os.path.relpath(path, d)
+
+
+def _float(s):
+    return float(s) if s else None
+
+
+def read_events(path, state):
+    '''
+    Generator of (event, fields) for the CYCLE_COMPLETE and BALL_UPDATE records of a log file,
+    where fields follow the names of Comm_Logger (JSON lines) for both formats
+
+    Reading starts at byte state["offset"], and stops at the last complete line (a line that is still being written
+    is left for the next run). state["offset"] is updated with the position after the last line that was read.
+    '''
+    jsonl = path.endswith(".jsonl")
+    with open(path, "rb") as f:
+        f.seek(state["offset"])
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            state["offset"] += len(line)
+            if jsonl:
+                if b'"CYCLE_COMPLETE"' in line or b'"BALL_UPDATE"' in line: # skip json parsing of other records
+                    record = json.loads(line)
+                    yield record["event"], record
+            elif b"[CYCLE_COMPLETE]" in line: # skip regex matching of other records
+                m = CYCLE_PATTERN.search(line.decode(errors="replace"))
+                if m:
+                    yield "CYCLE_COMPLETE", {"cycle":int(m.group(1)), "sent":int(m.group(2)), "received":int(m.group(3))}
+            elif b"[BALL_UPDATE]" in line:
+                m = BALL_PATTERN.search(line.decode(errors="replace"))
+                if m:
+                    g = m.groups()
+                    yield "BALL_UPDATE", {"agent":int(g[0]), "sent_x":_float(g[1]), "sent_y":_float(g[2]),
+                                          "vision_x":_float(g[3]), "vision_y":_float(g[4]), "est_x":float(g[5]), "est_y":float(g[6]),
+                                          "agent_x":float(g[7]), "agent_y":float(g[8])}
+
+
+def read_rows(path, source, state):
+    '''
+    Generator of output rows (tuples ordered as COLUMNS) of a log file, starting at byte state["offset"]
+    state["cycle"], state["sent"] and state["received"] hold the last CYCLE_COMPLETE record (read or updated)
+    '''
+    for event, f in read_events(path, state):
+        if event == "CYCLE_COMPLETE":
+            state["cycle"], state["sent"], state["received"] = f["cycle"], f["sent"], f["received"]
+        else:
+            yield (source, f["agent"], state["cycle"], state["sent"], state["received"], f["vision_x"], f["vision_y"],
+                   f["est_x"], f["est_y"], f["sent_x"], f["sent_y"], f["vision_x"] is not None and f["vision_y"] is not None,
+                   f["sent_x"] is not None and f["sent_y"] is not None, f["agent_x"], f["agent_y"])
+
+
+def new_stats():
+    return {"rows":0, "agents":[], "cycle_min":None, "cycle_max":None, "vision":0, "broadcast":0}
+
+
+def merge_stats(total, stats):
+    ''' Add `stats` to `total` (both created by new_stats) '''
+    for k in ("rows", "vision", "broadcast"):
+        total[k] += stats[k]
+    total["agents"] = sorted(set(total["agents"]) | set(stats["agents"]))
+    if stats["cycle_min"] is not None:
+        total["cycle_min"] = stats["cycle_min"] if total["cycle_min"] is None else min(total["cycle_min"], stats["cycle_min"])
+        total["cycle_max"] = stats["cycle_max"] if total["cycle_max"] is None else max(total["cycle_max"], stats["cycle_max"])
+
+
+def ingest_file(path, source, part_path, state, merge_parts=()):
+    '''
+    Write rows of a log file, starting at byte state["offset"], to a Parquet part file in batches of BATCH_ROWS
+    (runs in a worker process). The part file is only created if there are rows to write.
+
+    Parameters
+    ----------
+    state : dict
+        offset and last CYCLE_COMPLETE record (cycle, sent, received) of the previous run (see read_rows)
+    merge_parts : list
+        part files of previous runs, whose row groups are copied to the beginning of the new part file
+
+    Returns
+    -------
+    stats : dict
+        summary of the new rows (number of rows, agents, cycle range, entries with vision/broadcast)
+    state : dict
+        state at the end of this run
+    written : bool
+        True if the part file was created
+    '''
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(name, getattr(pa, t)()) for name, t in COLUMNS])
+    stats = new_stats()
+    state = dict(state)
+    writer = None
+    batch = []
+
+    def get_writer():
+        nonlocal writer
+        if writer is None:
+            writer = pq.ParquetWriter(part_path, schema)
+        return writer
+
+    def flush():
+        columns = list(zip(*batch))
+        table = pa.Table.from_arrays([pa.array(c, type=schema.field(i).type) for i,c in enumerate(columns)], schema=schema)
+        get_writer().write_table(table)
+        cycles = [c for c in columns[2] if c is not None]
+        merge_stats(stats, {"rows":len(batch), "agents":set(columns[1]), "vision":sum(columns[11]), "broadcast":sum(columns[12]),
+                            "cycle_min":min(cycles) if cycles else None, "cycle_max":max(cycles) if cycles else None})
+        batch.clear()
+
+    for part in merge_parts:
+        pf = pq.ParquetFile(part)
+        for i in range(pf.num_row_groups):
+            get_writer().write_table(pf.read_row_group(i))
+
+    for row in read_rows(path, source, state):
+        batch.append(row)
+        if len(batch) == BATCH_ROWS:
+            flush()
+    if batch:
+        flush()
+    if writer is not None:
+        writer.close()
+    return stats, state, writer is not None
+
+
+def file_head(path, size=HEAD_BYTES):
+    ''' Returns (length, checksum) of the first `size` bytes of a file '''
+    with open(path, "rb") as f:
+        head = f.read(size)
+    return len(head), zlib.crc32(head)
+
+
+def load_index(output):
+    ''' Returns sidecar index of dataset: {"files": {log file path: entry}} (empty if there is no index) '''
+    try:
+        with open(os.path.join(output, INDEX_FILE), "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"files":{}}
+
+
+def save_index(output, index):
+    ''' Write sidecar index (replaced atomically, so that an interrupted run leaves the previous index) '''
+    tmp = os.path.join(output, INDEX_FILE + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(index, f, indent=1)
+    os.replace(tmp, os.path.join(output, INDEX_FILE))
+
+
+def is_same_file(path, st, entry):
+    ''' Check if the log file is the one described by its index entry, and if it was only appended since the last run '''
+    return (st.st_ino == entry["inode"] and st.st_size >= entry["offset"]
+            and file_head(path, entry["head"][0]) == tuple(entry["head"]))
+
+
+def write_csv(parquet_dir, csv_path):
+    ''' Convert Parquet dataset to CSV, one row group at a time '''
+    import pyarrow.csv as pcsv
+    import pyarrow.parquet as pq
+
+    writer = None
+    for part in sorted(f for f in os.listdir(parquet_dir) if f.startswith("part-") and f.endswith(".parquet")):
+        pf = pq.ParquetFile(os.path.join(parquet_dir, part))
+        for i in range(pf.num_row_groups):
+            table = pf.read_row_group(i)
+            if writer is None:
+                writer = pcsv.CSVWriter(csv_path, table.schema)
+            writer.write_table(table)
+    if writer is not None:
+        writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming ingestion of agent communication logs")
+    parser.add_argument("directories", nargs="*", default=[LOG_DIR], help="directories searched recursively for log files")
+    parser.add_argument("-o", "--output", default=OUTPUT_PARQUET, help="output Parquet dataset (directory)")
+    parser.add_argument("--csv", default=None, help="also write a CSV file")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="number of worker processes (default: number of CPUs)")
+    parser.add_argument("-i", "--incremental", action="store_true", help="only parse data appended since the previous run")
+    args = parser.parse_args()
+
+    try:
+        import pyarrow
+    except ModuleNotFoundError:
+        print("Error: the pyarrow module is required to write Parquet files (pip install pyarrow)")
+        return
+
+    os.makedirs(args.output, exist_ok=True)
+    index = load_index(args.output) if args.incremental else {"files":{}}
+    entries = index["files"]
+
+    # Remove part files that are not in the index (all part files in a full run, or parts left by an interrupted run)
+    referenced = {p for e in entries.values() for p in e["parts"]}
+    for f in os.listdir(args.output):
+        if f.startswith("part-") and f.endswith(".parquet") and f not in referenced:
+            os.remove(os.path.join(args.output, f))
+
+    # Find log files with new data (new files, appended files, and rewritten files)
+    jobs = []
+    obsolete = [] # part files to be removed after the index is saved
+    files = list(find_log_files(args.directories))
+    for path, source in files:
+        key = os.path.abspath(path)
+        st = os.stat(path)
+        entry = entries.get(key)
+        if entry is not None and is_same_file(path, st, entry):
+            if st.st_size == entry["offset"]:
+                continue # nothing was appended
+        else:
+            if entry is not None:
+                obsolete += entry["parts"]
+            entry = entries[key] = {"id":max((e["id"] for e in entries.values()), default=-1) + 1, "inode":st.st_ino,
+                                    "head":file_head(path), "offset":0, "cycle":None, "sent":None, "received":None,
+                                    "next_part":0, "parts":[], "stats":new_stats()}
+        entry["source"] = source
+        part = f"part-{entry['id']:06d}-{entry['next_part']:06d}.parquet"
+        merge = entry["parts"] if len(entry["parts"]) >= MAX_PARTS else []
+        state = {k:entry[k] for k in ("offset", "cycle", "sent", "received")}
+        jobs.append((entry, part, merge, (path, source, os.path.join(args.output, part), state,
+                                          [os.path.join(args.output, p) for p in merge])))
+
+    # Forget log files that no longer exist (after assigning ids to new files, so that the ids of their parts are not reused)
+    found = {os.path.abspath(path) for path, _ in files}
+    removed = [key for key in entries if key not in found]
+    for key in removed:
+        obsolete += entries.pop(key)["parts"]
+
+    with ProcessPoolExecutor(args.workers) as executor:
+        futures = [executor.submit(ingest_file, *job[3]) for job in jobs]
+        for (entry, part, merge, job), future in zip(jobs, futures):
+            stats, state, written = future.result()
+            print(f"Processed: {job[0]} ({stats['rows']} {'new ' if args.incremental else ''}entries)")
+            entry.update(state)
+            merge_stats(entry["stats"], stats)
+            if written:
+                entry["next_part"] += 1
+                entry["parts"] = [p for p in entry["parts"] if p not in merge] + [part]
+                obsolete += merge
+
+    save_index(args.output, index)
+    for p in obsolete:
+        os.remove(os.path.join(args.output, p))
+
+    total = new_stats()
+    for entry in entries.values():
+        merge_stats(total, entry["stats"])
+
+    print(f"\n{'='*60}")
+    print(f"Summary:")
+    print(f"  Log files found: {len(files)} ({len(jobs)} with new data, {len(removed)} removed since the previous run)")
+    print(f"  Matched ball update entries: {total['rows']}")
+    print(f"{'='*60}\n")
+
+    if total["rows"] == 0:
+        print("No log entries matched the pattern!")
+        print("\nPlease check:")
+        print("1. Are there .log or .jsonl files in the directories?")
+        print("2. Do the log files contain BALL_UPDATE records?")
+        return
+
+    print(f"Saved as {args.output}")
+    if args.csv is not None:
+        write_csv(args.output, args.csv)
+        print(f"Saved as {args.csv}")
+
+    # Some useful statistics
+    print(f"\nStatistics:")
+    print(f"  Unique agents: {len(total['agents'])}")
+    print(f"  Cycles covered: {total['cycle_min']} to {total['cycle_max']}")
+    print(f"  Entries with vision: {total['vision']}")
+    print(f"  Entries with broadcast: {total['broadcast']}")
+
+
+if __name__ == "__main__":
+    main()
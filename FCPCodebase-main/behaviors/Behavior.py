@@ -1,6 +1,3 @@
-import numpy as np
-
-
 class Behavior():
 
     def __init__(self, base_agent) -> None:
@@ -11,6 +8,7 @@ class Behavior():
         self.state_behavior_init_ms = 0
         self.previous_behavior = None
         self.previous_behavior_duration = None
+        self.inference_broker = None # optional Inference_Broker shared by multiple agents (set to None to run neural networks immediately)
 
         #Initialize standard behaviors
         from behaviors.Poses import Poses
@@ -168,12 +166,13 @@ class Behavior():
         while True:
             done = self.execute(name, *args)
             if done and skip_last: break # Exit here if last command is irrelevant
+            if self.inference_broker is not None: self.inference_broker.flush() # apply pending actions
             self.base_agent.scom.commit_and_send( r.get_command() ) 
             self.base_agent.scom.receive()
             if done: break # Exit here if last command is part of the behavior
 
         # reset to avoid polluting the next command
-        r.joints_target_speed = np.zeros_like(r.joints_target_speed)
+        r.joints_target_speed.fill(0)
 
 
     def is_ready(self, name, *args) -> bool:
@@ -1,11 +1,12 @@
 from math_ops.Math_Ops import Math_Ops as M
 from os import listdir
-from os.path import isfile, join
+from os.path import basename, isfile, join
 from world.World import World
 import numpy as np
 import xml.etree.ElementTree as xmlp
 
 class Slot_Engine():
+    PARSED_FILES = dict() # parsed slot behavior files, shared by all agents in the same process (and by forked processes, through copy-on-write)
 
     def __init__(self, world : World) -> None:
         self.world = world
@@ -28,27 +29,48 @@ class Slot_Engine():
         self.auto_head_flags = dict()
 
         for fname, file in files:
-            robot_xml_root = xmlp.parse(file).getroot()
-            slots = []
             bname = fname[:-4] # remove extension ".xml"
-
-            for xml_slot in robot_xml_root:
-                assert xml_slot.tag == 'slot', f"Unexpected XML element in slot behavior {fname}: '{xml_slot.tag}'"
-                indices, angles = [],[]
-                
-                for action in xml_slot:
-                    indices.append(  int(action.attrib['id'])    )
-                    angles.append( float(action.attrib['angle']) )
-
-                delta_ms = float(xml_slot.attrib['delta']) * 1000
-                assert delta_ms > 0, f"Invalid delta <=0 found in Slot Behavior {fname}"
-                slots.append((delta_ms, indices, angles))
-
             assert bname not in self.behaviors, f"Found at least 2 slot behaviors with same name: {fname}"
+            self.descriptions[bname], self.auto_head_flags[bname], self.behaviors[bname] = Slot_Engine.parse_slot_file(file)
 
-            self.descriptions[bname] = robot_xml_root.attrib["description"] if "description" in robot_xml_root.attrib else bname
-            self.auto_head_flags[bname] = (robot_xml_root.attrib["auto_head"] == "1")
-            self.behaviors[bname] = slots
+
+    @staticmethod
+    def parse_slot_file(file:str):
+        '''
+        Parse slot behavior file (each file is parsed once per process, the returned slots must not be modified)
+
+        Returns
+        -------
+        description : str
+            behavior description
+        auto_head : bool
+            True if the head should be controlled automatically
+        slots : list
+            list of slots of type (delta_ms, indices, angles)
+        '''
+        if file in Slot_Engine.PARSED_FILES:
+            return Slot_Engine.PARSED_FILES[file]
+
+        robot_xml_root = xmlp.parse(file).getroot()
+        fname = basename(file)
+        slots = []
+
+        for xml_slot in robot_xml_root:
+            assert xml_slot.tag == 'slot', f"Unexpected XML element in slot behavior {fname}: '{xml_slot.tag}'"
+            indices, angles = [],[]
+            
+            for action in xml_slot:
+                indices.append(  int(action.attrib['id'])    )
+                angles.append( float(action.attrib['angle']) )
+
+            delta_ms = float(xml_slot.attrib['delta']) * 1000
+            assert delta_ms > 0, f"Invalid delta <=0 found in Slot Behavior {fname}"
+            slots.append((delta_ms, indices, angles))
+
+        description = robot_xml_root.attrib["description"] if "description" in robot_xml_root.attrib else fname[:-4]
+        auto_head = (robot_xml_root.attrib["auto_head"] == "1")
+        Slot_Engine.PARSED_FILES[file] = (description, auto_head, slots)
+        return Slot_Engine.PARSED_FILES[file]
 
 
     def get_behaviors_callbacks(self):
@@ -1,9 +1,8 @@
 from agent.Base_Agent import Base_Agent
 from behaviors.custom.Dribble.Env import Env
 from math_ops.Math_Ops import Math_Ops as M
-from math_ops.Neural_Network import run_mlp
+from math_ops.Neural_Network import MLP, load_network
 import numpy as np
-import pickle
 
 
 class Dribble():
@@ -16,14 +15,22 @@ class Dribble():
         self.auto_head = True
         self.env = Env(base_agent, 0.9 if self.world.robot.type == 3 else 1.2)
 
-        with open(M.get_active_directory([
+        self.model = MLP(load_network(M.get_active_directory([
             "/behaviors/custom/Dribble/dribble_R0.pkl",
             "/behaviors/custom/Dribble/dribble_R1.pkl",
             "/behaviors/custom/Dribble/dribble_R2.pkl",
             "/behaviors/custom/Dribble/dribble_R3.pkl",
             "/behaviors/custom/Dribble/dribble_R4.pkl"
-            ][self.world.robot.type]), 'rb') as f:
-            self.model = pickle.load(f)
+            ][self.world.robot.type])))
+
+
+    def run_model(self, obs):
+        ''' Run neural network and execute action (or submit observations to the inference broker, if enabled) '''
+        broker = self.behavior.inference_broker
+        if broker is None:
+            self.env.execute(self.model(obs))
+        else:
+            broker.submit(self.model, obs, self.env.execute)
 
     def define_approach_orientation(self):
 
@@ -178,8 +185,7 @@ class Dribble():
 
             #------------------------ 2. Execute behavior
             obs = self.env.observe(reset_dribble)
-            action = run_mlp(obs, self.model)   
-            self.env.execute(action)
+            self.run_model(obs)
         
         # wind down dribbling, and then reset phase
         if self.phase > 1:
@@ -190,8 +196,7 @@ class Dribble():
 
             #------------------------ 2. Execute behavior
             obs = self.env.observe(reset_dribble, virtual_ball=True)
-            action = run_mlp(obs, self.model)   
-            self.env.execute(action)
+            self.run_model(obs)
 
             #------------------------ 3. Reset behavior
             self.phase += 1
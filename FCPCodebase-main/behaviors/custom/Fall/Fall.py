@@ -1,7 +1,7 @@
 from agent.Base_Agent import Base_Agent
 from math_ops.Math_Ops import Math_Ops as M
-from math_ops.Neural_Network import run_mlp
-import pickle, numpy as np
+from math_ops.Neural_Network import MLP, load_network
+import numpy as np
 
 class Fall():
 
@@ -10,10 +10,9 @@ class Fall():
         self.description = "Fall example"
         self.auto_head = False
 
-        with open(M.get_active_directory("/behaviors/custom/Fall/fall.pkl"), 'rb') as f:
-            self.model = pickle.load(f)
+        self.model = MLP(load_network(M.get_active_directory("/behaviors/custom/Fall/fall.pkl")))
 
-        self.action_size = len(self.model[-1][0]) # extracted from size of Neural Network's last layer bias
+        self.action_size = self.model.output_size # extracted from size of Neural Network's last layer
         self.obs = np.zeros(self.action_size+1, np.float32)
 
         self.controllable_joints = min(self.world.robot.no_of_joints, self.action_size) # compatibility between different robot types
@@ -28,7 +27,7 @@ class Fall():
       
     def execute(self,reset) -> bool:
         self.observe()
-        action = run_mlp(self.obs, self.model) 
+        action = self.model(self.obs) 
         
         self.world.robot.set_joints_target_position_direct( # commit actions:
             slice(self.controllable_joints), # act on trained joints
@@ -1,9 +1,8 @@
 from agent.Base_Agent import Base_Agent
 from behaviors.custom.Walk.Env import Env
 from math_ops.Math_Ops import Math_Ops as M
-from math_ops.Neural_Network import run_mlp
+from math_ops.Neural_Network import MLP, load_network
 import numpy as np
-import pickle
 
 class Walk():
 
@@ -12,16 +11,25 @@ class Walk():
         self.description = "Omnidirectional RL walk"
         self.auto_head = True
         self.env = Env(base_agent)
+        self.behavior = base_agent.behavior
         self.last_executed = 0
 
-        with open(M.get_active_directory([
+        self.model = MLP(load_network(M.get_active_directory([
             "/behaviors/custom/Walk/walk_R0.pkl",
             "/behaviors/custom/Walk/walk_R1_R3.pkl",
             "/behaviors/custom/Walk/walk_R2.pkl",
             "/behaviors/custom/Walk/walk_R1_R3.pkl",
             "/behaviors/custom/Walk/walk_R4.pkl"
-            ][self.world.robot.type]), 'rb') as f:
-            self.model = pickle.load(f)
+            ][self.world.robot.type])))
+
+
+    def run_model(self, obs):
+        ''' Run neural network and execute action (or submit observations to the inference broker, if enabled) '''
+        broker = self.behavior.inference_broker
+        if broker is None:
+            self.env.execute(self.model(obs))
+        else:
+            broker.submit(self.model, obs, self.env.execute)
 
 
     def execute(self, reset, target_2d, is_target_absolute, orientation, is_orientation_absolute, distance):
@@ -72,8 +80,7 @@ class Walk():
         #------------------------ 2. Execute behavior
 
         obs = self.env.observe(reset)
-        action = run_mlp(obs, self.model)   
-        self.env.execute(action)
+        self.run_model(obs)
         
         return False
 
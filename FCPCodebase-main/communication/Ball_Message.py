@@ -0,0 +1,117 @@
+from communication.Radio import Radio
+import numpy as np
+
+
+class Ball_Message():
+    '''
+    Compact encoding of the collaborative ball message (see Communicator)
+
+    The message is the prefix 'B' followed by a mixed-radix combination of all fields,
+    written in base Radio.SLEN with the symbols in Radio.SYMB (least significant symbol first).
+    The prefix distinguishes these messages from the legacy ASCII format ("A<unum>:<x>,<y>,<c>")
+    and prevents the server bug caused by ';' at the beginning of the message.
+
+    Fields and quantization (out of range values are clipped):
+        sender         1 to 11
+        ball x         [-15,15] m    (1 cm)
+        ball y         [-10,10] m    (1 cm)
+        confidence     [0,1]         (0.01)
+        ball vx, vy    [-15,15] m/s  (1 cm/s)
+        age            [0,1000] ms   (10 ms) time since the ball was last seen by the sender
+
+    Total: ~6.1e18 combinations -> 'B' + up to 10 symbols (the server limit is 20 characters)
+    '''
+    PREFIX = "B"
+
+    # minimum value, resolution, number of values
+    SENDER = 1,   1,    11
+    X      = -15, 0.01, 3001
+    Y      = -10, 0.01, 2001
+    CONF   = 0,   0.01, 101
+    VEL    = -15, 0.01, 3001
+    AGE    = 0,   10,   101
+
+    FIELDS = (SENDER, X, Y, CONF, VEL, VEL, AGE)
+    COMBINATIONS = int(np.prod([f[2] for f in FIELDS], dtype=object))
+
+
+    @staticmethod
+    def encode(sender:int, ball_pos, confidence:float, ball_vel=(0,0), age_ms:float=0) -> str:
+        '''
+        Encode ball message
+
+        Parameters
+        ----------
+        sender : int
+            uniform number of the sender
+        ball_pos : array_like
+            ball position (x,y) in meters (additional coordinates are ignored)
+        confidence : float
+            confidence of the ball position, between 0 and 1
+        ball_vel : array_like
+            ball velocity (vx,vy) in m/s (additional coordinates are ignored)
+        age_ms : float
+            time (ms) since the ball was last seen by the sender
+
+        Returns
+        -------
+        message : str
+            compact message (at most 11 characters)
+        '''
+        values = (sender, ball_pos[0], ball_pos[1], confidence, ball_vel[0], ball_vel[1], age_ms)
+
+        combination = 0
+        no_of_combinations = 1
+        for v, (minimum, resolution, n) in zip(values, Ball_Message.FIELDS):
+            q = int(np.clip( round((float(v) - minimum) / resolution), 0, n-1 )) # convert to int to avoid overflow later
+            combination += q * no_of_combinations
+            no_of_combinations *= n
+
+        msg = Ball_Message.PREFIX
+        while True:
+            msg += Radio.SYMB[combination % Radio.SLEN]
+            combination //= Radio.SLEN
+            if not combination:
+                return msg
+
+
+    @staticmethod
+    def decode(msg):
+        '''
+        Decode ball message
+
+        Parameters
+        ----------
+        msg : bytes or str
+            received message
+
+        Returns
+        -------
+        data : tuple or None
+            (sender, ball_pos, confidence, ball_vel, age_ms), where ball_pos and ball_vel are 2D numpy arrays,
+            or None if `msg` is not a valid ball message
+        '''
+        if isinstance(msg, (bytes, bytearray)):
+            msg = msg.decode("ascii", "replace")
+        if len(msg) < 2 or len(msg) > 20 or msg[0] != Ball_Message.PREFIX:
+            return None
+
+        combination = 0
+        total_combinations = 1
+        for m in msg[1:]:
+            idx = Radio.SYMB_TO_IDX.get(ord(m))
+            if idx is None:
+                return None
+            combination += total_combinations * idx
+            total_combinations *= Radio.SLEN
+
+        if combination >= Ball_Message.COMBINATIONS:
+            return None
+
+        values = []
+        for minimum, resolution, n in Ball_Message.FIELDS:
+            values.append(round(minimum + (combination % n) * resolution, 2))
+            combination //= n
+
+        sender, x, y, confidence, vx, vy, age_ms = values
+        return sender, np.array([x,y]), confidence, np.array([vx,vy]), age_ms
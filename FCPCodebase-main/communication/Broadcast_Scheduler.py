@@ -0,0 +1,85 @@
+class Round_Robin_Scheduler():
+    '''
+    Broadcast scheduler with fixed slots: each player owns one slot of `interval` ms, in descending order of unum
+    (a full cycle takes players*interval ms, even if most players cannot see the ball)
+
+    All schedulers decide the slot owner from the server time and from state that is shared by all teammates
+    (the reports heard by everyone), so that the team agrees without exchanging additional messages.
+    '''
+
+    def __init__(self, players:int=11, interval:int=40) -> None:
+        self.players = players
+        self.interval = interval       # slot duration (ms)
+        self.max_slots_per_cycle = 1   # maximum number of slots owned by the same player in one voting cycle
+
+    @property
+    def cycle_duration(self) -> int:
+        ''' Duration of a voting cycle (ms) '''
+        return self.players * self.interval
+
+    def report(self, unum:int, server_time:int, confidence:float):
+        ''' Register ball report from teammate `unum`, sent at `server_time` (ms) (ignored by this scheduler) '''
+        pass
+
+    def get_slot_owner(self, server_time:int) -> int:
+        ''' Returns unum of the player who owns the slot at `server_time` (ms) '''
+        cycle_position = (server_time // self.interval) % self.players
+        return self.players - cycle_position
+
+
+
+class Information_Scheduler(Round_Robin_Scheduler):
+    '''
+    Broadcast scheduler that assigns slots dynamically, based on the ball reports heard by the whole team
+
+    Each voting cycle has `cycle_slots` slots. Active players are the (at most cycle_slots-1) teammates
+    with the highest reported confidence (i.e. closest to the ball) among those who reported the ball in the last `window` ms.
+    The first slot of each cycle is an exploration slot, which is given to the inactive players in round-robin order,
+    so that players who start seeing the ball can join the active group.
+    The remaining slots are shared by the active players, in descending order of confidence
+    (a player may own several slots per cycle, in which case its newer votes replace the older ones).
+    If no player is active, all slots are exploration slots (same order as Round_Robin_Scheduler).
+
+    Note: players only agree on the slot owner if they heard the same reports.
+    The sender registers its own report immediately, and the others one step later (radio delay),
+    so reports are registered with the server time at which they were sent (messages are heard before the next slot).
+    '''
+
+    def __init__(self, players:int=11, interval:int=40, cycle_slots:int=3, window:int=None) -> None:
+        super().__init__(players, interval)
+        self.cycle_slots = cycle_slots
+        self.max_slots_per_cycle = cycle_slots - 1
+        self.window = 2 * cycle_slots * interval if window is None else window # reports older than this (ms) are ignored
+        self.report_time = [-1e9] * (players+1)      # server time (ms) of the last report of each player (index is unum)
+        self.report_confidence = [0.0] * (players+1) # confidence of the last report of each player (index is unum)
+
+    @property
+    def cycle_duration(self) -> int:
+        ''' Duration of a voting cycle (ms) '''
+        return self.cycle_slots * self.interval
+
+    def report(self, unum:int, server_time:int, confidence:float):
+        ''' Register ball report from teammate `unum`, sent at `server_time` (ms) '''
+        if 1 <= unum <= self.players and server_time >= self.report_time[unum]:
+            self.report_time[unum] = server_time
+            self.report_confidence[unum] = round(confidence, 2) # same resolution for sender and receivers
+
+    def get_active(self, server_time:int):
+        ''' Returns list of active players (unum) at `server_time`, sorted by descending confidence (ties are broken by unum) '''
+        recent = [u for u in range(1, self.players+1) if server_time - self.window < self.report_time[u] <= server_time]
+        recent.sort(key=lambda u: (-self.report_confidence[u], u))
+        return recent[:self.cycle_slots-1]
+
+    def get_slot_owner(self, server_time:int) -> int:
+        ''' Returns unum of the player who owns the slot at `server_time` (ms) '''
+        cycle, slot = divmod(server_time // self.interval, self.cycle_slots)
+        active = self.get_active(server_time)
+
+        if not active:
+            return super().get_slot_owner(server_time)
+
+        if slot > 0:
+            return active[(slot-1) % len(active)]
+
+        inactive = [u for u in range(self.players, 0, -1) if u not in active]
+        return inactive[cycle % len(inactive)] if inactive else active[0]
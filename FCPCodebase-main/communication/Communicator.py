@@ -1,8 +1,11 @@
+from communication.Ball_Message import Ball_Message
+from communication.Broadcast_Scheduler import Information_Scheduler
+from communication.Voting_Table import Voting_Table
+from logs.Comm_Logger import Comm_Logger
+from logs.Telemetry import Telemetry
 from world.World import World
 import numpy as np
 import logging
-import math
-import os
 
 np.set_printoptions(precision=2, suppress=True, floatmode="fixed")
 
@@ -14,39 +17,29 @@ class Communicator:
         self.last_global_update = 0
         self.broadcast_interval = 40   # ms
         self.r = world.robot
-        self.voting_group_list = []
         self.teammate = world.teammates
         self.confidence = 0.0
         self.last_reset_cycle = -1  
         self.cycle_completed = False 
         self.current_cycle = -1
         self.players = 11
+        self.voting_table = Voting_Table(self.players) # votes of the current cycle (one slot per teammate)
+        self.continuous_consensus = False              # if True, the ball position is updated after every vote, instead of once per cycle
+        self.compact_messages = True                   # if True, send Ball_Message (compact), otherwise send the legacy ASCII message (both are received)
+        self.radio_delay = 20                          # ms (messages are heard in the next step)
+        self.latency_compensation = True               # if True, votes are propagated to the current time (rolling ball model) before being fused
+        self.scheduler = Information_Scheduler(self.players, self.broadcast_interval) # decides slot owners and cycle duration (see Broadcast_Scheduler)
         self.broadcasted_this_cycle = False
         self.message_sent_count = 0
         self.message_received_count = 0
 
        
         # ------------------ Logging setup per agent ------------------
-        log_dir = "agent_logs"
-        os.makedirs(log_dir, exist_ok=True)
-
-        self.logger = logging.getLogger(f"Agent_{self.r.unum}")
-        self.logger.setLevel(logging.DEBUG)
-
-        if not self.logger.handlers:
-            # Main log (all levels, but INFO is minimum)
-            fh_main = logging.FileHandler(f"{log_dir}/agent_{self.r.unum}.log",mode="w")
-            fh_main.setLevel(logging.INFO)
-            fh_main.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
-
-            # Error log (only WARNING and ERROR)
-            fh_error = logging.FileHandler(f"{log_dir}/agent_{self.r.unum}_errors.log",mode="w")
-            fh_error.setLevel(logging.WARNING)
-            fh_error.setFormatter(logging.Formatter("%(asctime)s  %(message)s"))
-
-            # Add handlers
-            self.logger.addHandler(fh_main)
-            self.logger.addHandler(fh_error)
+        # Non-blocking structured logger: records are formatted and written by a background thread
+        # (level and format are configured with FCP_COMM_LOG_LEVEL and FCP_COMM_LOG_FORMAT, see Comm_Logger)
+        self.logger = Comm_Logger(self.r.unum)
+        # Binary telemetry of each ball update, loaded with Telemetry.load() (enabled by default, see FCP_TELEMETRY)
+        self.telemetry = Telemetry(self.r.unum)
 
     # ---------------- Ball state helpers ----------------
     def get_server_time(self):
@@ -70,11 +63,15 @@ class Communicator:
         return -15 <= x <= 15 and -10 <= y <= 10
 
     def ball_position_to_message(self, ball_pos, confidence):
-        ''' Converts ball position and confidence to a formatted message string. '''
+        ''' Converts ball position and confidence to a message string (compact Ball_Message or legacy ASCII format). '''
         if ball_pos is None:
             return None
         try:
             unum = self.r.unum
+            if self.compact_messages:
+                w = self.world
+                return Ball_Message.encode(unum, ball_pos, confidence, w.get_ball_abs_vel(6), w.time_local_ms - w.ball_abs_pos_last_update)
+
             x = round(float(ball_pos[0]), 2)
             y = round(float(ball_pos[1]), 2)
             c = round(float(confidence), 2)  
@@ -105,7 +102,7 @@ class Communicator:
     def get_current_communication_cycle(self):
         ''' Determines the current communication cycle based on server time. '''
         try:
-            return self.get_server_time() // (self.players * self.broadcast_interval)
+            return self.get_server_time() // self.scheduler.cycle_duration
         except (ZeroDivisionError, TypeError):
             return 0
     
@@ -114,48 +111,41 @@ class Communicator:
         new_cycle = self.get_current_communication_cycle()
         if new_cycle != self.current_cycle:
             if self.current_cycle != -1:
-                self.logger.info(
-                    f"[CYCLE_COMPLETE] Cycle {self.current_cycle} | "
-                    f"Messages Sent: {self.message_sent_count} | "
-                    f"Messages Received: {self.message_received_count}"
-                )
+                self.logger.debug("CYCLE_COMPLETE", agent=self.r.unum, cycle=self.current_cycle,
+                                  sent=self.message_sent_count, received=self.message_received_count)
                 self.update_ball_weighted_average()
-                self.voting_group_list = []
-                self.logger.info(f"[RESET] Voting list reset for cycle {new_cycle}")
+                self.voting_table.reset()
+                self.logger.debug("RESET", agent=self.r.unum, cycle=new_cycle)
             self.current_cycle = new_cycle
             self.broadcasted_this_cycle = False
             self.message_sent_count = 0
             self.message_received_count = 0
 
-    def add_to_voting_group(self, sender_id, ball_pos, confidence):
-        ''' Adds a ball position and confidence from a sender to the voting group. '''
+    def add_to_voting_group(self, sender_id, ball_pos, confidence, ball_vel=(0,0), obs_time=None):
+        ''' Adds a ball position and confidence from a sender to the voting group (obs_time: local time (ms) of the observation, default: now). '''
         try:
             if ball_pos is None or len(ball_pos) < 2:
                 return
-            ball_array = np.round(np.array([float(ball_pos[0]), float(ball_pos[1])], dtype=float), 2)
+            if not 1 <= sender_id <= self.players:
+                self.logger.warning("VOTING_ERROR", agent=self.r.unum, error="invalid sender", sender=sender_id)
+                return
+            x, y = round(float(ball_pos[0]), 2), round(float(ball_pos[1]), 2)
             confidence = round(float(confidence), 2)
-            for entry in self.voting_group_list:
-                if entry["sender"] == sender_id:
-                    return
-            entry = {"sender": sender_id, "ball_pos": ball_array, "confidence": confidence}
-            self.voting_group_list.append(entry)
+            obs_time = self.get_local_time() if obs_time is None else obs_time
+            if not self.voting_table.add(sender_id, x, y, confidence, obs_time, ball_vel, replace=True):
+                return # duplicate sender with older observation
+            sent_time = self.get_server_time() - (0 if sender_id == self.r.unum else self.radio_delay)
+            self.scheduler.report(sender_id, sent_time, confidence)
+            if self.continuous_consensus:
+                self.update_ball_weighted_average()
         except (ValueError, TypeError, IndexError) as e:
-            self.logger.warning(f"[VOTING_ERROR] Failed to add to voting group: {e}")
+            self.logger.warning("VOTING_ERROR", agent=self.r.unum, error=str(e))
 
     # ---------------- Communication Logic ----------------
-    def round_robin_communicator(self, current_time: int) -> int:
-        ''' Determines which player should broadcast at the given time. '''
-        try:
-            # Shift by half-interval to avoid boundary overlap
-            cycle_position = (current_time // self.broadcast_interval) % self.players
-            return self.players - cycle_position
-        except (ZeroDivisionError, TypeError):
-            return 0
-
     def should_broadcast_at_time(self, server_time: int) -> bool:
         ''' Checks if this agent should broadcast at the current server time. '''
         try:
-            slot_owner = self.round_robin_communicator(server_time) 
+            slot_owner = self.scheduler.get_slot_owner(server_time)
             return self.r.unum == slot_owner
         except AttributeError:
             return False
@@ -169,7 +159,7 @@ class Communicator:
            
             if (self.should_broadcast_at_time(server_time) and 
                 local_time - self.last_broadcast_time >= self.broadcast_interval):
-                if self.broadcasted_this_cycle:
+                if self.message_sent_count >= self.scheduler.max_slots_per_cycle:
                     return
         
                 if self.broadcast_ball_condition():
@@ -182,11 +172,11 @@ class Communicator:
                         if message_str is not None:
                             self.commit_announcement(message_str.encode("utf-8"))
                             self.message_sent_count += 1
-                            self.add_to_voting_group(self.r.unum, ball_pos, self.confidence)
+                            self.add_to_voting_group(self.r.unum, ball_pos, self.confidence, self.world.get_ball_abs_vel(6), self.world.ball_abs_pos_last_update)
                             self.last_broadcast_time = local_time 
                             self.broadcasted_this_cycle = True
         except Exception as e:
-            self.logger.error(f"[BROADCAST_ERROR] Agent {getattr(self.r, 'unum', 'unknown')} | {e}")
+            self.logger.error("BROADCAST_ERROR", agent=getattr(self.r, 'unum', None), error=str(e))
 
     def validate_ball_estimated(self, ball_pos):
         """This is to validate that the estimated ball position is within the field boundaries."""
@@ -200,75 +190,78 @@ class Communicator:
             return False
 
     def update_ball_weighted_average(self):
-        ''' Updates the ball position using a weighted average from voting group. '''
-        if not self.voting_group_list:
+        '''
+        Updates the ball position using a weighted average from voting group.
+        If latency_compensation is enabled, each vote is first propagated from its observation time to the current time,
+        and the fused velocity is also used to predict the ball path (World.ball_2d_pred_pos).
+        '''
+        if self.latency_compensation:
+            consensus = self.voting_table.predict_consensus(self.get_local_time()) # None if there are no votes, or total confidence is zero
+        else:
+            consensus = self.voting_table.get_consensus()
+        if consensus is None:
             return
         try:
-            group_sorted = sorted(self.voting_group_list, key=lambda e: e["sender"])
-
-            power = 2.0
-            total_confidence = math.fsum(entry["confidence"] ** power for entry in group_sorted)
-            if total_confidence == 0:
-                return
-
-            weighted_x = math.fsum(entry["ball_pos"][0] * (entry["confidence"] ** power) for entry in group_sorted)
-            weighted_y = math.fsum(entry["ball_pos"][1] * (entry["confidence"] ** power) for entry in group_sorted)
-            avg_x = weighted_x / total_confidence
-            avg_y = weighted_y / total_confidence
+            if self.latency_compensation:
+                (avg_x, avg_y), avg_vel = consensus
+            else:
+                avg_x, avg_y = consensus
 
             # Validate before updating
             if not self.validate_ball_estimated([avg_x, avg_y]):
-                self.logger.warning(
-                    f"[BALL_UPDATE_INVALID] Agent {self.r.unum} | "
-                    f"Estimated Ball=[{avg_x:.2f}, {avg_y:.2f}] is out of bounds."
-                )
+                self.logger.warning("BALL_UPDATE_INVALID", agent=self.r.unum, est_x=float(avg_x), est_y=float(avg_y))
                 return
 
-            # Find previous ball position sent by this agent
-            prev_ball_pos = None
-            for entry in group_sorted:
-                if entry["sender"] == self.r.unum:
-                    prev_ball_pos = entry["ball_pos"]
-                    break
-
-            # Get actual ball position from vision if available
-            actual_ball_pos = None
-            if self.world.ball_is_visible:
-                actual_ball_pos = self.world.ball_abs_pos[:2]
-
             if not self.world.ball_is_visible:
                 # Only update if ball is not visible
-                self.world.ball_abs_pos = np.array([avg_x, avg_y, 0.0])
-                self.world.ball_abs_pos_last_update = self.get_local_time()
-                self.world.is_ball_abs_pos_from_vision = False
+                if self.latency_compensation:
+                    self.world.set_ball_from_radio((avg_x, avg_y), avg_vel)
+                else:
+                    self.world.ball_abs_pos = np.array([avg_x, avg_y, 0.0])
+                    self.world.ball_abs_pos_last_update = self.get_local_time()
+                    self.world.is_ball_abs_pos_from_vision = False
 
-            agent_position = self.r.loc_head_position[:2]
-            self.logger.info(
-                f"[BALL_UPDATE] Agent {self.r.unum} | "
-                f"Sent ball={f'({round(prev_ball_pos[0], 2)}, {round(prev_ball_pos[1], 2)})' if prev_ball_pos is not None else 'N/A'} | "
-                f"Vision Ball={f'({round(actual_ball_pos[0], 2)}, {round(actual_ball_pos[1], 2)})' if actual_ball_pos is not None else 'N/A'} | "
-                f"Estimated Ball=[{avg_x:.2f}, {avg_y:.2f}] "
-                f"Agent Pos=({round(agent_position[0], 2)}, {round(agent_position[1], 2)})"
-            )
+            if self.telemetry.enabled or self.logger.is_enabled_for(logging.DEBUG):
+                prev_ball_pos = self.voting_table.get_vote(self.r.unum) # previous ball position sent by this agent
+                vision = self.world.ball_abs_pos if self.world.ball_is_visible else (None, None)
+                sent = (None, None) if prev_ball_pos is None else prev_ball_pos
+                agent_position = self.r.loc_head_position
+                self.telemetry.write(self.get_local_time(), self.get_server_time(), self.r.unum, self.current_cycle,
+                                     self.voting_table.get_senders(), self.message_sent_count, self.message_received_count,
+                                     vision[0], vision[1], avg_x, avg_y, sent[0], sent[1], agent_position[0], agent_position[1])
+                self.logger.debug("BALL_UPDATE", agent=self.r.unum, cycle=self.current_cycle,
+                                  sent_x=sent[0], sent_y=sent[1], vision_x=vision[0], vision_y=vision[1],
+                                  est_x=avg_x, est_y=avg_y, agent_x=agent_position[0], agent_y=agent_position[1])
         except Exception as e:
-            self.logger.error(f"[BALL_UPDATE_ERROR] Agent {getattr(self.r, 'unum', 'unknown')} | {e}")
+            self.logger.error("BALL_UPDATE_ERROR", agent=getattr(self.r, 'unum', None), error=str(e))
 
     def receive(self, msg: bytearray):
         ''' Processes a received message containing ball position data. '''
         self.check_and_handle_cycle_completion()
+        if msg[:1] == Ball_Message.PREFIX.encode():
+            data = Ball_Message.decode(msg)
+            if data is None:
+                self.logger.warning("RECEIVE_ERROR", agent=self.r.unum, error="invalid compact message", msg=bytes(msg).decode("ascii", "replace"))
+                return
+            sender_unum, ball_coords, confidence, ball_vel, age_ms = data
+            self.message_received_count += 1
+            obs_time = self.get_local_time() - self.radio_delay - age_ms
+            self.add_to_voting_group(sender_unum, ball_coords, confidence, ball_vel, obs_time)
+            return
+
         decoded = msg.decode("utf-8")
         if not decoded.startswith("A"):
             return
         try:
             if ":" not in decoded:
-                self.logger.warning(f"[RECEIVE_ERROR] Invalid message format: {decoded}")
+                self.logger.warning("RECEIVE_ERROR", agent=self.r.unum, error="invalid message format", msg=decoded)
                 return
             header, coords = decoded[1:].split(":", 1)
             sender_unum = int(header)
 
             coord_parts = coords.split(",")
             if len(coord_parts) != 3:
-                self.logger.warning(f"[RECEIVE_ERROR] Invalid coordinates format: {coords}")
+                self.logger.warning("RECEIVE_ERROR", agent=self.r.unum, error="invalid coordinates format", msg=decoded)
                 return
                 
             x_str, y_str, c_str = coord_parts
@@ -278,4 +271,4 @@ class Communicator:
             self.add_to_voting_group(sender_unum, ball_coords, confidence)
             
         except (ValueError, TypeError) as e:
-            self.logger.warning(f"[RECEIVE_ERROR] Failed to process message '{decoded}': {e}")
+            self.logger.warning("RECEIVE_ERROR", agent=self.r.unum, error=str(e), msg=decoded)
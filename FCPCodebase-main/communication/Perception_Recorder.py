@@ -0,0 +1,80 @@
+import json
+import struct
+
+
+class Perception_Recorder():
+    '''
+    Records raw perceptor messages to a compact binary file, so that they can be replayed without a server
+
+    File format:
+        - magic bytes b'FCPREC1\n'
+        - header size (uint32, big-endian) + header (utf-8 json with the agent's unum, robot type and team name)
+        - sequence of frames, where each frame is: local step (uint32, big-endian) + message size (uint32, big-endian) + message
+
+    The file is buffered, so the last frames may be lost if the process is killed before close() is called.
+    The reader ignores incomplete frames at the end of the file.
+    '''
+    MAGIC = b'FCPREC1\n'
+    FRAME_HEADER = struct.Struct(">II")
+    SIZE = struct.Struct(">I")
+
+    def __init__(self, filename:str, unum:int, robot_type:int, team_name:str) -> None:
+        self.file = open(filename, "wb")
+        header = json.dumps({"unum":unum, "robot_type":robot_type, "team_name":team_name}).encode()
+        self.file.write(Perception_Recorder.MAGIC + Perception_Recorder.SIZE.pack(len(header)) + header)
+        self.no_of_frames = 0
+
+    def write(self, step:int, msg) -> None:
+        '''
+        Write frame to file
+
+        Parameters
+        ----------
+        step : int
+            local step of the agent when the message was received (World.step)
+        msg : bytes or bytearray
+            perceptor message, without the size prefix
+        '''
+        self.file.write(Perception_Recorder.FRAME_HEADER.pack(step, len(msg)))
+        self.file.write(msg)
+        self.no_of_frames += 1
+
+    def close(self) -> None:
+        if not self.file.closed:
+            self.file.close()
+
+    @staticmethod
+    def read_header(filename:str) -> dict:
+        ''' Returns recording header: {"unum":int, "robot_type":int, "team_name":str} '''
+        with open(filename, "rb") as f:
+            return Perception_Recorder._read_header(f)
+
+    @staticmethod
+    def _read_header(f) -> dict:
+        if f.read(len(Perception_Recorder.MAGIC)) != Perception_Recorder.MAGIC:
+            raise ValueError(f"'{f.name}' is not a perception recording!")
+        size, = Perception_Recorder.SIZE.unpack(f.read(Perception_Recorder.SIZE.size))
+        return json.loads(f.read(size))
+
+    @staticmethod
+    def read_frames(filename:str):
+        '''
+        Generator of recorded frames
+
+        Yields
+        ------
+        step : int
+            local step of the agent when the message was received
+        msg : bytearray
+            perceptor message, without the size prefix
+        '''
+        fh = Perception_Recorder.FRAME_HEADER
+        with open(filename, "rb") as f:
+            Perception_Recorder._read_header(f)
+            while True:
+                header = f.read(fh.size)
+                if len(header) < fh.size: return
+                step, size = fh.unpack(header)
+                msg = bytearray(f.read(size))
+                if len(msg) < size: return # incomplete frame at the end of the file
+                yield step, msg
@@ -0,0 +1,238 @@
+import numpy as np
+
+
+class Perception_Tokenizer():
+    '''
+    Single-pass tokenizer for the perceptor messages sent by rcssserver3d
+
+    The whole S-expression is split into tokens by a single bytes.split() call (which runs at C speed),
+    and then all values are copied, in one walk over the token list, to typed buffers that are
+    preallocated once and reused for every message. No world state is changed here, so if a message
+    cannot be tokenized (an exception is raised), the caller can still fall back to a different parser.
+
+    The buffers hold raw server values (original reference frames) and are only valid until the next
+    call to tokenize(). Buffers with a counter (e.g. hj_count) are only valid up to that counter.
+    '''
+
+    SIMPLE_ROOTS = {b'time', b'GS', b'GYR', b'ACC', b'HJ', b'FRP'} # root elements whose children are: ( name values... )
+    LANDMARKS = {b'G1R', b'G2R', b'G1L', b'G2L', b'F1R', b'F2R', b'F1L', b'F2L'}
+    BODY_PARTS = ('head','llowerarm','rlowerarm','lfoot','rfoot')
+    BODY_PART_TO_INDEX = {b'head':0, b'llowerarm':1, b'rlowerarm':2, b'lfoot':3, b'rfoot':4}
+    MAX_JOINTS = 32
+    MAX_FEET_TOES = 4
+    MAX_PLAYERS = 22
+    MAX_LINES = 30
+
+    def __init__(self) -> None:
+        self.time_now = None                                # server time, or None if absent
+        self.gs_team = None                                 # team side (b'left'/b'right'), or None if absent
+        self.gs_sl = None                                   # left team score, or None if absent
+        self.gs_sr = None                                   # right team score, or None if absent
+        self.gs_t = None                                    # game time, or None if absent
+        self.gs_pm = None                                   # play mode (str), or None if absent
+        self.gyr = np.zeros(3)                              # gyroscope (x,y,z)
+        self.has_gyr = False
+        self.acc = np.zeros(3)                              # accelerometer (x,y,z)
+        self.has_acc = False
+        self.hj_names = [None] * self.MAX_JOINTS            # joint perceptor names (bytes)
+        self.hj_angles = np.zeros(self.MAX_JOINTS)          # joint angles (deg)
+        self.hj_count = 0
+        self.frp_names = [None] * self.MAX_FEET_TOES        # foot/toe names (bytes)
+        self.frp = np.zeros((self.MAX_FEET_TOES,6))         # contact point + force vector (cx,cy,cz,fx,fy,fz)
+        self.frp_count = 0
+        self.see_is_present = False                         # True if message contains vision information
+        self.landmark_tags = [None] * len(self.LANDMARKS)   # corner flags and goal posts names (bytes)
+        self.landmarks = np.zeros((len(self.LANDMARKS),3))  # corner flags and goal posts (spherical coordinates)
+        self.landmark_count = 0
+        self.ball = np.zeros(3)                             # ball (spherical coordinates)
+        self.has_ball = False
+        self.mypos = np.zeros(3)                            # cheat: absolute head position
+        self.has_mypos = False
+        self.myorien = None                                 # cheat: absolute head orientation, or None if absent
+        self.ballpos = np.zeros(3)                          # cheat: absolute ball position
+        self.has_ballpos = False
+        self.player_teams = [None] * self.MAX_PLAYERS       # team name of each visible player (bytes)
+        self.player_ids = np.zeros(self.MAX_PLAYERS, int)   # uniform number of each visible player
+        self.player_parts = np.zeros((self.MAX_PLAYERS,len(self.BODY_PARTS),3))         # body parts (spherical coordinates)
+        self.player_parts_mask = np.zeros((self.MAX_PLAYERS,len(self.BODY_PARTS)), bool) # True if body part is visible
+        self.player_count = 0
+        self.lines = np.zeros((self.MAX_LINES,6))           # field lines, start+end (spherical coordinates)
+        self.line_count = 0
+        self.hear = []                                      # list of (team, timestamp, direction, message), direction is b'self' or float
+        self.unknown_tags = []                              # list of (parent tag, unknown tag)
+
+
+    def tokenize(self, exp) -> None:
+        '''
+        Tokenize perceptor message and fill internal buffers
+
+        Parameters
+        ----------
+        exp : bytes or bytearray
+            perceptor message, without the size prefix
+
+        Raises
+        ------
+        ValueError or IndexError
+            if the message structure is unexpected or a value cannot be converted
+        '''
+        t = bytes(exp).replace(b'(', b' ( ').replace(b')', b' ) ').split() # parentheses and sequences of chars without whitespace
+        n = len(t)
+
+        self.time_now = self.gs_team = self.gs_sl = self.gs_sr = self.gs_t = self.gs_pm = self.myorien = None
+        self.has_gyr = self.has_acc = self.see_is_present = self.has_ball = self.has_mypos = self.has_ballpos = False
+        self.hj_count = self.frp_count = self.landmark_count = self.player_count = self.line_count = 0
+        self.hear.clear()
+        self.unknown_tags.clear()
+
+        i = 0
+        while i < n: # every root element has the form: ( tag ... )
+            if t[i] != b'(': raise ValueError(f"Expected root element at token {i}")
+            tag = t[i+1]
+            i += 2
+
+            if tag == b'hear': # (hear team timestamp self/direction message)
+                self.hear.append((t[i], float(t[i+1]), b'self' if t[i+2][0] == 115 else float(t[i+2]), t[i+3])) # 115 is 's'
+                i += 4
+            elif tag == b'See':
+                self.see_is_present = True
+                i = self._tokenize_see(t, i)
+            elif tag not in Perception_Tokenizer.SIMPLE_ROOTS:
+                self.unknown_tags.append((b'', tag))
+                i = self._skip_element(t, i-2)
+                continue
+            else:
+                while t[i] == b'(': # simple elements: ( name values... )
+                    name = t[i+1]
+                    i += 2
+
+                    if tag == b'HJ':
+                        if name == b'n':
+                            self.hj_names[self.hj_count] = t[i]
+                        elif name == b'ax':
+                            self.hj_angles[self.hj_count] = float(t[i])
+                            self.hj_count += 1
+                        else:
+                            self.unknown_tags.append((tag, name))
+                    elif tag == b'FRP':
+                        if name == b'n':
+                            self.frp_names[self.frp_count] = t[i]
+                            self.frp_count += 1
+                        elif name == b'c':
+                            self.frp[self.frp_count-1,0:3] = float(t[i]), float(t[i+1]), float(t[i+2])
+                        elif name == b'f':
+                            self.frp[self.frp_count-1,3:6] = float(t[i]), float(t[i+1]), float(t[i+2])
+                        else:
+                            self.unknown_tags.append((tag, name))
+                    elif tag == b'GYR':
+                        if name == b'rt':
+                            self.gyr[:] = float(t[i]), float(t[i+1]), float(t[i+2])
+                            self.has_gyr = True
+                        elif name != b'n':
+                            self.unknown_tags.append((tag, name))
+                    elif tag == b'ACC':
+                        if name == b'a':
+                            self.acc[:] = float(t[i]), float(t[i+1]), float(t[i+2])
+                            self.has_acc = True
+                        elif name != b'n':
+                            self.unknown_tags.append((tag, name))
+                    elif tag == b'time':
+                        if name == b'now':
+                            self.time_now = float(t[i])
+                        else:
+                            self.unknown_tags.append((tag, name))
+                    elif tag == b'GS':
+                        if name == b't':
+                            self.gs_t = float(t[i])
+                        elif name == b'pm':
+                            self.gs_pm = t[i].decode()
+                        elif name == b'team':
+                            self.gs_team = t[i]
+                        elif name == b'sl':
+                            self.gs_sl = int(t[i])
+                        elif name == b'sr':
+                            self.gs_sr = int(t[i])
+                        elif name != b'unum': # we already know our unum
+                            self.unknown_tags.append((tag, name))
+
+                    while t[i] != b')': i += 1 # skip values
+                    i += 1
+
+            if t[i] != b')': raise ValueError(f"Expected end of '{tag}' at token {i}")
+            i += 1
+
+
+    def _skip_element(self, t, i) -> int:
+        ''' Skip element that starts at token i, returns index of next token '''
+        depth = 0
+        while True:
+            if t[i] == b'(':
+                depth += 1
+            elif t[i] == b')':
+                depth -= 1
+                if depth == 0: return i + 1
+            i += 1
+
+
+    def _tokenize_see(self, t, i) -> int:
+        ''' Tokenize children of 'See' element starting at token i, returns index of closing token '''
+
+        while t[i] == b'(':
+            tag = t[i+1]
+
+            if tag in Perception_Tokenizer.LANDMARKS: # ( tag ( pol a b c ) )
+                k = self.landmark_count
+                self.landmark_tags[k] = tag
+                self.landmarks[k] = float(t[i+4]), float(t[i+5]), float(t[i+6])
+                self.landmark_count += 1
+                i += 9
+            elif tag == b'B': # ( B ( pol a b c ) )
+                self.ball[:] = float(t[i+4]), float(t[i+5]), float(t[i+6])
+                self.has_ball = True
+                i += 9
+            elif tag == b'P': # ( P ( team name ) ( id n ) ( part ( pol a b c ) )... )
+                k = self.player_count
+                self.player_parts_mask[k] = False
+                i += 2
+                while t[i] == b'(':
+                    name = t[i+1]
+                    if name == b'team':
+                        self.player_teams[k] = t[i+2]
+                        i += 4
+                    elif name == b'id':
+                        self.player_ids[k] = int(t[i+2])
+                        i += 4
+                    elif name in Perception_Tokenizer.BODY_PART_TO_INDEX:
+                        bp = Perception_Tokenizer.BODY_PART_TO_INDEX[name]
+                        self.player_parts[k,bp] = float(t[i+4]), float(t[i+5]), float(t[i+6])
+                        self.player_parts_mask[k,bp] = True
+                        i += 9
+                    else:
+                        self.unknown_tags.append((b'P', name))
+                        i = self._skip_element(t, i)
+                self.player_count += 1
+                i += 1
+            elif tag == b'L': # ( L ( pol a b c ) ( pol d e f ) )
+                k = self.line_count
+                self.lines[k] = (float(t[i+4]), float(t[i+5]), float(t[i+6]), float(t[i+10]), float(t[i+11]), float(t[i+12]))
+                self.line_count += 1
+                i += 15
+            elif tag == b'mypos': # ( mypos x y z )
+                self.mypos[:] = float(t[i+2]), float(t[i+3]), float(t[i+4])
+                self.has_mypos = True
+                i += 6
+            elif tag == b'myorien': # ( myorien o )
+                self.myorien = float(t[i+2])
+                i += 4
+            elif tag == b'ballpos': # ( ballpos x y z )
+                self.ballpos[:] = float(t[i+2]), float(t[i+3]), float(t[i+4])
+                self.has_ballpos = True
+                i += 6
+            else:
+                self.unknown_tags.append((b'See', tag))
+                i = self._skip_element(t, i)
+                continue
+
+            if t[i-1] != b')': raise ValueError(f"Unexpected structure inside 'See' element '{tag}'")
+
+        return i
@@ -1,20 +1,25 @@
+from communication.Perception_Recorder import Perception_Recorder
 from communication.World_Parser import World_Parser
 from itertools import count
 from select import select
 from sys import exit
 from world.World import World
+import os
 import socket
+import struct
 import time
 
 class Server_Comm():
     monitor_socket = None
+    MSG_SIZE = struct.Struct(">I") # size prefix of every message
+    record_folder = None # if not None, every received message is recorded to '<record_folder>/<team_name>_<unum>.rec' (see Perception_Recorder)
 
     def __init__(self, host:str, agent_port:int, monitor_port:int, unum:int, robot_type:int, team_name:str,
                  world_parser:World_Parser, world:World, other_players, wait_for_server=True) -> None:
 
         self.BUFFER_SIZE = 8192
         self.rcv_buff = bytearray(self.BUFFER_SIZE)
-        self.send_buff = []
+        self.send_buff = bytearray(4) # committed messages, preceded by 4 bytes reserved for the message length
         self.world_parser = world_parser
         self.unum = unum
 
@@ -22,6 +27,11 @@ class Server_Comm():
         self._unofficial_beam_msg_left  = "(agent (unum " + str(unum) + ") (team Left) (move " 
         self._unofficial_beam_msg_right = "(agent (unum " + str(unum) + ") (team Right) (move " 
         self.world = world
+        self.recorder = None
+
+        if Server_Comm.record_folder is not None:
+            os.makedirs(Server_Comm.record_folder, exist_ok=True)
+            self.recorder = Perception_Recorder(os.path.join(Server_Comm.record_folder, f"{team_name}_{unum}.rec"), unum, robot_type, team_name)
 
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM )
 
@@ -105,12 +115,16 @@ class Server_Comm():
                 print("\nError: socket was closed by rcssserver3d!")
                 exit()
 
+            if self.recorder is not None:
+                self.recorder.write(self.world.step + 1, memoryview(self.rcv_buff)[:msg_size]) # step after parsing this message
+
             self.world_parser.parse(self.rcv_buff[:msg_size])
             if len(select([self.socket],[],[], 0.0)[0]) == 0: break
 
         if update:
-            if i==1: self.world.log( "Server_Comm.py: The agent lost 1 packet! Is syncmode enabled?")
-            if  i>1: self.world.log(f"Server_Comm.py: The agent lost {i} consecutive packets! Is syncmode disabled?")
+            if i>0 and self.world.logger.enabled: # skip formatting if logging is disabled
+                if i==1: self.world.log( "Server_Comm.py: The agent lost 1 packet! Is syncmode enabled?")
+                if  i>1: self.world.log(f"Server_Comm.py: The agent lost {i} consecutive packets! Is syncmode disabled?")
             self.world.update()
 
             if len(select([self.socket],[],[], 0.0)[0]) != 0:
@@ -130,22 +144,27 @@ class Server_Comm():
     def send(self) -> None:
         ''' Send all committed messages '''
         if len(select([self.socket],[],[], 0.0)[0]) == 0:
-            self.send_buff.append(b'(syn)')
-            self.send_immediate( b''.join(self.send_buff) )
+            self.send_buff += b'(syn)'
+            Server_Comm.MSG_SIZE.pack_into(self.send_buff, 0, len(self.send_buff)-4) #Add message length in the first 4 bytes
+            try:
+                self.socket.send( self.send_buff )
+            except BrokenPipeError:
+                print("\nError: socket was closed by rcssserver3d!")
+                exit()
         else:
             self.world.log("Server_Comm.py: Received a new packet while thinking!")
-        self.send_buff = [] #clear buffer
+        del self.send_buff[4:] #clear buffer (the allocated memory is reused)
 
     def commit(self, msg:bytes) -> None:
         assert type(msg) == bytes, "Message must be of type Bytes!"
-        self.send_buff.append(msg)
+        self.send_buff += msg
 
     def commit_and_send(self, msg:bytes = b'') -> None:
         self.commit(msg)
         self.send()
 
     def clear_buffer(self) -> None:
-        self.send_buff = []
+        del self.send_buff[4:]
 
     def commit_announcement(self, msg:bytes) -> None:
         '''
@@ -279,6 +298,8 @@ class Server_Comm():
     def close(self, close_monitor_socket = False):
         ''' Close agent socket, and optionally the monitor socket (shared by players running on the same thread) '''
         self.socket.close()
+        if self.recorder is not None:
+            self.recorder.close()
         if close_monitor_socket and Server_Comm.monitor_socket is not None:
             Server_Comm.monitor_socket.close()
             Server_Comm.monitor_socket = None
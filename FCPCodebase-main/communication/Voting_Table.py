@@ -0,0 +1,106 @@
+from cpp.ball_predictor import ball_predictor
+import numpy as np
+
+
+class Voting_Table():
+    '''
+    Fixed-slot voting table for the collaborative ball position, with one slot per teammate (indexed by unum)
+
+    Each vote has a 2D position, a 2D velocity, a confidence and a timestamp. The weighted consensus (weight = confidence^power)
+    is maintained incrementally with running sums, so adding a vote, rejecting (or replacing) a duplicate sender,
+    and reading the consensus are O(1) operations.
+    '''
+
+    def __init__(self, players:int=11, power:float=2.0) -> None:
+        self.power = power
+        self.pos = np.zeros((players,2))         # ball position of each vote
+        self.vel = np.zeros((players,2))         # ball velocity of each vote
+        self.confidence = np.zeros(players)      # confidence of each vote
+        self.time = np.zeros(players, np.int64)  # timestamp (ms) of each vote
+        self.valid = np.zeros(players, bool)     # True if slot has a vote
+        self.count = 0                           # number of votes
+        self.sum_w = 0.0                         # sum of weights
+        self.sum_wx = 0.0                        # sum of weighted x coordinates
+        self.sum_wy = 0.0                        # sum of weighted y coordinates
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, unum:int) -> bool:
+        return bool(self.valid[unum-1])
+
+    def add(self, unum:int, x:float, y:float, confidence:float, time:int=0, vel=(0,0), replace:bool=False) -> bool:
+        '''
+        Add vote from teammate `unum` (`time` is the local time (ms) of the ball observation)
+
+        Parameters
+        ----------
+        replace : bool
+            if True, a previous vote from teammate `unum` is replaced by this vote, unless this vote is older
+
+        Returns
+        -------
+        added : bool
+            False if the vote was ignored (teammate `unum` has already voted and `replace` is False, or the previous vote is newer)
+        '''
+        i = unum - 1
+        if self.valid[i]:
+            if not replace or time < self.time[i]:
+                return False
+            w = self.confidence[i] ** self.power # remove previous vote
+            self.count -= 1
+            self.sum_w -= w
+            self.sum_wx -= w * self.pos[i,0]
+            self.sum_wy -= w * self.pos[i,1]
+        w = confidence ** self.power
+        self.pos[i] = (x,y)
+        self.vel[i] = vel[:2]
+        self.confidence[i] = confidence
+        self.time[i] = time
+        self.valid[i] = True
+        self.count += 1
+        self.sum_w += w
+        self.sum_wx += w * x
+        self.sum_wy += w * y
+        return True
+
+    def get_vote(self, unum:int):
+        ''' Returns ball position of the vote of teammate `unum`, or None if it has not voted '''
+        return self.pos[unum-1] if self.valid[unum-1] else None
+
+    def get_senders(self) -> int:
+        ''' Returns bit mask of the teammates who voted (bit i is set if teammate i+1 voted) '''
+        return sum(1 << int(i) for i in np.flatnonzero(self.valid))
+
+    def get_consensus(self):
+        ''' Returns weighted average of the ball position (x,y), or None if there are no votes or the total weight is zero '''
+        if self.sum_w == 0:
+            return None
+        return (self.sum_wx / self.sum_w, self.sum_wy / self.sum_w)
+
+    def predict_consensus(self, time:int):
+        '''
+        Weighted average of the ball position and velocity of all votes, after propagating each vote
+        from its observation time to `time` (ms) with the rolling ball model (a single batched call to cpp/ball_predictor)
+
+        Returns
+        -------
+        consensus : tuple or None
+            (position, velocity) as 2D numpy arrays, or None if there are no votes or the total weight is zero
+        '''
+        rows = np.flatnonzero(self.valid)
+        w = self.confidence[rows] ** self.power
+        sum_w = np.sum(w)
+        if sum_w == 0:
+            return None
+        steps = np.maximum(np.round((time - self.time[rows]) / 20), 0) # 1 step = 0.02s
+        params = np.column_stack((self.pos[rows], self.vel[rows], steps)).astype(np.float32).ravel()
+        states = ball_predictor.advance_rolling_balls(params).reshape(-1,4)
+        fused = w @ states / sum_w
+        return fused[:2], fused[2:]
+
+    def reset(self):
+        ''' Remove all votes '''
+        self.valid[:] = False
+        self.count = 0
+        self.sum_w = self.sum_wx = self.sum_wy = 0.0
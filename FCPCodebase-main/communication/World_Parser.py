@@ -1,17 +1,29 @@
+from communication.Perception_Tokenizer import Perception_Tokenizer
 from math_ops.Math_Ops import Math_Ops as M
 from world.Robot import Robot
 from world.World import World
+from world.commons.Other_Robot import Other_Robot
 import math
 import numpy as np
 
 
 class World_Parser():
+    FRP_ORDER = [1,0,2,4,3,5]                   # conversion of FRP contact point and force vector to new reference frame
+    FRP_SIGNS = np.array([1,-1,1,1,-1,1], float) # (see parse_bytes for reference frames)
+    NO_BODY_PARTS = np.zeros((0,3))                 # World.visible_body_parts_rel_pos when no other robot is visible
+    NO_BODY_PARTS_INFO = np.zeros(0, int)           # World.visible_body_parts_owner/type when no other robot is visible
+    TOKENIZER_PART_TYPES = np.array([Other_Robot.BODY_PART_INDEX[name] for name in Perception_Tokenizer.BODY_PARTS]) # Perception_Tokenizer column -> Other_Robot.BODY_PARTS index
+
     def __init__(self, world:World, hear_callback) -> None:
         self.LOG_PREFIX = "World_Parser.py: "
         self.world = world
         self.hear_callback = hear_callback
         self.exp = None
         self.depth = None
+        self.tokenizer = Perception_Tokenizer()
+        self.hj_names = None   # joint names order of last message (the server always uses the same order)
+        self.hj_indices = None # joint indices, according to self.hj_names
+        self.hj_signs = None   # joint angle signs, according to self.hj_names
         self.LEFT_SIDE_FLAGS = {b'F2L':(-15,-10,0),
                                 b'F1L':(-15,+10,0),
                                 b'F2R':(+15,-10,0),
@@ -28,6 +40,9 @@ class World_Parser():
                                  b'G1L':(+15,-1.05,0.8),
                                  b'G2R':(-15,+1.05,0.8),
                                  b'G1R':(-15,-1.05,0.8)}  
+        landmark_rows = {pos:i for i,pos in enumerate(World.FLAGS_CORNERS_POS + World.FLAGS_POSTS_POS)} # row of each landmark in World.landmarks
+        self.LEFT_SIDE_FLAG_ROWS  = {tag:landmark_rows[pos] for tag,pos in self.LEFT_SIDE_FLAGS.items()}
+        self.RIGHT_SIDE_FLAG_ROWS = {tag:landmark_rows[pos] for tag,pos in self.RIGHT_SIDE_FLAGS.items()}
         self.play_mode_to_id = None
         self.LEFT_PLAY_MODE_TO_ID = {"KickOff_Left":World.M_OUR_KICKOFF, "KickIn_Left":World.M_OUR_KICK_IN, "corner_kick_left":World.M_OUR_CORNER_KICK,
                                     "goal_kick_left":World.M_OUR_GOAL_KICK, "free_kick_left":World.M_OUR_FREE_KICK, "pass_left":World.M_OUR_PASS,
@@ -61,7 +76,8 @@ class World_Parser():
         try:
             retval = float(self.exp[start:end])
         except:
-            self.world.log(f"{self.LOG_PREFIX}String to float conversion failed: {self.exp[start:end]} at msg[{start},{end}], \nMsg: {self.exp.decode()}")
+            if self.world.logger.enabled:
+                self.world.log(f"{self.LOG_PREFIX}String to float conversion failed: {self.exp[start:end]} at msg[{start},{end}], \nMsg: {self.exp.decode()}")
             retval = 0
         return retval, end
 
@@ -96,15 +112,18 @@ class World_Parser():
         end = self.find_char(start, ord(" ")) 
         return self.exp[start:end], end, min_depth
      
-    def parse(self, exp):
-
-        self.exp = exp #used by other member functions
-        self.depth = 0 #xml element depth
+    def _reset_step(self):
+        ''' Reset variables that are updated at every server message '''
         self.world.step += 1
         self.world.line_count = 0
         self.world.robot.frp = dict()
         self.world.flags_posts = dict()
         self.world.flags_corners = dict()
+        self.world.landmarks[:,0] = 0
+        self.world.landmarks[:,5:8] = 0
+        self.world.visible_body_parts_rel_pos = World_Parser.NO_BODY_PARTS
+        self.world.visible_body_parts_owner = World_Parser.NO_BODY_PARTS_INFO
+        self.world.visible_body_parts_type = World_Parser.NO_BODY_PARTS_INFO
         self.world.vision_is_up_to_date = False
         self.world.ball_is_visible = False
         self.world.robot.feet_toes_are_touching = dict.fromkeys(self.world.robot.feet_toes_are_touching, False)
@@ -113,6 +132,214 @@ class World_Parser():
         for p in self.world.teammates: p.is_visible = False
         for p in self.world.opponents: p.is_visible = False
 
+    def parse(self, exp):
+        '''
+        Parse server message and update world state
+
+        The message is tokenized in a single pass by the Perception_Tokenizer, and then its buffers are
+        applied to the world. If the message cannot be tokenized, it is parsed by the byte-by-byte parser.
+        '''
+        try:
+            self.tokenizer.tokenize(exp)
+        except (ValueError, IndexError):
+            if self.world.logger.enabled:
+                self.world.log(f"{self.LOG_PREFIX}Tokenizer failed, falling back to byte-by-byte parser, \nMsg: {exp.decode()}")
+            self.parse_bytes(exp)
+            return
+
+        self._reset_step()
+        self._apply_tokens(exp)
+
+    def _apply_tokens(self, exp):
+        ''' Update world state from the tokenizer buffers '''
+        p = self.tokenizer
+        w = self.world
+        r = w.robot
+
+        if w.logger.enabled: # skip formatting if logging is disabled
+            for parent, tag in p.unknown_tags:
+                if parent:
+                    self.world.log(f"{self.LOG_PREFIX}Unknown tag inside '{parent.decode()}': {tag}, \nMsg: {exp.decode()}")
+                else:
+                    self.world.log(f"{self.LOG_PREFIX}Unknown root tag: {tag}, \nMsg: {exp.decode()}")
+
+        #------------------------ time & game state
+
+        if p.time_now is not None:
+            w.time_server = p.time_now
+
+        if p.gs_team is not None:
+            is_left = bool(p.gs_team == b'left')
+            if w.team_side_is_left != is_left:
+                w.team_side_is_left = is_left
+                self.play_mode_to_id = self.LEFT_PLAY_MODE_TO_ID if is_left else self.RIGHT_PLAY_MODE_TO_ID
+                w.draw.set_team_side(not is_left)
+                w.team_draw.set_team_side(not is_left)
+
+        if p.gs_sl is not None:
+            if w.team_side_is_left: w.goals_scored   = p.gs_sl
+            else:                   w.goals_conceded = p.gs_sl
+
+        if p.gs_sr is not None:
+            if w.team_side_is_left: w.goals_conceded = p.gs_sr
+            else:                   w.goals_scored   = p.gs_sr
+
+        if p.gs_t is not None:
+            w.time_game = p.gs_t
+
+        if p.gs_pm is not None and self.play_mode_to_id is not None:
+            w.play_mode = self.play_mode_to_id[p.gs_pm]
+
+        #------------------------ gyroscope & accelerometer (see parse_bytes for reference frames)
+
+        if p.has_gyr:
+            r.gyro[:] = p.gyr[1], -p.gyr[0], p.gyr[2]
+
+        if p.has_acc:
+            r.acc[:] = p.acc[1], -p.acc[0], p.acc[2]
+
+        #------------------------ joints
+
+        if p.hj_count > 0:
+            n = p.hj_count
+            if p.hj_names[:n] != self.hj_names:      # the joints order is constant, so this is only done once
+                self.hj_names = p.hj_names[:n]
+                names = [j.decode() for j in self.hj_names]
+                self.hj_indices = np.array([Robot.MAP_PERCEPTOR_TO_INDEX[j] for j in names])
+                self.hj_signs = np.array([-1 if j in Robot.FIX_PERCEPTOR_SET else 1 for j in names]) #Fix symmetry issues 2/4 (perceptors)
+
+            idx = self.hj_indices
+            angles = p.hj_angles[:n] * self.hj_signs
+            r.joints_speed[idx] = (angles - r.joints_position[idx]) * (math.pi / 180 / World.STEPTIME)
+            r.joints_position[idx] = angles
+
+        #------------------------ foot resistance perceptors (see parse_bytes for reference frames)
+
+        for k in range(p.frp_count):
+            foot_toe_id = p.frp_names[k].decode()
+            r.frp[foot_toe_id] = p.frp[k, World_Parser.FRP_ORDER] * World_Parser.FRP_SIGNS
+            r.feet_toes_last_touch[foot_toe_id] = w.time_local_ms
+            r.feet_toes_are_touching[foot_toe_id] = True
+
+        #------------------------ vision
+
+        if p.see_is_present:
+            w.vision_is_up_to_date = True
+            w.vision_last_update = w.time_local_ms
+
+            flags, rows = (self.LEFT_SIDE_FLAGS, self.LEFT_SIDE_FLAG_ROWS) if w.team_side_is_left else (self.RIGHT_SIDE_FLAGS, self.RIGHT_SIDE_FLAG_ROWS)
+            for k in range(p.landmark_count):
+                tag = p.landmark_tags[k]
+                if tag[0] == 71: # 71 is 'G'
+                    w.flags_posts[flags[tag]] = tuple(p.landmarks[k].tolist())
+                else:
+                    w.flags_corners[flags[tag]] = tuple(p.landmarks[k].tolist())
+            if p.landmark_count > 0: # all landmarks are copied to World.landmarks at once
+                landmark_rows = [rows[tag] for tag in p.landmark_tags[:p.landmark_count]]
+                w.landmarks[landmark_rows,0] = 1
+                w.landmarks[landmark_rows,5:8] = p.landmarks[:p.landmark_count]
+
+            if p.has_ball:
+                w.ball_rel_head_sph_pos[:] = p.ball
+                w.ball_rel_head_cart_pos = M.deg_sph2cart(w.ball_rel_head_sph_pos)
+
+                if np.linalg.norm(w.ball_rel_head_cart_pos) > w.MAX_BALL_DISTANCE: # maximum distance at which the ball is considered visible (m)
+                    w.ball_is_visible = False
+                else:
+                    w.ball_is_visible = True
+                    w.ball_last_seen = w.time_local_ms
+
+            if p.has_mypos:
+                r.cheat_abs_pos[:] = p.mypos
+
+            if p.myorien is not None:
+                r.cheat_ori = p.myorien
+
+            if p.has_ballpos:
+                w.ball_cheat_abs_vel[:] = (p.ballpos - w.ball_cheat_abs_pos) / World.VISUALSTEP
+                w.ball_cheat_abs_pos[:] = p.ballpos
+
+            if p.player_count > 0:
+                self._apply_players(p)
+
+            lines = p.lines[:p.line_count]
+            is_valid = ~np.isnan(lines).any(axis=1)
+            w.line_count = np.count_nonzero(is_valid)
+            w.lines[:w.line_count] = lines[is_valid]
+            if w.line_count < p.line_count and w.logger.enabled:
+                for l in lines[~is_valid]:
+                    w.log(f"{self.LOG_PREFIX}Received field line with NaNs {l}")
+
+        #------------------------ radio
+
+        for team_name, timestamp, direction, msg in p.hear:
+            if team_name.decode() == w.team_name: # discard message if it's not from our team
+                self.hear_callback(msg, "self" if direction == b'self' else direction, timestamp)
+
+
+    def _apply_players(self, p):
+        ''' Update visible teammates and opponents from the tokenizer buffers '''
+        w = self.world
+        n = p.player_count
+        parts_names = p.BODY_PARTS
+
+        # collect all visible body parts into one array, and convert them to cartesian coordinates at once
+        # (a new array is needed, since views are kept by each robot)
+        sph = p.player_parts[:n]
+        mask = p.player_parts_mask[:n]
+        w.visible_body_parts_rel_pos = M.deg_sph2cart_batch(sph[mask])
+        player_rows = np.zeros(n, int)
+        row = 0
+
+        for k in range(n):
+            player_team = p.player_teams[k].decode()
+            is_teammate = bool(player_team == w.team_name)
+            if w.team_name_opponent is None and not is_teammate: # register opponent team name
+                w.team_name_opponent = player_team
+
+            player = w.teammates[p.player_ids[k]-1] if is_teammate else w.opponents[p.player_ids[k]-1]
+            player.body_parts_cart_rel_pos = dict() # reset seen body parts
+            player.is_visible = True
+            player_rows[k] = player.row
+            start = row
+
+            for bp in np.flatnonzero(mask[k]):
+                name = parts_names[bp]
+                player.body_parts_sph_rel_pos[name] = tuple(sph[k,bp].tolist())
+                player.body_parts_cart_rel_pos[name] = w.visible_body_parts_rel_pos[row]
+                row += 1
+
+            player.body_parts_rel_rows = slice(start, row)
+
+        ks, cols = np.nonzero(mask) # same order as the rows of w.visible_body_parts_rel_pos
+        w.visible_body_parts_owner = player_rows[ks]
+        w.visible_body_parts_type = World_Parser.TOKENIZER_PART_TYPES[cols]
+
+
+    def _collect_body_parts(self):
+        ''' Collect body parts of all visible robots into World.visible_body_parts_rel_pos (used by the byte-by-byte parser) '''
+        w = self.world
+        rel_pos, owner, part_type = [], [], []
+
+        for player in w.teammates + w.opponents:
+            if player.is_visible:
+                player.body_parts_rel_rows = slice(len(rel_pos), len(rel_pos) + len(player.body_parts_cart_rel_pos))
+                rel_pos.extend(player.body_parts_cart_rel_pos.values())
+                owner.extend([player.row] * len(player.body_parts_cart_rel_pos))
+                part_type.extend(Other_Robot.BODY_PART_INDEX[name] for name in player.body_parts_cart_rel_pos)
+
+        w.visible_body_parts_rel_pos = np.array(rel_pos).reshape(-1,3)
+        w.visible_body_parts_owner = np.array(owner, int)
+        w.visible_body_parts_type = np.array(part_type, int)
+
+
+    def parse_bytes(self, exp):
+        ''' Parse server message byte by byte and update world state (slower, but more lenient than the tokenizer) '''
+
+        self.exp = exp #used by other member functions
+        self.depth = 0 #xml element depth
+        self._reset_step()
+
         tag, end, _ = self.get_next_tag(0)
 
         while end < len(exp):
@@ -131,7 +358,8 @@ class World_Parser():
                         #if increment < 0.019: print ("down",last_time,self.world.time_server)
                         #if increment > 0.021: print ("up",last_time,self.world.time_server)
                     else:
-                        self.world.log(f"{self.LOG_PREFIX}Unknown tag inside 'time': {tag} at {end}, \nMsg: {exp.decode()}")
+                        if self.world.logger.enabled:
+                            self.world.log(f"{self.LOG_PREFIX}Unknown tag inside 'time': {tag} at {end}, \nMsg: {exp.decode()}")
 
 
             elif tag==b'GS':
@@ -166,7 +394,8 @@ class World_Parser():
                         if self.play_mode_to_id is not None:
                             self.world.play_mode = self.play_mode_to_id[aux]
                     else:
-                        self.world.log(f"{self.LOG_PREFIX}Unknown tag inside 'GS': {tag} at {end}, \nMsg: {exp.decode()}")
+                        if self.world.logger.enabled:
+                            self.world.log(f"{self.LOG_PREFIX}Unknown tag inside 'GS': {tag} at {end}, \nMsg: {exp.decode()}")
 
 
             elif tag==b'GYR':
@@ -194,7 +423,8 @@ class World_Parser():
                         self.world.robot.gyro[2], end = self.read_float(end+1)
                         self.world.robot.gyro[1] *= -1
                     else:
-                        self.world.log(f"{self.LOG_PREFIX}Unknown tag inside 'GYR': {tag} at {end}, \nMsg: {exp.decode()}")
+                        if self.world.logger.enabled:
+                            self.world.log(f"{self.LOG_PREFIX}Unknown tag inside 'GYR': {tag} at {end}, \nMsg: {exp.decode()}")
 
 
             elif tag==b'ACC':
@@ -221,7 +451,8 @@ class World_Parser():
                         self.world.robot.acc[2], end = self.read_float(end+1)
                         self.world.robot.acc[1] *= -1
                     else:
-                        self.world.log(f"{self.LOG_PREFIX}Unknown tag inside 'ACC': {tag} at {end}, \nMsg: {exp.decode()}")
+                        if self.world.logger.enabled:
+                            self.world.log(f"{self.LOG_PREFIX}Unknown tag inside 'ACC': {tag} at {end}, \nMsg: {exp.decode()}")
 
 
             elif tag==b'HJ':
@@ -242,7 +473,8 @@ class World_Parser():
                         self.world.robot.joints_speed[joint_index] = (joint_angle - old_angle) / World.STEPTIME * math.pi / 180
                         self.world.robot.joints_position[joint_index] = joint_angle
                     else:
-                        self.world.log(f"{self.LOG_PREFIX}Unknown tag inside 'HJ': {tag} at {end}, \nMsg: {exp.decode()}")
+                        if self.world.logger.enabled:
+                            self.world.log(f"{self.LOG_PREFIX}Unknown tag inside 'HJ': {tag} at {end}, \nMsg: {exp.decode()}")
 
             elif tag==b'FRP':
                 while True:
@@ -277,7 +509,8 @@ class World_Parser():
                         foot_toe_ref[5], end = self.read_float(end+1)
                         foot_toe_ref[4] *= -1
                     else:
-                        self.world.log(f"{self.LOG_PREFIX}Unknown tag inside 'FRP': {tag} at {end}, \nMsg: {exp.decode()}")
+                        if self.world.logger.enabled:
+                            self.world.log(f"{self.LOG_PREFIX}Unknown tag inside 'FRP': {tag} at {end}, \nMsg: {exp.decode()}")
 
 
             elif tag==b'See':
@@ -299,6 +532,9 @@ class World_Parser():
 
                         aux = self.LEFT_SIDE_FLAGS[tag_bytes] if self.world.team_side_is_left else self.RIGHT_SIDE_FLAGS[tag_bytes]
                         self.world.flags_posts[aux] = (c1,c2,c3)
+                        row = self.LEFT_SIDE_FLAG_ROWS[tag_bytes] if self.world.team_side_is_left else self.RIGHT_SIDE_FLAG_ROWS[tag_bytes]
+                        self.world.landmarks[row,0] = 1
+                        self.world.landmarks[row,5:8] = (c1,c2,c3)
 
                     elif tag==b'F1R' or tag==b'F2R' or tag==b'F1L' or tag==b'F2L':
                         _, end, _ = self.get_next_tag(end)
@@ -309,6 +545,9 @@ class World_Parser():
 
                         aux = self.LEFT_SIDE_FLAGS[tag_bytes] if self.world.team_side_is_left else self.RIGHT_SIDE_FLAGS[tag_bytes]
                         self.world.flags_corners[aux] = (c1,c2,c3)
+                        row = self.LEFT_SIDE_FLAG_ROWS[tag_bytes] if self.world.team_side_is_left else self.RIGHT_SIDE_FLAG_ROWS[tag_bytes]
+                        self.world.landmarks[row,0] = 1
+                        self.world.landmarks[row,5:8] = (c1,c2,c3)
 
                     elif tag==b'B':
                         _, end, _ = self.get_next_tag(end)
@@ -388,7 +627,8 @@ class World_Parser():
                                     self.world.opponents[player_id-1].body_parts_sph_rel_pos[tag_str] = (c1,c2,c3)
                                     self.world.opponents[player_id-1].body_parts_cart_rel_pos[tag_str] = M.deg_sph2cart((c1,c2,c3))
                             else:
-                                self.world.log(f"{self.LOG_PREFIX}Unknown tag inside 'P': {tag} at {end}, \nMsg: {exp.decode()}")
+                                if self.world.logger.enabled:
+                                    self.world.log(f"{self.LOG_PREFIX}Unknown tag inside 'P': {tag} at {end}, \nMsg: {exp.decode()}")
                         
                     elif tag==b'L':
                         l = self.world.lines[self.world.line_count]
@@ -403,13 +643,16 @@ class World_Parser():
                         l[5], end = self.read_float(end+1)
 
                         if np.isnan(l).any():
-                            self.world.log(f"{self.LOG_PREFIX}Received field line with NaNs {l}")
+                            if self.world.logger.enabled:
+                                self.world.log(f"{self.LOG_PREFIX}Received field line with NaNs {l}")
                         else:
                             self.world.line_count += 1 #accept field line if there are no NaNs
                         
                     else:
-                        self.world.log(f"{self.LOG_PREFIX}Unknown tag inside 'see': {tag} at {end}, \nMsg: {exp.decode()}")
+                        if self.world.logger.enabled:
+                            self.world.log(f"{self.LOG_PREFIX}Unknown tag inside 'see': {tag} at {end}, \nMsg: {exp.decode()}")
 
+                self._collect_body_parts()
 
             elif tag==b'hear':
 
@@ -432,6 +675,7 @@ class World_Parser():
 
 
             else:
-                self.world.log(f"{self.LOG_PREFIX}Unknown root tag: {tag} at {end}, \nMsg: {exp.decode()}")
+                if self.world.logger.enabled:
+                    self.world.log(f"{self.LOG_PREFIX}Unknown root tag: {tag} at {end}, \nMsg: {exp.decode()}")
                 tag, end, min_depth = self.get_next_tag(end)
 
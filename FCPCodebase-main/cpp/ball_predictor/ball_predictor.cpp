@@ -101,4 +101,46 @@ void predict_rolling_ball_pos_vel_spd(double bx, double by, double vx, double vy
     }
 
     pos_pred_len = counter;
-}
\ No newline at end of file
+}
+
+
+/**
+ * @brief Advance rolling ball position/velocity by a number of steps (same model as predict_rolling_ball_pos_vel_spd)
+ * The ball stops (null velocity) when the displacement is low, and the last position inside the field is kept if it gets out of bounds
+ * @param bx ball position (x), replaced by the new position
+ * @param by ball position (y), replaced by the new position
+ * @param vx ball velocity (x), replaced by the new velocity
+ * @param vy ball velocity (y), replaced by the new velocity
+ * @param steps number of steps (0.02s each)
+ */
+void advance_rolling_ball(double &bx, double &by, double &vx, double &vy, int steps){
+
+    const double k1 = -0.01;
+    const double k2 = -1;
+
+    const double k1_x = (vx < 0) ? -k1 : k1; // invert k1 if vx is negative, because vx^2 absorbs the sign
+    const double k1_y = (vy < 0) ? -k1 : k1; // invert k1 if vy is negative, because vy^2 absorbs the sign
+
+    for(int i=0; i<steps; i++){
+
+        double acc_x = vx*vx*k1_x + vx*k2;
+        double acc_y = vy*vy*k1_y + vy*k2;
+
+        double dx = vx*0.02 + acc_x*0.0002; // 0.5*0.02^2 = 0.0002
+        double dy = vy*0.02 + acc_y*0.0002; // 0.5*0.02^2 = 0.0002
+
+        if (fabs(dx) < 0.0005 and fabs(dy) < 0.0005){ // ball has stopped
+            vx = 0;
+            vy = 0;
+            break;
+        }
+        if (fabs(bx+dx) > 15 or fabs(by+dy) > 10){ // ball is out of bounds
+            break;
+        }
+
+        bx += dx;
+        by += dy;
+        vx += acc_x*0.02;
+        vy += acc_y*0.02;
+    }
+}
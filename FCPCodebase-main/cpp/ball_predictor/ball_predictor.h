@@ -8,3 +8,4 @@ extern int pos_pred_len;
 extern void get_intersection_with_ball(float x, float y, float max_robot_sp_per_step, float ball_pos[], float ball_pos_len,
                                        float &ret_x, float &ret_y, float &ret_d);
 extern void predict_rolling_ball_pos_vel_spd(double bx, double by, double vx, double vy);
+extern void advance_rolling_ball(double &bx, double &by, double &vx, double &vy, int steps);
@@ -88,6 +88,44 @@ py::array_t<float> get_intersection( py::array_t<float> parameters ){
 }
 
 
+/**
+ * @brief Advance multiple rolling balls by a number of steps each (batched version of predict_rolling_ball, which only returns the last state)
+ * 
+ * @param parameters 
+ *        ball_x, ball_y, ball_vel_x, ball_vel_y, steps (for each ball)
+ * @return ball_x, ball_y, ball_vel_x, ball_vel_y (for each ball)
+ */
+py::array_t<float> advance_rolling_balls( py::array_t<float> parameters ){
+
+    // ================================================= 1. Parse data
+    
+    py::buffer_info parameters_buf = parameters.request();
+    float* parameters_ptr = (float*)parameters_buf.ptr;
+    int balls_no = parameters_buf.shape[0] / 5;
+
+    // ================================================= 2. Compute states and prepare data to return
+    
+    py::array_t<float> retval = py::array_t<float>(balls_no*4); //allocate
+    py::buffer_info buff = retval.request();
+    float *ptr = (float *) buff.ptr;
+
+    for(int i=0; i<balls_no; i++){
+        double px = parameters_ptr[0];
+        double py = parameters_ptr[1];
+        double vx = parameters_ptr[2];
+        double vy = parameters_ptr[3];
+        advance_rolling_ball(px, py, vx, vy, (int)parameters_ptr[4]);
+        ptr[0] = px;
+        ptr[1] = py;
+        ptr[2] = vx;
+        ptr[3] = vy;
+        parameters_ptr += 5;
+        ptr += 4;
+    }
+    return retval;
+}
+
+
 using namespace pybind11::literals; // to add informative argument names as -> "argname"_a
 
 PYBIND11_MODULE(ball_predictor, m) {  // the python module name, m is the interface to create bindings
@@ -96,5 +134,6 @@ PYBIND11_MODULE(ball_predictor, m) {  // the python module name, m is the interf
     // optional arguments names
     m.def("predict_rolling_ball", &predict_rolling_ball, "Predict rolling ball", "parameters"_a); 
     m.def("get_intersection", &get_intersection, "Get point of intersection with moving ball", "parameters"_a); 
+    m.def("advance_rolling_balls", &advance_rolling_balls, "Advance multiple rolling balls", "parameters"_a); 
 }
 
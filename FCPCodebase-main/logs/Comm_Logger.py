@@ -0,0 +1,174 @@
+from logging.handlers import QueueHandler, QueueListener
+import atexit
+import json
+import logging
+import os
+import queue
+
+
+class JSON_Lines_Formatter(logging.Formatter):
+    ''' One JSON object per line: time (s), level, event, and the typed fields of the record '''
+
+    @staticmethod
+    def _default(o):
+        return o.tolist() if hasattr(o, "tolist") else str(o) # numpy scalars and arrays
+
+    def format(self, record):
+        return json.dumps({"time":record.created, "level":record.levelname, "event":record.msg, **record.fields},
+                          separators=(",",":"), default=JSON_Lines_Formatter._default)
+
+
+class Text_Formatter(logging.Formatter):
+    ''' Legacy free text format (parsed by agent_logs/metrics_logger.py) '''
+
+    @staticmethod
+    def _pt(x, y, fmt="({:.2f}, {:.2f})"):
+        return "N/A" if x is None else fmt.format(x, y)
+
+    def format(self, record):
+        e, f = record.msg, record.fields
+        if e == "BALL_UPDATE":
+            text = (f"Agent {f['agent']} | Sent ball={self._pt(f['sent_x'], f['sent_y'])} | "
+                    f"Vision Ball={self._pt(f['vision_x'], f['vision_y'])} | "
+                    f"Estimated Ball={self._pt(f['est_x'], f['est_y'], '[{:.2f}, {:.2f}]')} "
+                    f"Agent Pos={self._pt(f['agent_x'], f['agent_y'])}")
+        elif e == "CYCLE_COMPLETE":
+            text = f"Cycle {f['cycle']} | Messages Sent: {f['sent']} | Messages Received: {f['received']}"
+        else:
+            text = " | ".join(f"{k}={v}" for k,v in f.items())
+        return f"{self.formatTime(record)} [{e}] {text}"
+
+
+class _Deferred_Queue_Handler(QueueHandler):
+    '''
+    Queue handler that does not format the record in the caller's thread (the listener's handlers format it)
+    Each record carries the file handlers of its logger, since one listener serves all agents of the process
+    '''
+
+    def __init__(self, queue, targets) -> None:
+        super().__init__(queue)
+        self.targets = targets
+
+    def prepare(self, record):
+        record.targets = self.targets
+        return record
+
+
+class _Router_Handler(logging.Handler):
+    ''' Dispatches each record to its file handlers (runs in the listener thread) '''
+
+    def handle(self, record):
+        for h in record.targets:
+            if record.levelno >= h.level:
+                h.handle(record)
+
+
+class Comm_Logger():
+    '''
+    Non-blocking structured logger (used by Communicator)
+
+    Records are events with typed fields (e.g. logger.info("BALL_UPDATE", est_x=1.2, ...)), which are put in a queue
+    without being formatted. A single background thread per process (QueueListener) formats them and writes them to disk,
+    so that the agent's thread does not wait for formatting or file I/O.
+
+    Files (in `directory`):
+        agent_<unum>.<ext>         all records with level >= `level`
+        agent_<unum>_errors.<ext>  records with level >= WARNING
+
+    Configuration (environment variables, used as default values):
+        FCP_COMM_LOG_LEVEL  - DEBUG, INFO, WARNING, ERROR, CRITICAL or OFF (default: INFO)
+                              (disabled levels cost a single comparison, see is_enabled_for)
+        FCP_COMM_LOG_FORMAT - jsonl (JSON lines, extension .jsonl) or text (legacy format, extension .log) (default: jsonl)
+    '''
+    LEVELS = {"DEBUG":logging.DEBUG, "INFO":logging.INFO, "WARNING":logging.WARNING, "ERROR":logging.ERROR,
+              "CRITICAL":logging.CRITICAL, "OFF":logging.CRITICAL+1}
+    FORMATS = {"jsonl":(JSON_Lines_Formatter, ".jsonl"), "text":(Text_Formatter, ".log")}
+
+    _queue = None
+    _listener = None
+    _pid = None
+    _file_handlers = dict() # file path -> handler (shared by loggers of the same agent, e.g. if the agent is recreated)
+
+    def __init__(self, unum:int, level:str=None, fmt:str=None, directory:str="agent_logs") -> None:
+        level = (level or os.environ.get("FCP_COMM_LOG_LEVEL", "INFO")).upper()
+        fmt = (fmt or os.environ.get("FCP_COMM_LOG_FORMAT", "jsonl")).lower()
+        assert level in Comm_Logger.LEVELS, f"Unknown log level: {level}"
+        assert fmt in Comm_Logger.FORMATS, f"Unknown log format: {fmt}"
+
+        self.level = Comm_Logger.LEVELS[level]
+        self.name = f"Agent_{unum}"
+        for name in ("debug", "info", "warning", "error"): # disabled levels are replaced by a no-op
+            if Comm_Logger.LEVELS[name.upper()] < self.level:
+                setattr(self, name, Comm_Logger._disabled)
+
+        if self.level > logging.CRITICAL:
+            return # logging is disabled, no files are created
+
+        Comm_Logger._start_listener()
+
+        # Files are opened by the listener thread when the first record is written (delay=True)
+        os.makedirs(directory, exist_ok=True)
+        formatter_cls, ext = Comm_Logger.FORMATS[fmt]
+        handlers = []
+        for suffix, min_level in (("", self.level), ("_errors", max(self.level, logging.WARNING))):
+            path = f"{directory}/agent_{unum}{suffix}{ext}"
+            if path not in Comm_Logger._file_handlers:
+                Comm_Logger._file_handlers[path] = logging.FileHandler(path, mode="w", delay=True)
+                Comm_Logger._file_handlers[path].setFormatter(formatter_cls())
+            h = Comm_Logger._file_handlers[path]
+            h.setLevel(min_level)
+            handlers.append(h)
+        self.queue_handler = _Deferred_Queue_Handler(Comm_Logger._queue, handlers)
+
+    @staticmethod
+    def _start_listener():
+        ''' Start background thread (once per process, also after fork) '''
+        if Comm_Logger._pid == os.getpid():
+            return
+        Comm_Logger._queue = queue.SimpleQueue()
+        Comm_Logger._file_handlers = dict() # handlers inherited from the parent process are not used
+        Comm_Logger._listener = QueueListener(Comm_Logger._queue, _Router_Handler())
+        Comm_Logger._listener.start()
+        Comm_Logger._pid = os.getpid()
+        atexit.register(Comm_Logger.stop)
+
+    @staticmethod
+    def stop():
+        ''' Write pending records and stop background thread '''
+        if Comm_Logger._listener is not None and Comm_Logger._pid == os.getpid():
+            Comm_Logger._listener.stop()
+            for h in Comm_Logger._file_handlers.values():
+                h.close()
+            Comm_Logger._file_handlers = dict()
+            Comm_Logger._listener = None
+            Comm_Logger._pid = None
+
+    def is_enabled_for(self, level:int) -> bool:
+        ''' Check level before computing expensive fields '''
+        return level >= self.level
+
+    @staticmethod
+    def _disabled(event:str, **fields):
+        pass
+
+    def log(self, level:int, event:str, **fields):
+        '''
+        Log event with typed fields (values must be JSON serializable, numpy scalars and arrays are converted)
+        The record is created directly (skipping logging.Logger, which looks up the caller's frame) and put in the queue
+        '''
+        if level >= self.level:
+            record = logging.LogRecord(self.name, level, "", 0, event, None, None)
+            record.fields = fields
+            self.queue_handler.emit(record)
+
+    def debug(self, event:str, **fields):
+        self.log(logging.DEBUG, event, **fields)
+
+    def info(self, event:str, **fields):
+        self.log(logging.INFO, event, **fields)
+
+    def warning(self, event:str, **fields):
+        self.log(logging.WARNING, event, **fields)
+
+    def error(self, event:str, **fields):
+        self.log(logging.ERROR, event, **fields)
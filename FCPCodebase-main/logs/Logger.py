@@ -2,14 +2,40 @@ from pathlib import Path
 from datetime import datetime
 import random
 from string import ascii_uppercase
+import atexit
+import os
+import queue
+import threading
+import time
 
 class Logger():
+    '''
+    Text log with one file per topic (the log folder is shared by all loggers of the process)
+
+    The file is opened once and written through a buffer, which is flushed by a background thread
+    every FLUSH_INTERVAL seconds and when the process exits (messages written in the last FLUSH_INTERVAL
+    before the process is killed with SIGKILL may be lost).
+    If `threaded` is True, messages are formatted and written by the background thread, so `write` only puts them in a queue.
+    Buffers are flushed before fork, and the child process reopens its files, so that buffered messages are not written twice.
+    If the logger is disabled, `write` returns immediately. Callers should check `enabled` before formatting
+    expensive messages (e.g. if self.world.logger.enabled: self.world.log(f"..."))
+    '''
+    FLUSH_INTERVAL = 1.0 # seconds
     _folder = None
+    _queue = None        # background thread (shared by all loggers of the process)
+    _thread = None
+    _pid = None
+    _lock = threading.Lock()
+    _io_lock = threading.Lock() # held by the background thread while writing, and while forking
+    _loggers = []        # loggers with an open file
+    _timestamp = (None, "") # last timestamp: (second, formatted string)
 
-    def __init__(self, is_enabled:bool, topic:str) -> None:
-        self.no_of_entries = 0 
+    def __init__(self, is_enabled:bool, topic:str, threaded:bool=False) -> None:
+        self.no_of_entries = 0
         self.enabled = is_enabled
         self.topic = topic
+        self.threaded = threaded
+        self.file = None
 
     def write(self, msg:str, timestamp:bool=True, step:int=None) -> None:
         '''
@@ -25,24 +51,137 @@ class Logger():
         '''
         if not self.enabled: return
 
+        self.no_of_entries += 1
+        t = time.time() if timestamp else None # the timestamp is taken now, even if the message is written later
+
+        if self.threaded:
+            Logger._start_thread()
+            Logger._queue.put((self, t, step, msg))
+        else:
+            self._write(t, step, msg)
+
+    def _write(self, t, step, msg):
+        ''' Format and write message to the file buffer (opens the file if needed) '''
+        if msg is None:
+            return self._close()
+        if self.file is None:
+            self._open()
+
+        prefix = ""
+        if t is not None or step is not None:
+            prefix = "{"
+            if t is not None:
+                prefix += Logger._format_time(t)
+                if step is not None: prefix += " "
+            if step is not None:
+                prefix += f'Step:{step}'
+            prefix += "} "
+        self.file.write((prefix + msg + "\n").encode())
+
+    @staticmethod
+    def _format_time(t:float):
+        ''' Format timestamp (the formatted string is reused while the second does not change) '''
+        second, text = Logger._timestamp
+        if int(t) != second:
+            second, text = int(t), datetime.fromtimestamp(int(t)).strftime("%a %H:%M:%S")
+            Logger._timestamp = (second, text)
+        return text
+
+    def _open(self):
         # The log folder is only created if needed
-        if Logger._folder is None: 
-            rnd = ''.join(random.choices(ascii_uppercase, k=6)) # Useful if multiple processes are running in parallel  
+        if Logger._folder is None:
+            rnd = ''.join(random.choices(ascii_uppercase, k=6)) # Useful if multiple processes are running in parallel
             Logger._folder = "./logs/" + datetime.now().strftime("%Y-%m-%d_%H.%M.%S__") + rnd + "/"
             print("\nLogger Info: see",Logger._folder)
             Path(Logger._folder).mkdir(parents=True, exist_ok=True)
 
-        self.no_of_entries += 1
+        Logger._start_thread()
+        self.file = open(Logger._folder + self.topic + ".log", 'ab', buffering=65536) # binary buffered writer (thread-safe flush)
+        Logger._loggers.append(self)
+
+    def _close(self):
+        if self.file is not None:
+            Logger._loggers.remove(self)
+            self.file.close()
+            self.file = None
+
+    def close(self):
+        ''' Write buffered messages and close file (it is reopened if more messages are written) '''
+        if self.threaded and Logger._pid == os.getpid():
+            Logger._queue.put((self, None, None, None)) # closed by the background thread, after the pending messages
+        else:
+            self._close()
+
+    @staticmethod
+    def _start_thread():
+        ''' Start background thread (once per process, also after fork) '''
+        if Logger._pid == os.getpid():
+            return
+        with Logger._lock:
+            if Logger._pid == os.getpid():
+                return
+            Logger._queue = queue.SimpleQueue()
+            Logger._thread = threading.Thread(target=Logger._run, name="Logger", daemon=True)
+            Logger._thread.start()
+            Logger._pid = os.getpid()
+            atexit.register(Logger.stop)
+
+    @staticmethod
+    def _run():
+        ''' Background thread: write queued messages (threaded loggers) and flush all files every FLUSH_INTERVAL seconds '''
+        q = Logger._queue
+        next_flush = time.monotonic() + Logger.FLUSH_INTERVAL
+        while True:
+            try:
+                item = q.get(timeout=max(next_flush - time.monotonic(), 0))
+                if item is None:
+                    break
+                with Logger._io_lock:
+                    item[0]._write(*item[1:])
+            except queue.Empty:
+                pass
+            if time.monotonic() >= next_flush:
+                with Logger._io_lock:
+                    Logger.flush_all()
+                next_flush = time.monotonic() + Logger.FLUSH_INTERVAL
+
+    @staticmethod
+    def flush_all():
+        ''' Flush buffers of all open files '''
+        for l in list(Logger._loggers):
+            try:
+                l.file.flush()
+            except (AttributeError, ValueError):
+                pass # closed meanwhile
+
+    @staticmethod
+    def stop():
+        ''' Write queued messages, stop background thread, and close all files '''
+        if Logger._pid != os.getpid():
+            return
+        Logger._queue.put(None)
+        Logger._thread.join()
+        for l in list(Logger._loggers):
+            l._close()
+        Logger._pid = None
+
+    @staticmethod
+    def _before_fork():
+        Logger._io_lock.acquire() # the background thread cannot fill the buffers again before fork
+        Logger.flush_all()
+
+    @staticmethod
+    def _after_fork_in_parent():
+        Logger._io_lock.release()
+
+    @staticmethod
+    def _after_fork_in_child():
+        ''' Drop the files inherited from the parent process (already flushed), they are reopened if needed '''
+        Logger._io_lock = threading.Lock()
+        for l in Logger._loggers:
+            l.file = None
+        Logger._loggers = []
+
 
-        with open(Logger._folder + self.topic + ".log", 'a+') as f:
-            prefix = ""
-            write_step = step is not None
-            if timestamp or write_step:
-                prefix = "{"
-                if timestamp: 
-                    prefix += datetime.now().strftime("%a %H:%M:%S")
-                    if write_step: prefix += " "
-                if write_step:
-                    prefix += f'Step:{step}'
-                prefix += "} "
-            f.write(prefix + msg + "\n")
\ No newline at end of file
+os.register_at_fork(before=Logger._before_fork, after_in_parent=Logger._after_fork_in_parent,
+                    after_in_child=Logger._after_fork_in_child)
@@ -0,0 +1,159 @@
+import atexit
+import json
+import numpy as np
+import os
+import time
+
+
+class Telemetry():
+    '''
+    Binary telemetry of the collaborative ball consensus (written by Communicator, one file per agent)
+
+    Each ball update is a fixed-size record (numpy structured array), so that no formatting is done when writing
+    and no parsing is needed when reading. Records are buffered and written when `buffer_size` records are pending,
+    when a record is added FLUSH_INTERVAL seconds after the last write, and when the agent exits (`close` or `close_all`),
+    so the cost of a record is a single assignment.
+
+    File format (agent_<unum>.tlm):
+        MAGIC, header length (uint32, little-endian), header (JSON: version, unum, dtype description), records
+
+    Missing values (e.g. vision position when the ball is not visible) are NaN.
+    Configuration (environment variable, used as default value):
+        FCP_TELEMETRY - 1 (enabled) or 0 (disabled) (default: 1)
+    '''
+    MAGIC = b"FCPT"
+    VERSION = 1
+    EXT = ".tlm"
+    FLUSH_INTERVAL = 1.0 # seconds
+    _open = []           # telemetry objects with an open file
+    RECORD = np.dtype([
+        ("time", "<i4"),               # local time (ms)
+        ("server_time", "<i4"),        # server time (ms)
+        ("agent_id", "i1"),
+        ("cycle", "<i4"),              # voting cycle
+        ("senders", "<u2"),            # bit i is set if the consensus includes the vote of player i+1
+        ("messages_sent", "<i2"),      # messages sent in the current cycle (up to this update)
+        ("messages_received", "<i2"),  # messages received in the current cycle (up to this update)
+        ("vision_x", "<f4"),           # ball position seen by the agent
+        ("vision_y", "<f4"),
+        ("estimated_x", "<f4"),        # ball position computed by the consensus
+        ("estimated_y", "<f4"),
+        ("sent_x", "<f4"),             # ball position sent by the agent in the current cycle
+        ("sent_y", "<f4"),
+        ("agent_pos_x", "<f4"),
+        ("agent_pos_y", "<f4"),
+    ])
+
+    def __init__(self, unum:int, enabled:bool=None, directory:str="agent_logs", buffer_size:int=256) -> None:
+        self.enabled = os.environ.get("FCP_TELEMETRY", "1") != "0" if enabled is None else enabled
+        if not self.enabled:
+            return
+
+        os.makedirs(directory, exist_ok=True)
+        self.path = f"{directory}/agent_{unum}{Telemetry.EXT}"
+        self.buffer = np.zeros(buffer_size, Telemetry.RECORD)
+        self.size = 0
+        self.pid = os.getpid()
+
+        header = json.dumps({"version":Telemetry.VERSION, "unum":unum, "dtype":Telemetry.RECORD.descr}).encode()
+        self.file = open(self.path, "wb")
+        self.file.write(Telemetry.MAGIC + len(header).to_bytes(4, "little") + header)
+        self.file.flush() # the file is valid (without records) even if the process is killed
+        self.next_flush = time.monotonic() + Telemetry.FLUSH_INTERVAL
+        Telemetry._open.append(self)
+        atexit.register(self.close)
+
+    def write(self, *values):
+        ''' Add record (values are ordered as Telemetry.RECORD, None values are stored as NaN) '''
+        if not self.enabled:
+            return
+        self.buffer[self.size] = values # numpy converts None to NaN
+        self.size += 1
+        if self.size == len(self.buffer) or time.monotonic() >= self.next_flush:
+            self.flush()
+
+    def flush(self):
+        ''' Write buffered records to disk '''
+        if self.size > 0 and self.pid == os.getpid(): # buffered records of the parent process are not written after fork
+            self.file.write(self.buffer[:self.size].tobytes())
+            self.file.flush()
+        self.size = 0
+        self.next_flush = time.monotonic() + Telemetry.FLUSH_INTERVAL
+
+    def close(self):
+        ''' Write buffered records and close file '''
+        if self.enabled and not self.file.closed:
+            self.flush()
+            self.file.close()
+            Telemetry._open.remove(self)
+
+    @staticmethod
+    def close_all():
+        ''' Close all open telemetry files (e.g. before os._exit, which does not run atexit handlers) '''
+        for t in list(Telemetry._open):
+            t.close()
+
+    @staticmethod
+    def read(path:str):
+        '''
+        Read telemetry file (an incomplete last record, e.g. while the file is still being written, is ignored)
+        Empty files and files with an incomplete header (e.g. agent killed right after starting) have no records
+
+        Returns
+        -------
+        records : ndarray
+            structured array (fields described in the file header)
+        '''
+        with open(path, "rb") as f:
+            magic = f.read(len(Telemetry.MAGIC))
+            if magic != Telemetry.MAGIC[:len(magic)]:
+                raise ValueError(f"Not a telemetry file: {path}")
+            length = f.read(4)
+            header = f.read(int.from_bytes(length, "little")) if len(length) == 4 else b""
+            try:
+                dtype = np.dtype([tuple(d) for d in json.loads(header)["dtype"]])
+            except ValueError: # truncated header (json.JSONDecodeError is a ValueError)
+                return np.zeros(0, Telemetry.RECORD)
+            data = f.read()
+        return np.frombuffer(data, dtype, len(data) // dtype.itemsize)
+
+    @staticmethod
+    def load(*paths:str):
+        '''
+        Load telemetry files into a pandas DataFrame
+
+        Parameters
+        ----------
+        paths : str
+            telemetry files, or directories (searched recursively for *.tlm files)
+
+        Returns
+        -------
+        df : pandas.DataFrame
+            one row per record, with the columns of Telemetry.RECORD, plus:
+            source (file path), agent_with_vision and agent_who_broadcasted (bool, same as agent_logs/metrics_logger.py)
+        '''
+        import pandas as pd
+
+        files = []
+        for p in paths:
+            if os.path.isdir(p):
+                for root, dirs, names in os.walk(p):
+                    dirs.sort()
+                    files += [os.path.join(root, n) for n in sorted(names) if n.endswith(Telemetry.EXT)]
+            else:
+                files.append(p)
+
+        frames = []
+        for f in files:
+            df = pd.DataFrame(Telemetry.read(f))
+            df.insert(0, "source", f)
+            frames.append(df)
+        if not frames:
+            frames.append(pd.DataFrame(np.zeros(0, Telemetry.RECORD)).assign(source=""))
+
+        df = pd.concat(frames, ignore_index=True)
+        df["source"] = df["source"].astype("category")
+        df["agent_with_vision"] = df["vision_x"].notna() & df["vision_y"].notna()
+        df["agent_who_broadcasted"] = df["sent_x"].notna() & df["sent_y"].notna()
+        return df
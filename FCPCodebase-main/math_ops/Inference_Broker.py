@@ -0,0 +1,84 @@
+from math_ops.Neural_Network import MLP
+
+
+class Inference_Broker():
+    '''
+    Optional cross-agent batched inference, for multiple agents running in the same process
+
+    Instead of running its model immediately (batch size of 1), a behavior submits its observations and
+    a callback that consumes the action. When all agents have thought, flush() runs a single batched
+    inference per model (models built from the same weights, e.g. all Walk models of robot type 1 and 3,
+    are grouped), calls the action callbacks in submission order, and then runs the deferred callbacks
+    (e.g. committing and sending the robot command, see Base_Agent.send_robot_command).
+
+    Usage:
+        broker = Inference_Broker()
+        for p in players: p.behavior.inference_broker = broker
+        for p in players: p.think_and_send()    # submit observations and defer commands
+        broker.flush()                           # run models, apply actions, send commands
+
+    Trade-off: batching reduces the total inference time of the process (throughput), but each agent's command
+    is only sent after all agents that were ready at the same time have thought, so the response latency of
+    the first agents increases (instead of sending each command as soon as the agent is ready, see Event_Loop).
+    For this reason, the team runners only enable the broker if FCP_INFERENCE_BROKER=1.
+    '''
+
+    def __init__(self) -> None:
+        self.groups = dict()    # key: id of source weights, value: (model, list of observations)
+        self.requests = []      # list of (group observations, index, callback), in submission order
+        self.deferred = []      # list of callbacks to run after all actions are applied
+        self.model_runs = 0     # number of batched model runs (statistics)
+        self.total_requests = 0 # number of processed observations (statistics)
+
+
+    def submit(self, model:MLP, obs, callback):
+        '''
+        Submit observations for batched inference
+
+        Parameters
+        ----------
+        model : MLP
+            neural network
+        obs : ndarray
+            neural network inputs (copied, so the caller may reuse its array)
+        callback : function
+            function called by flush() with the action, e.g. Env.execute
+        '''
+        key = id(model.source)
+        if key not in self.groups:
+            self.groups[key] = (model, [])
+        obs_list = self.groups[key][1]
+        self.requests.append((obs_list, len(obs_list), callback))
+        obs_list.append(obs.copy())
+
+
+    def defer(self, callback):
+        ''' Run callback (without arguments) after the next flush() has applied all actions '''
+        self.deferred.append(callback)
+
+
+    def flush(self) -> int:
+        '''
+        Run one batched inference per model, call the action callbacks, and then the deferred callbacks
+
+        Returns
+        -------
+        no_of_requests : int
+            number of processed observations
+        '''
+        actions = dict()
+        for key, (model, obs_list) in self.groups.items():
+            actions[id(obs_list)] = model.run_batch(obs_list)
+
+        requests, deferred = self.requests, self.deferred
+        self.model_runs += len(actions)
+        self.total_requests += len(requests)
+        self.groups, self.requests, self.deferred = dict(), [], []
+
+        for obs_list, i, callback in requests:
+            callback(actions[id(obs_list)][i])
+
+        for callback in deferred:
+            callback()
+
+        return len(requests)
@@ -21,6 +21,16 @@ class Math_Ops():
         v = spherical_vec[2] * pi / 180
         return np.array([r * cos(v) * cos(h), r * cos(v) * sin(h), r * sin(v)])
 
+    @staticmethod
+    def deg_sph2cart_batch(spherical_vecs):
+        ''' Converts array of SimSpark's spherical coordinates in degrees, with shape (...,3), to cartesian coordinates '''
+        spherical_vecs = np.asarray(spherical_vecs)
+        r = spherical_vecs[...,0]
+        h = spherical_vecs[...,1] * (pi / 180)
+        v = spherical_vecs[...,2] * (pi / 180)
+        r_cos_v = r * np.cos(v)
+        return np.stack((r_cos_v * np.cos(h), r_cos_v * np.sin(h), r * np.sin(v)), axis=-1)
+
     @staticmethod
     def deg_sin(deg_angle):
         ''' Returns sin of degrees '''
@@ -291,7 +291,7 @@ class Matrix_3x3():
         '''
         return self.rotate_z_rad(rotation_deg * (pi/180), in_place)
 
-    def invert(self, in_place=False):
+    def invert(self, in_place=False, is_rigid=False):
         '''
         Inverts the current rotation matrix
 
@@ -300,6 +300,9 @@ class Matrix_3x3():
         in_place: bool, optional
             * True: the internal matrix is changed in-place (default)
             * False: a new matrix is returned and the current one is not changed 
+        is_rigid: bool, optional
+            * True: the matrix is a pure rotation, inverted by transposition (faster)
+            * False: the matrix is inverted with a general method (default)
         
         Returns
         -------
@@ -307,11 +310,13 @@ class Matrix_3x3():
             self is returned if in_place is True
         '''
 
+        inv = self.m.T.copy() if is_rigid else np.linalg.inv(self.m)
+
         if in_place:
-            self.m = np.linalg.inv(self.m)
+            self.m = inv # rebinding does not change arrays shared with other matrices (e.g. views of Matrix_4x4.get_rotation)
             return self
         else:
-            return Matrix_3x3(np.linalg.inv(self.m))
+            return Matrix_3x3(inv)
 
     def multiply(self,mat, in_place=False, reverse_order=False):
         '''
@@ -65,14 +65,14 @@ class Matrix_4x4():
         result : Matrix_4x4 
             self is returned if in_place is True
         '''
-        vec = np.array([*translation_vec,1])# conversion to 4D vector
-        np.matmul(self.m, vec, out=vec)     # compute only 4th column
+        vec = np.matmul(self.m[:,0:3], translation_vec) # compute only 4th column (equivalent to self.m * (x,y,z,1))
+        vec += self.m[:,3]
 
         if in_place:
             self.m[:,3] = vec
             return self
         else:
-            ret = Matrix_4x4(self.m)
+            ret = Matrix_4x4(self) # copy
             ret.m[:,3] = vec
             return ret
 
@@ -362,7 +362,7 @@ class Matrix_4x4():
         '''
         return self.rotate_z_rad(rotation_deg * (pi/180), in_place)
 
-    def invert(self, in_place=False):
+    def invert(self, in_place=False, is_rigid=False):
         '''
         Inverts the current transformation matrix
 
@@ -371,6 +371,9 @@ class Matrix_4x4():
         in_place: bool, optional
             * True: the internal matrix is changed in-place (default)
             * False: a new matrix is returned and the current one is not changed 
+        is_rigid: bool, optional
+            * True: the matrix is a rigid transformation (rotation + translation), inverted as [R^T, -R^T*t] (faster)
+            * False: the matrix is inverted with a general method (default)
         
         Returns
         -------
@@ -378,11 +381,25 @@ class Matrix_4x4():
             self is returned if in_place is True
         '''
 
+        if not is_rigid:
+            if in_place:
+                self.m = np.linalg.inv(self.m)
+                return self
+            else:
+                return Matrix_4x4(np.linalg.inv(self.m))
+
+        # inverse = [R^T, -R^T*t] (computed with Python floats, which is faster than numpy for such small matrices)
+        (a,b,c,x),(d,e,f,y),(g,h,i,z),_ = self.m.tolist()
+        inv = np.array((a,d,g,-a*x-d*y-g*z,
+                        b,e,h,-b*x-e*y-h*z,
+                        c,f,i,-c*x-f*y-i*z,
+                        0,0,0,1.0)).reshape(4,4)
+
         if in_place:
-            self.m = np.linalg.inv(self.m)
+            self.m = inv
             return self
         else:
-            return Matrix_4x4(np.linalg.inv(self.m))
+            return Matrix_4x4(inv)
 
     def multiply(self,mat, in_place=False):
         '''
@@ -391,7 +408,8 @@ class Matrix_4x4():
         Parameters
         ----------
         mat : Matrix_4x4 or array_like
-            multiplier matrix or 3D vector
+            multiplier matrix (4x4), 3D vector, or array of 3D vectors with shape (N,3)
+            (only a Matrix_4x4 or an array with shape (4,4) is a matrix, e.g. an array with shape (3,3) is a batch of 3 vectors)
         in_place: bool, optional
             * True: the internal matrix is changed in-place (default)
             * False: a new matrix is returned and the current one is not changed (if mat is a 4x4 matrix)
@@ -400,15 +418,23 @@ class Matrix_4x4():
         -------
         result : Matrix_4x4 | array_like
             Matrix_4x4 is returned if mat is a matrix (self is returned if in_place is True); 
-            a 3D vector is returned if mat is a vector
+            a 3D vector is returned if mat is a vector;
+            an array with shape (N,3) is returned if mat is an array of vectors
         '''
         if type(mat) == Matrix_4x4:  
             mat = mat.m
         else:
             mat = np.asarray(mat)                   # conversion to array, if needed
-            if mat.ndim == 1:                       # multiplication by 3D vector
-                vec = np.append(mat,1)              # conversion to 4D vector
-                return np.matmul(self.m, vec)[0:3]  # conversion to 3D vector
+            if mat.ndim == 1:                       # multiplication by 3D vector (equivalent to self.m * (x,y,z,1))
+                vec = np.matmul(self.m[0:3,0:3], mat)
+                vec += self.m[0:3,3]
+                return vec
+            elif mat.shape != (4,4):                # multiplication by N 3D vectors, with a single matmul
+                if mat.ndim != 2 or mat.shape[1] != 3:
+                    raise ValueError(f"Expected 4x4 matrix, 3D vector, or array of 3D vectors with shape (N,3), got shape {mat.shape}")
+                vecs = np.matmul(mat, self.m[0:3,0:3].T)
+                vecs += self.m[0:3,3]
+                return vecs
 
         if in_place:
             np.matmul(self.m, mat, self.m)
@@ -416,6 +442,26 @@ class Matrix_4x4():
         else:
             return Matrix_4x4(np.matmul(self.m, mat))
 
+    def set_product(self, mat_a, mat_b):
+        '''
+        Sets the current transformation matrix to mat_a * mat_b, writing directly to the internal matrix
+        (no temporary matrices are allocated; the current matrix must not be mat_a or mat_b)
+
+        Parameters
+        ----------
+        mat_a : Matrix_4x4
+            left matrix
+        mat_b : Matrix_4x4
+            right matrix
+        
+        Returns
+        -------
+        result : Matrix_4x4 
+            self
+        '''
+        np.matmul(mat_a.m, mat_b.m, out=self.m)
+        return self
+
     def __call__(self,mat, is_spherical=False):
         '''
         Multiplies the current transformation matrix by mat and returns a new matrix or vector
@@ -423,18 +469,23 @@ class Matrix_4x4():
         Parameters
         ----------
         mat : Matrix_4x4 or array_like
-            multiplier matrix or 3D vector
+            multiplier matrix (4x4), 3D vector, or array of 3D vectors with shape (N,3) (see multiply)
         is_spherical : bool
-            only relevant if mat is a 3D vector, True if it uses spherical coordinates
+            only relevant if mat is a 3D vector or array of 3D vectors, True if it uses spherical coordinates
         
         Returns
         -------
         result : Matrix_4x4 | array_like
             Matrix_4x4 is returned if mat is a matrix; 
-            a 3D vector is returned if mat is a vector
+            a 3D vector is returned if mat is a vector;
+            an array with shape (N,3) is returned if mat is an array of vectors
         '''
 
-        if is_spherical and mat.ndim == 1: mat = M.deg_sph2cart(mat)
+        if is_spherical:
+            if mat.ndim == 1:
+                mat = M.deg_sph2cart(mat)
+            elif mat.shape != (4,4):
+                mat = M.deg_sph2cart_batch(mat)
         return self.multiply(mat,False)
 
     
\ No newline at end of file
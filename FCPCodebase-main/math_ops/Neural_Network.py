@@ -1,4 +1,10 @@
+from os.path import getmtime, isfile, splitext
+import hashlib
 import numpy as np
+import pickle
+
+_networks = dict() # loaded networks, shared by all agents in the same process (and by forked processes, through copy-on-write)
+NPY_ALIGNMENT = 16 # layers of .npy networks start at multiples of 16 float32 values (64 bytes)
 
 
 def run_mlp(obs, weights, activation_function="tanh"):
@@ -25,4 +31,215 @@ def run_mlp(obs, weights, activation_function="tanh"):
             np.tanh(out, out=out) 
         elif activation_function != "none":
             raise NotImplementedError
-    return np.matmul(weights[-1][1],out) + weights[-1][0] # final layer
\ No newline at end of file
+    return np.matmul(weights[-1][1],out) + weights[-1][0] # final layer
+
+
+class MLP():
+    '''
+    Multilayer perceptron for fast inference, built once per model and reused in every step
+
+    The weights are converted to C-contiguous float32 arrays and the output of each layer is written
+    into a preallocated buffer. If `fuse_bias` is True, the bias is appended to the kernel as an extra column
+    and each input buffer ends with a constant 1, so that each layer is computed with a single matmul.
+    Hidden layers use the activation function in place.
+
+    Notes
+    -----
+    The returned action is a view of an internal buffer, which is overwritten by the next call
+    '''
+
+    def __init__(self, weights:list, activation_function="tanh", fuse_bias=True) -> None:
+        '''
+        Parameters
+        ----------
+        weights : list
+            list of MLP layers of type (bias, kernel), e.g. returned by load_network()
+        activation_function : str
+            activation function for hidden layers
+            set to "none" to disable
+        fuse_bias : bool
+            if True, the bias is added by the same matmul that applies the kernel
+        '''
+        if activation_function not in ("tanh","none"):
+            raise NotImplementedError
+
+        self.source = weights # original layers (models built from the same layers can be batched together, see Inference_Broker)
+        self.use_tanh = activation_function == "tanh"
+        self.fuse_bias = fuse_bias
+        self.batch_inputs = None # buffers for batched inference (allocated on demand)
+        self.batch_outputs = None
+        self.input_size = len(weights[0][1][0])
+        self.output_size = len(weights[-1][0])
+        extra = 1 if fuse_bias else 0
+
+        # input buffer of each layer (obs is copied into the first one, hidden layers write into the others)
+        self.inputs = [np.ones(len(w[1][0]) + extra, np.float32) for w in weights]
+        self.outputs = [i[:len(i)-extra] for i in self.inputs[1:]] + [np.zeros(self.output_size, np.float32)]
+
+        if fuse_bias: # layers loaded from .npy files already include the fused kernel, which is used without copying
+            self.kernels = [np.ascontiguousarray(w[3] if len(w) > 3 else np.column_stack((w[1],w[0])), np.float32) for w in weights]
+            self.biases = None
+        else:
+            self.kernels = [np.ascontiguousarray(w[1], np.float32) for w in weights]
+            self.biases = [np.ascontiguousarray(w[0], np.float32) for w in weights]
+
+        self.obs = self.inputs[0][:self.input_size]
+        self.hidden_layers = list(zip(self.kernels[:-1], self.inputs[:-1], self.outputs[:-1], self.biases or self.kernels))
+        self.final_layer = (self.kernels[-1], self.inputs[-1], self.outputs[-1], self.biases[-1] if self.biases else None)
+
+
+    def __call__(self, obs):
+        '''
+        Run multilayer perceptron
+
+        Parameters
+        ----------
+        obs : ndarray
+            array with neural network inputs (converted to float32)
+
+        Returns
+        -------
+        action : ndarray
+            float32 array with neural network outputs (overwritten by the next call)
+        '''
+        self.obs[:] = obs
+        fuse_bias, use_tanh, matmul, tanh = self.fuse_bias, self.use_tanh, np.matmul, np.tanh
+
+        for kernel, x, out, bias in self.hidden_layers:
+            matmul(kernel, x, out=out)
+            if not fuse_bias: out += bias
+            if use_tanh: tanh(out, out=out)
+
+        kernel, x, out, bias = self.final_layer
+        matmul(kernel, x, out=out)
+        if not fuse_bias: out += bias
+        return out
+
+
+    def run_batch(self, obs_list:list):
+        '''
+        Run multilayer perceptron for a batch of observations, with a single matmul per layer
+
+        Parameters
+        ----------
+        obs_list : list
+            list of arrays with neural network inputs (converted to float32)
+
+        Returns
+        -------
+        actions : ndarray
+            float32 array with shape (len(obs_list), output_size), overwritten by the next call
+        '''
+        n = len(obs_list)
+        extra = 1 if self.fuse_bias else 0
+
+        if self.batch_inputs is None or len(self.batch_inputs[0]) < n: # grow buffers (capacity is doubled to avoid frequent reallocations)
+            capacity = max(n, 2 * len(self.batch_inputs[0])) if self.batch_inputs is not None else n
+            self.batch_inputs = [np.ones((capacity, len(i)), np.float32) for i in self.inputs]
+            self.batch_outputs = [i[:,:i.shape[1]-extra] for i in self.batch_inputs[1:]] + [np.zeros((capacity, self.output_size), np.float32)]
+
+        for i, obs in enumerate(obs_list):
+            self.batch_inputs[0][i,:self.input_size] = obs
+
+        last = len(self.kernels) - 1
+        for i, (kernel, x, out) in enumerate(zip(self.kernels, self.batch_inputs, self.batch_outputs)):
+            np.matmul(x[:n], kernel.T, out=out[:n])
+            if not self.fuse_bias: out[:n] += self.biases[i]
+            if i != last and self.use_tanh: np.tanh(out[:n], out=out[:n])
+        return self.batch_outputs[-1][:n]
+
+
+def _align(size:int) -> int:
+    ''' Round size up to a multiple of NPY_ALIGNMENT '''
+    return -(-size // NPY_ALIGNMENT) * NPY_ALIGNMENT
+
+
+def pickle_hash(filename:str) -> str:
+    ''' SHA-1 of pickled network (stored by export_network, to detect networks that were retrained after export) '''
+    with open(filename, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def export_network(weights:list, filename:str, source:str=None):
+    '''
+    Export MLP to a memory-mappable .npy file (1D float32 array), which is loaded by load_network()
+
+    Layout: [no_of_layers, rows_0, cols_0, rows_1, cols_1, ...], followed by the kernel of each layer,
+    with the bias appended as the last column (shape: rows_i x cols_i). The header and each layer are padded
+    to a multiple of NPY_ALIGNMENT values, so that all kernels are aligned and C-contiguous.
+
+    Parameters
+    ----------
+    weights : list
+        list of MLP layers of type (bias, kernel)
+    filename : str
+        path to output file (the .npy extension is appended if needed)
+    source : str
+        path to the pickle file of `weights` (optional), whose hash is written to <name>.npy.sha1
+    '''
+    kernels = [np.column_stack((w[1],w[0])).astype(np.float32) for w in weights]
+    header = [len(kernels)] + [s for k in kernels for s in k.shape]
+
+    flat = np.zeros(_align(len(header)) + sum(_align(k.size) for k in kernels), np.float32)
+    flat[:len(header)] = header
+    offset = _align(len(header))
+    for k in kernels:
+        flat[offset:offset+k.size] = k.flatten()
+        offset += _align(k.size)
+
+    np.save(filename, flat)
+    if source is not None:
+        with open(splitext(filename)[0] + ".npy.sha1", 'w') as f:
+            f.write(pickle_hash(source))
+
+
+def load_npy_network(filename:str) -> list:
+    ''' Memory-map .npy network (see export_network) and return list of MLP layers of type (bias, kernel, activation, fused kernel) '''
+    flat = np.load(filename, mmap_mode='r') # read-only pages are shared by all processes through the OS page cache
+    n = int(flat[0])
+    shapes = flat[1:1+2*n].astype(int).reshape(n,2)
+    offset = _align(1+2*n)
+
+    layers = []
+    for i, (rows, cols) in enumerate(shapes):
+        fused = flat[offset:offset+rows*cols].reshape(rows,cols)
+        layers.append([fused[:,-1], fused[:,:-1], "tanh" if i < n-1 else "none", fused])
+        offset += _align(rows*cols)
+    return layers
+
+
+def _is_up_to_date(npy_file:str, pkl_file:str) -> bool:
+    ''' Check if .npy network was exported from the current version of the pickled network '''
+    hash_file = npy_file + ".sha1"
+    if isfile(hash_file):
+        with open(hash_file) as f:
+            return f.read().strip() == pickle_hash(pkl_file)
+    return getmtime(npy_file) >= getmtime(pkl_file)
+
+
+def load_network(filename:str) -> list:
+    '''
+    Load MLP, reusing networks that were previously loaded by this process
+    (the returned network is shared and must not be modified)
+
+    If there is a .npy file with the same name (see export_network), it is memory-mapped instead of
+    unpickling `filename`, so that its pages are shared by all processes (and loading is nearly instantaneous).
+    The .npy file is ignored (with a warning) if `filename` changed after the export (e.g. the model was retrained):
+    its hash is compared with the hash stored in <name>.npy.sha1, or, if there is no stored hash, the modification times are compared.
+    Layers loaded from .npy files also include the fused kernel: (bias, kernel, activation, fused kernel)
+
+    Parameters
+    ----------
+    filename : str
+        path to pickle file with a list of MLP layers of type (bias, kernel), or path to .npy file
+    '''
+    if filename not in _networks:
+        npy_file = splitext(filename)[0] + ".npy"
+        if isfile(npy_file) and (npy_file == filename or not isfile(filename) or _is_up_to_date(npy_file, filename)):
+            _networks[filename] = load_npy_network(npy_file)
+        else:
+            if isfile(npy_file):
+                print(f"Warning: '{npy_file}' is outdated ('{filename}' changed after export) and was ignored (see Network_Export)")
+            with open(filename, 'rb') as f:
+                _networks[filename] = pickle.load(f)
+    return _networks[filename]
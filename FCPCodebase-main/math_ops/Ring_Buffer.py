@@ -0,0 +1,105 @@
+import numpy as np
+
+
+class Ring_Buffer():
+    '''
+    Fixed-capacity history of timestamped vectors (e.g. positions), stored in a preallocated (capacity,dim) array
+
+    Appending copies the new vector into the oldest row (in place), so no arrays are allocated per step.
+    Entries are indexed from the most recent one: buffer[0] is the last appended vector, buffer[1] the one before, ...
+    (the same order as a deque filled with appendleft)
+    '''
+
+    def __init__(self, capacity:int, dim:int=3) -> None:
+        self.capacity = capacity
+        self.data = np.zeros((capacity, dim)) # rows are overwritten in circular order
+        self.times = np.zeros(capacity)       # timestamp (s) of each row
+        self.head = -1                        # row of the most recent entry
+        self.size = 0                         # number of valid entries
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, index:int):
+        ''' Get entry by age (0 is the most recent entry, -1 the oldest), as a view that is overwritten by later appends '''
+        if not -self.size <= index < self.size:
+            raise IndexError("Ring_Buffer index out of range")
+        if index < 0:
+            index += self.size
+        return self.data[(self.head - index) % self.capacity]
+
+    def append(self, value, time:float=0):
+        '''
+        Copy vector into the buffer, discarding the oldest entry if the buffer is full
+
+        Parameters
+        ----------
+        value : array_like
+            vector with `dim` elements
+        time : float
+            timestamp in seconds
+        '''
+        self.head = (self.head + 1) % self.capacity
+        self.data[self.head] = value
+        self.times[self.head] = time
+        if self.size < self.capacity:
+            self.size += 1
+
+    def clear(self):
+        ''' Remove all entries (without releasing memory) '''
+        self.head = -1
+        self.size = 0
+
+    def get_time(self, index:int) -> float:
+        ''' Get timestamp of entry by age (0 is the most recent entry, -1 the oldest) '''
+        if index < 0:
+            index += self.size
+        return self.times[(self.head - index) % self.capacity]
+
+    def _rows(self, k:int):
+        ''' Rows of the k most recent entries: slice if they are contiguous, otherwise array of indices (in any order) '''
+        start = self.head - k + 1
+        return slice(start, self.head+1) if start >= 0 else np.r_[start % self.capacity:self.capacity, 0:self.head+1]
+
+    def get_latest(self, k:int):
+        '''
+        Get the k most recent entries (or fewer, if the buffer has fewer entries)
+
+        Returns
+        -------
+        values : ndarray
+            array with shape (k,dim), where row 0 is the most recent entry
+        times : ndarray
+            array with k timestamps
+        '''
+        k = min(k, self.size)
+        rows = (self.head - np.arange(k)) % self.capacity
+        return self.data[rows], self.times[rows]
+
+    def mean(self, k:int):
+        ''' Mean of the k most recent entries (or fewer, if the buffer has fewer entries), or zeros if the buffer is empty '''
+        k = min(k, self.size)
+        if k == 0:
+            return np.zeros(self.data.shape[1])
+        return np.mean(self.data[self._rows(k)], axis=0)
+
+    def velocity(self, k:int):
+        '''
+        Least-squares velocity (slope of the best linear fit over time) of the k most recent entries
+        (or fewer, if the buffer has fewer entries), or zeros if there are less than 2 entries
+
+        Returns
+        -------
+        velocity : ndarray
+            rate of change per second of each dimension
+        '''
+        k = min(k, self.size)
+        if k < 2:
+            return np.zeros(self.data.shape[1])
+        rows = self._rows(k)
+        t = self.times[rows]
+        t = t - np.mean(t)
+        den = np.dot(t, t)
+        if den == 0:
+            return np.zeros(self.data.shape[1])
+        return np.dot(t, self.data[rows]) / den # equivalent to sum(t*(x-mean(x)))/sum(t*t) since sum(t)=0
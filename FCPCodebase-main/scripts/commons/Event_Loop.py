@@ -0,0 +1,122 @@
+from scripts.commons.UI import UI
+from time import perf_counter
+import numpy as np
+import selectors
+
+
+class Event_Loop():
+    '''
+    Runs multiple agents on a single thread, processing each agent as soon as its server message arrives
+
+    Unlike Script.batch_receive(), which blocks on each agent's socket in turn (so one slow agent stalls
+    all the others), this loop waits on all sockets at once and, for each ready agent, runs the usual
+    pipeline: Server_Comm.receive() (World_Parser + World.update) followed by think_and_send().
+
+    Queueing delay: time between the moment the sockets were reported as ready and the moment the agent
+    started being processed (i.e., the time spent waiting for other agents that were ready at the same time).
+
+    If the agents share an Inference_Broker (see Script.batch_enable_inference_broker), the neural networks
+    of all agents that were ready at the same time are run in batches, before their commands are sent
+    (higher throughput, but the commands of those agents are only sent after all of them have thought).
+    '''
+
+    def __init__(self, players:list, report_period:float=10) -> None:
+        '''
+        Parameters
+        ----------
+        players : list
+            list of agents (e.g. Script.players)
+        report_period : float
+            period (in seconds) between statistics reports, set to None to disable reports
+        '''
+        self.players = players
+        self.report_period = report_period
+        self.selector = selectors.DefaultSelector()
+        for i, p in enumerate(players):
+            self.selector.register(p.scom.socket, selectors.EVENT_READ, i)
+        self.brokers = {p.behavior.inference_broker for p in players} - {None}
+
+        n = len(players)
+        self.frames = np.zeros(n, int)       # number of processed frames, per agent
+        self.delay_sum = np.zeros(n)         # sum of queueing delays (s), per agent
+        self.delay_max = np.zeros(n)         # maximum queueing delay (s), per agent
+        self.processing_sum = np.zeros(n)    # sum of processing times (receive + think_and_send) (s), per agent
+        self.last_report = perf_counter()
+
+
+    def run(self):
+        ''' Run agents forever '''
+        for p in self.players: # agents have already received their first message when they were created
+            p.think_and_send()
+        self.flush_inference()
+
+        while True:
+            self.run_once()
+
+
+    def run_once(self, timeout:float=None) -> int:
+        '''
+        Wait until at least one agent has a new message, and process all ready agents
+
+        Parameters
+        ----------
+        timeout : float
+            maximum waiting time (in seconds), or None to wait indefinitely
+
+        Returns
+        -------
+        processed_agents : int
+            number of agents that were processed
+        '''
+        events = self.selector.select(timeout)
+        ready_time = perf_counter()
+
+        for key, _ in events:
+            i = key.data
+            p = self.players[i]
+            start = perf_counter()
+            p.scom.receive()
+            p.think_and_send()
+            end = perf_counter()
+
+            delay = start - ready_time
+            self.frames[i] += 1
+            self.delay_sum[i] += delay
+            self.processing_sum[i] += end - start
+            if delay > self.delay_max[i]: self.delay_max[i] = delay
+
+        self.flush_inference()
+
+        if self.report_period is not None and perf_counter() - self.last_report > self.report_period:
+            self.print_report()
+
+        return len(events)
+
+
+    def flush_inference(self):
+        ''' Run pending batched inference and send deferred commands (if inference broker is enabled) '''
+        for broker in self.brokers:
+            broker.flush()
+
+
+    def print_report(self, reset=True):
+        ''' Print queueing delay and processing time per agent (and reset statistics if `reset` is True) '''
+        frames = np.maximum(self.frames, 1)
+        columns = [[p.world.robot.unum for p in self.players], list(self.frames),
+                   [f"{v:.2f}" for v in self.delay_sum / frames * 1000],
+                   [f"{v:.2f}" for v in self.delay_max * 1000],
+                   [f"{v:.2f}" for v in self.processing_sum / frames * 1000]]
+
+        UI.print_table(columns, ["Unum","Frames","Avg. queue delay (ms)","Max. queue delay (ms)","Avg. processing (ms)"], alignment=["^",">",">",">",">"])
+
+        if reset:
+            self.frames[:] = 0
+            self.delay_sum[:] = 0
+            self.delay_max[:] = 0
+            self.processing_sum[:] = 0
+        self.last_report = perf_counter()
+
+
+    def close(self):
+        ''' Unregister all sockets (the sockets are not closed) '''
+        self.selector.close()
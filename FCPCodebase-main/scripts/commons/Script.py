@@ -203,6 +203,31 @@ class Script():
         '''   
         for p in self.players[index]:
             p.think_and_send()
+        self.batch_flush_inference(index)
+
+    def batch_enable_inference_broker(self, index : slice = slice(None)):
+        '''
+        Share a single Inference_Broker among agents, so that their neural networks are run in batches
+        (observations are submitted by each agent and the robot commands are sent by batch_flush_inference)
+
+        Parameters
+        ----------
+        index : slice
+            subset of agents
+            (e.g. index=slice(1,2) will select the second agent)
+            (e.g. index=slice(1,3) will select the second and third agents)
+            by default, all agents are selected
+        '''
+        from math_ops.Inference_Broker import Inference_Broker
+        broker = Inference_Broker()
+        for p in self.players[index]:
+            p.behavior.inference_broker = broker
+        return broker
+
+    def batch_flush_inference(self, index : slice = slice(None)):
+        ''' Run pending batched inference of the selected agents (if inference broker is enabled) '''
+        for broker in {p.behavior.inference_broker for p in self.players[index]} - {None}:
+            broker.flush()
 
     def batch_execute_behavior(self, behavior, index : slice = slice(None)):
         '''
@@ -220,6 +245,7 @@ class Script():
         '''
         for p in self.players[index]:
             p.behavior.execute(behavior)
+        self.batch_flush_inference(index)
 
     def batch_commit_and_send(self, index : slice = slice(None)):
         '''
@@ -0,0 +1,211 @@
+from behaviors.Slot_Engine import Slot_Engine
+from logs.Comm_Logger import Comm_Logger
+from logs.Logger import Logger
+from logs.Telemetry import Telemetry
+from math_ops.Inference_Broker import Inference_Broker
+from math_ops.Math_Ops import Math_Ops as M
+from math_ops.Neural_Network import load_network
+from os import listdir
+from os.path import isdir, isfile, join
+from scripts.commons.Event_Loop import Event_Loop
+from scripts.commons.UI import UI
+from time import perf_counter
+from world.Robot import Robot
+import gc
+import os
+import signal
+
+
+class Team_Launcher():
+    '''
+    Forkserver-style team launcher (Linux only)
+
+    The launcher process imports all modules and loads all models, robot XML files and slot behavior files
+    once (preload), and then forks N workers, each running one or more agents (see Event_Loop).
+    The preloaded data is shared by all workers through copy-on-write, instead of being loaded by 11
+    independent processes. Each worker can be pinned to a CPU core.
+
+    After all agents are created, the launcher reports:
+    - the startup time of each worker (since the launcher started) and the time spent creating its agents
+    - the RSS and PSS (proportional set size: shared pages are divided by the number of processes sharing them)
+      of each worker, where sum(RSS) - sum(PSS) estimates the memory saved by sharing
+    '''
+
+    def __init__(self, agent_cls, agents_per_worker:int=1, cores:list=None, start_time:float=None, inference_broker:bool=False) -> None:
+        '''
+        Parameters
+        ----------
+        agent_cls : class
+            agent class (e.g. Agent), which must be imported before creating the launcher
+        agents_per_worker : int
+            number of agents per worker process
+        cores : list
+            CPU cores to which workers are pinned (round-robin), or None to disable pinning
+        start_time : float
+            perf_counter() value when the application started (for reporting purposes), or None to use current time
+        inference_broker : bool
+            run the neural networks of the agents of each worker in batches (see Inference_Broker), if the worker has
+            more than one agent: less CPU time, but each command is only sent after all ready agents have thought
+        '''
+        self.agent_cls = agent_cls
+        self.agents_per_worker = agents_per_worker
+        self.cores = cores
+        self.start_time = perf_counter() if start_time is None else start_time
+        self.inference_broker = inference_broker
+        self.workers = [] # list of (pid, unums, core)
+        self.preload_time = None
+
+
+    def preload(self):
+        ''' Load all neural networks, robot XML files and slot behavior files, so that they are shared by all workers '''
+        t = perf_counter()
+        dir = M.get_active_directory("/behaviors/")
+
+        for root, _, files in os.walk(join(dir, "custom")):
+            for f in files:
+                if f.endswith(".pkl"):
+                    load_network(join(root, f))
+
+        for robot_type in range(5):
+            Robot.get_xml_root("nao"+str(robot_type)+".xml")
+
+        slot_dirs = [join(dir, "slot", d) for d in listdir(join(dir, "slot"))]
+        for d in slot_dirs:
+            if isdir(d):
+                for f in listdir(d):
+                    if isfile(join(d, f)) and f.endswith(".xml"):
+                        Slot_Engine.parse_slot_file(join(d, f))
+
+        gc.collect()
+        gc.freeze() # move all objects to a permanent generation, so that the garbage collector does not touch (and copy) shared pages
+
+        self.preload_time = perf_counter() - t
+
+
+    def launch(self, args_per_agent:list, report_period:float=None):
+        '''
+        Fork workers, print report after all agents are created, and wait for workers to finish
+
+        Parameters
+        ----------
+        args_per_agent : list
+            list of arguments for each agent (see Script.batch_create)
+        report_period : float
+            period (in seconds) between Event_Loop statistics reports of each worker, or None to disable reports
+        '''
+        if self.preload_time is None:
+            self.preload()
+
+        n = self.agents_per_worker
+        groups = [args_per_agent[i:i+n] for i in range(0, len(args_per_agent), n)]
+        pipes = []
+
+        for w, group in enumerate(groups):
+            core = None if not self.cores else self.cores[w % len(self.cores)]
+            r, wr = os.pipe()
+            pid = os.fork()
+
+            if pid == 0: # worker
+                os.close(r)
+                self._run_worker(group, core, wr, report_period) # never returns
+
+            os.close(wr)
+            pipes.append(r)
+            self.workers.append((pid, [a[3] for a in group], core))
+
+        try:
+            self._report(pipes)
+            while self.workers:
+                pid, _ = os.wait()
+                self.workers = [w for w in self.workers if w[0] != pid]
+        except KeyboardInterrupt:
+            self.terminate()
+
+
+    def terminate(self):
+        ''' Terminate all workers '''
+        for pid, _, _ in self.workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        self.workers = []
+
+
+    def _run_worker(self, group, core, pipe, report_period):
+        try:
+            if core is not None and hasattr(os, "sched_setaffinity"):
+                os.sched_setaffinity(0, {core})
+
+            t = perf_counter()
+            players = [self.agent_cls(*a) for a in group]
+            if self.inference_broker and len(players) > 1: # run the neural networks of all agents in this worker in batches
+                broker = Inference_Broker()
+                for p in players:
+                    p.behavior.inference_broker = broker
+            creation_time = perf_counter() - t
+
+            os.write(pipe, f"{perf_counter() - self.start_time} {creation_time}\n".encode())
+            os.close(pipe)
+
+            Event_Loop(players, report_period).run()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            Telemetry.close_all() # os._exit does not run atexit handlers
+            Logger.stop()
+            Comm_Logger.stop()
+            os._exit(0) # never return to the launcher's code
+
+
+    def _report(self, pipes):
+        columns = [[],[],[],[],[],[],[]]
+        total_rss = total_pss = 0
+
+        for r, (pid, unums, core) in zip(pipes, self.workers):
+            with os.fdopen(r) as f:
+                msg = f.read().split()
+            if len(msg) != 2: # worker failed before creating its agents
+                continue
+            mem = Team_Launcher._read_memory(pid)
+            total_rss += mem["Rss"]
+            total_pss += mem["Pss"]
+
+            columns[0].append(pid)
+            columns[1].append(",".join(str(u) for u in unums))
+            columns[2].append("-" if core is None else core)
+            columns[3].append(f"{float(msg[0]):.2f}")
+            columns[4].append(f"{float(msg[1]):.2f}")
+            columns[5].append(f"{mem['Rss']/1024:.1f}")
+            columns[6].append(f"{mem['Pss']/1024:.1f}")
+
+        UI.print_table(columns, ["PID","Unums","Core","Ready at (s)","Agent creation (s)","RSS (MB)","PSS (MB)"], alignment=["^","^","^",">",">",">",">"])
+        print(f"Preload time: {self.preload_time:.2f}s (paid once instead of once per process)")
+        print(f"Total RSS: {total_rss/1024:.1f} MB, total PSS: {total_pss/1024:.1f} MB, shared memory saved: ~{(total_rss-total_pss)/1024:.1f} MB\n")
+
+
+    @staticmethod
+    def _read_memory(pid) -> dict:
+        ''' Returns {"Rss":kB, "Pss":kB} of given process (Pss equals Rss if smaps_rollup is not available) '''
+        mem = dict()
+        try:
+            with open(f"/proc/{pid}/smaps_rollup") as f:
+                for line in f:
+                    key, _, value = line.partition(":")
+                    if key in ("Rss","Pss"):
+                        mem[key] = int(value.split()[0])
+        except OSError:
+            pass
+
+        if "Rss" not in mem:
+            mem["Rss"] = 0
+            try:
+                with open(f"/proc/{pid}/status") as f:
+                    for line in f:
+                        if line.startswith("VmRSS:"):
+                            mem["Rss"] = int(line.split()[1])
+            except OSError:
+                pass
+        if "Pss" not in mem:
+            mem["Pss"] = mem["Rss"]
+        return mem
@@ -1,5 +1,6 @@
 from datetime import datetime, timedelta
 from itertools import count
+from math_ops.Neural_Network import export_network
 from os import listdir
 from os.path import isdir, join, isfile
 from scripts.commons.UI import UI
@@ -427,7 +428,7 @@ class Train_Base():
         return func
 
     @staticmethod
-    def export_model(input_file, output_file, add_sufix=True):
+    def export_model(input_file, output_file, add_sufix=True, export_npy=True):
         '''
         Export model weights to binary file
 
@@ -439,6 +440,9 @@ class Train_Base():
             Output file, including directory
         add_sufix : bool
             If true, a suffix is appended to the file name: output_file + "_{index}.pkl"
+        export_npy : bool
+            If true, the weights are also exported to a memory-mappable .npy file with the same name (see Neural_Network.export_network),
+            which is preferred by load_network()
         '''
 
         # If file already exists, don't overwrite
@@ -465,6 +469,9 @@ class Train_Base():
         with open(output_file,"wb") as f:
             pickle.dump(var_list, f, protocol=4) # protocol 4 is backward compatible with Python 3.4
 
+        if export_npy:
+            export_network(var_list, os.path.splitext(output_file)[0] + ".npy", output_file)
+
 
 
 class Cyclic_Callback(BaseCallback):
@@ -0,0 +1,88 @@
+from communication.Ball_Message import Ball_Message
+from communication.Radio import Radio
+from scripts.commons.Script import Script
+from scripts.commons.UI import UI
+import numpy as np
+
+
+class Ball_Message_Check():
+    '''
+    Round-trip checks of the compact ball message (communication/Ball_Message.py)
+
+    Each check encodes a set of messages, verifies the server restrictions (length, allowed symbols, first symbol),
+    decodes them, and compares the result with the original values (the error must not exceed half of the resolution).
+    Out of range values must be clipped, and invalid messages must be rejected.
+    This utility does not require a server.
+    '''
+
+    def __init__(self, script:Script) -> None:
+        self.script = script
+
+    @staticmethod
+    def check_round_trip(values, expected=None):
+        '''
+        Encode and decode messages
+
+        Parameters
+        ----------
+        values : list
+            list of (sender, ball_pos, confidence, ball_vel, age_ms)
+        expected : list
+            values expected after decoding (default: `values`)
+
+        Returns
+        -------
+        passed : bool
+            True if all messages are valid and all decoded values match the expected values
+        max_len : int
+            maximum message length
+        '''
+        tolerance = [f[1]/2 + 1e-9 for f in Ball_Message.FIELDS]
+        max_len = 0
+        for i, v in enumerate(values):
+            msg = Ball_Message.encode(*v)
+            max_len = max(max_len, len(msg))
+            if len(msg) > 20 or msg[0] == ";" or any(c in msg for c in " ()'\"\\"):
+                return False, max_len
+            data = Ball_Message.decode(msg.encode())
+            if data is None:
+                return False, max_len
+            e = v if expected is None else expected[i]
+            flat_e = (e[0], *e[1][:2], e[2], *e[3][:2], e[4])
+            flat_d = (data[0], *data[1], data[2], *data[3], data[4])
+            if any(abs(a-b) > t for a,b,t in zip(flat_e, flat_d, tolerance)):
+                return False, max_len
+        return True, max_len
+
+    def execute(self):
+        rng = np.random.default_rng(0)
+        n = 100000
+        f = Ball_Message
+        mins = [x[0] for x in f.FIELDS]
+        maxs = [x[0] + (x[2]-1) * x[1] for x in f.FIELDS]
+
+        def pack(a): # flat values -> (sender, ball_pos, confidence, ball_vel, age_ms)
+            return (int(a[0]), a[1:3], a[3], a[4:6], a[6])
+
+        random_values = [pack(a) for a in rng.uniform(mins, maxs, (n,7))]
+        random_values = [(int(rng.integers(1,12)), *v[1:]) for v in random_values]
+        extremes = [pack(mins), pack(maxs), pack([(a+b)/2 for a,b in zip(mins,maxs)])]
+        clipped = [pack(np.array(mins)-5), pack(np.array(maxs)+5)]
+
+        checks = [
+            ("Random values",   *self.check_round_trip(random_values)),
+            ("Extreme values",  *self.check_round_trip(extremes)),
+            ("Clipped values",  *self.check_round_trip(clipped, [pack(mins), pack(maxs)])),
+        ]
+
+        # Invalid messages must be rejected
+        max_comb = Ball_Message.COMBINATIONS
+        too_large = f.PREFIX
+        while max_comb:
+            too_large += Radio.SYMB[max_comb % Radio.SLEN]
+            max_comb //= Radio.SLEN
+        invalid = [b"", b"B", b"A10:-12.34,5.67,0.25", b"B" + b"~"*19, too_large.encode(), b"B!!(", b"B" + b"!"*20]
+        checks.append(("Invalid messages", all(Ball_Message.decode(m) is None for m in invalid), "-"))
+
+        UI.print_table([[c[0] for c in checks], ["passed" if c[1] else "FAILED" for c in checks], [str(c[2]) for c in checks]],
+                       ["Check","Result","Max length"], alignment=["<","^",">"])
@@ -0,0 +1,157 @@
+from communication.Broadcast_Scheduler import Information_Scheduler, Round_Robin_Scheduler
+from communication.Voting_Table import Voting_Table
+from scripts.commons.Script import Script
+from scripts.commons.UI import UI
+import numpy as np
+
+
+class Broadcast_Scheduler_Sim():
+    '''
+    Simulation of the collaborative ball consensus (see Communicator) with different broadcast schedulers
+
+    The simulated ball is kicked in random directions and slows down; the 2 teammates closest to the ball chase it,
+    while the others keep their formation positions (shifted towards the ball). A player sees the ball if it is closer than `view_range`.
+    Each agent runs its own scheduler and voting table, mimicking Communicator:
+        - a message can be sent every 40 ms, and is heard in the next step (20 ms later)
+        - if several agents send a message in the same step, only the first is heard
+        - the consensus is computed when the voting cycle ends (Communicator.check_and_handle_cycle_completion)
+    Metrics (computed for agents that cannot see the ball, in every step where at least one teammate sees the ball):
+        - consensus age: time since the (mean) observation time of the votes used in the last consensus
+        - consensus error: distance between the last consensus and the current ball position
+    This utility does not require a server.
+    '''
+
+    STEP = 20 # ms
+
+    def __init__(self, script:Script) -> None:
+        self.script = script
+
+    @staticmethod
+    def simulate(scheduler_factory, duration_ms:int, view_range:float, noise:float=0.05, seed:int=0):
+        '''
+        Simulate the consensus of a team whose agents use the schedulers created by `scheduler_factory()`
+        (the standard deviation of the observed ball position is `noise` times the distance to the ball)
+
+        Returns
+        -------
+        metrics : dict
+            mean and 95th percentile of the consensus age (ms), mean consensus error (m),
+            and slot usage (fraction of slots with a heard message, fraction of wasted slots, fraction of collisions)
+        '''
+        rng = np.random.default_rng(seed)
+        players = 11
+        step = Broadcast_Scheduler_Sim.STEP
+        home = np.column_stack((np.linspace(-13, 10, players), rng.uniform(-8, 8, players)))
+        pos = home.copy()
+        ball = np.zeros(2)
+        ball_vel = np.zeros(2)
+        next_kick = 0
+
+        schedulers = [scheduler_factory() for _ in range(players)]
+        tables = [Voting_Table(players) for _ in range(players)]
+        cycles = [-1] * players
+        estimate = [None] * players    # last consensus (x,y) of each agent
+        estimate_time = [0] * players  # mean observation time of the votes used in the last consensus
+        pending = None                 # message heard in the next step: (sender, sent time, ball position, confidence)
+        ages, errors = [], []
+        slots = used = wasted = collisions = 0
+
+        for t in range(0, duration_ms, step):
+
+            #------------------------------------------- Move ball and players
+            if t >= next_kick:
+                angle = rng.uniform(-np.pi, np.pi)
+                ball_vel = rng.uniform(2, 7) * np.array([np.cos(angle), np.sin(angle)])
+                next_kick = t + rng.integers(1000, 4000)
+            speed = np.linalg.norm(ball_vel)
+            if speed > 0:
+                ball_vel *= max(0, speed - 1.5 * step / 1000) / speed # deceleration of 1.5 m/s^2
+            ball += ball_vel * step / 1000
+            for i, limit in enumerate((15, 10)):
+                if abs(ball[i]) > limit:
+                    ball[i] = np.sign(ball[i]) * limit
+                    ball_vel[i] *= -0.5
+
+            dist = np.linalg.norm(pos - ball, axis=1)
+            targets = home * 0.6 + ball * 0.4
+            targets[np.argsort(dist)[:2]] = ball
+            move = targets - pos
+            move_len = np.maximum(np.linalg.norm(move, axis=1, keepdims=True), 1e-9)
+            pos += move / move_len * np.minimum(move_len, 0.7 * step / 1000)
+            dist = np.linalg.norm(pos - ball, axis=1)
+            sees_ball = dist < view_range
+
+            #------------------------------------------- Receive message sent in the previous step
+            if pending is not None:
+                sender, sent_time, ball_pos, confidence = pending
+                for i in range(players):
+                    if i != sender - 1:
+                        schedulers[i].report(sender, sent_time, confidence)
+                        tables[i].add(sender, *ball_pos, confidence, sent_time, replace=True)
+                pending = None
+
+            #------------------------------------------- Cycle completion (consensus)
+            for i in range(players):
+                cycle = t // schedulers[i].cycle_duration
+                if cycle != cycles[i]:
+                    consensus = tables[i].get_consensus()
+                    if consensus is not None:
+                        estimate[i] = consensus
+                        estimate_time[i] = np.mean(tables[i].time[tables[i].valid])
+                    tables[i].reset()
+                    cycles[i] = cycle
+
+            #------------------------------------------- Broadcast (messages are only sent every 40 ms)
+            if t % 40 == 0:
+                slots += 1
+                speakers = [i for i in range(players) if schedulers[i].get_slot_owner(t) == i+1 and sees_ball[i]]
+                if speakers:
+                    used += 1
+                    collisions += len(speakers) > 1
+                    for i in speakers:
+                        confidence = round(max(1 / (dist[i] + 1), 0.1), 2)
+                        observed_ball = ball + rng.normal(0, noise * dist[i], 2)
+                        schedulers[i].report(i+1, t, confidence)
+                        tables[i].add(i+1, *observed_ball, confidence, t, replace=True)
+                        if i == speakers[0]:
+                            pending = (i+1, t, observed_ball, confidence)
+                elif np.any(sees_ball):
+                    wasted += 1
+
+            #------------------------------------------- Metrics
+            if not np.any(sees_ball):
+                continue # there is nothing to report
+            for i in np.flatnonzero(~sees_ball):
+                if estimate[i] is not None:
+                    ages.append(t - estimate_time[i])
+                    errors.append(np.hypot(estimate[i][0] - ball[0], estimate[i][1] - ball[1]))
+
+        return {
+            "age_mean": np.mean(ages), "age_p95": np.percentile(ages, 95), "error_mean": np.mean(errors),
+            "used": used / slots, "wasted": wasted / slots, "collisions": collisions / slots
+        }
+
+    def execute(self):
+        duration = UI.read_int("Simulated time in seconds (e.g. 300): ", 1, 100000) * 1000
+        view_range = 5
+
+        schedulers = [
+            ("Round robin",                 lambda: Round_Robin_Scheduler()),
+            ("Information (2 slots/cycle)", lambda: Information_Scheduler(cycle_slots=2)),
+            ("Information (3 slots/cycle)", lambda: Information_Scheduler(cycle_slots=3)),
+            ("Information (4 slots/cycle)", lambda: Information_Scheduler(cycle_slots=4)),
+        ]
+
+        columns = [[] for _ in range(7)]
+        for name, factory in schedulers:
+            m = self.simulate(factory, duration, view_range)
+            columns[0].append(name)
+            columns[1].append(f"{m['age_mean']:.0f}")
+            columns[2].append(f"{m['age_p95']:.0f}")
+            columns[3].append(f"{m['error_mean']:.2f}")
+            columns[4].append(f"{m['used']*100:.1f}")
+            columns[5].append(f"{m['wasted']*100:.1f}")
+            columns[6].append(f"{m['collisions']*100:.1f}")
+
+        UI.print_table(columns, ["Scheduler","Age (ms)","Age p95 (ms)","Error (m)","Used slots %","Wasted slots %","Collisions %"],
+                       alignment=["<",">",">",">",">",">",">"])
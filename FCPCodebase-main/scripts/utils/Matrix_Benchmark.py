@@ -0,0 +1,61 @@
+from math_ops.Matrix_3x3 import Matrix_3x3
+from math_ops.Matrix_4x4 import Matrix_4x4
+from scripts.commons.Script import Script
+from scripts.commons.UI import UI
+import numpy as np
+import timeit
+
+
+class Matrix_Benchmark():
+    '''
+    Benchmark of the rigid-transform fast paths of Matrix_4x4 and Matrix_3x3
+
+    Each operation is compared with its general counterpart (np.linalg.inv, or 4D vector built with np.append),
+    using random rigid transformations. The maximum absolute difference between both results is also shown.
+    This benchmark does not require a server.
+    '''
+
+    def __init__(self, script:Script) -> None:
+        self.script = script
+
+    @staticmethod
+    def translate_4d(mat:Matrix_4x4, vec):
+        ''' General translation, using a 4D vector '''
+        vec = np.array([*vec,1])
+        np.matmul(mat.m, vec, out=vec)
+        mat.m[:,3] = vec
+        return mat
+
+    def execute(self):
+        n = UI.read_int("Number of calls per operation (e.g. 100000): ", 1, 100000000)
+
+        rng = np.random.default_rng(0)
+        r = Matrix_3x3.from_rotation_deg(rng.uniform(-180,180,3))
+        a = Matrix_4x4.from_3x3_and_translation(r, rng.uniform(-10,10,3))
+        b = Matrix_4x4.from_3x3_and_translation(Matrix_3x3.from_rotation_deg(rng.uniform(-180,180,3)), rng.uniform(-10,10,3))
+        out = Matrix_4x4()
+        vec = rng.uniform(-10,10,3)
+
+        # (operation name, general version, fast version)
+        operations = [
+            ("Matrix_4x4.invert",   lambda: a.invert(is_rigid=False),      lambda: a.invert(is_rigid=True)),
+            ("Matrix_3x3.invert",   lambda: r.invert(is_rigid=False),      lambda: r.invert(is_rigid=True)),
+            ("Matrix_4x4 * vector", lambda: np.matmul(a.m, np.append(vec,1))[0:3], lambda: a.multiply(vec)),
+            ("Matrix_4x4.translate (in place)", lambda: self.translate_4d(Matrix_4x4(a), vec), lambda: Matrix_4x4(a).translate(vec, True)),
+            ("Matrix_4x4 * Matrix_4x4", lambda: a.multiply(b),             lambda: out.set_product(a, b)),
+        ]
+
+        columns = [[],[],[],[],[]]
+        for name, general, fast in operations:
+            g, f = general(), fast()
+            g, f = (g.m, f.m) if hasattr(g, "m") else (g, f)
+            t_general = timeit.timeit(general, number=n) / n * 1e6
+            t_fast = timeit.timeit(fast, number=n) / n * 1e6
+            columns[0].append(name)
+            columns[1].append(f"{t_general:.2f}")
+            columns[2].append(f"{t_fast:.2f}")
+            columns[3].append(f"{t_general/t_fast:.1f}x")
+            columns[4].append(f"{np.max(np.abs(g-f)):.1e}")
+
+        print("\nTimes in microseconds per call")
+        UI.print_table(columns, ["Operation","General","Fast path","Speedup","Max abs diff"], alignment=["<",">",">",">",">"])
@@ -0,0 +1,55 @@
+from math_ops.Math_Ops import Math_Ops as M
+from math_ops.Neural_Network import MLP, export_network, load_npy_network, run_mlp
+from os.path import getsize, join, splitext
+from scripts.commons.Script import Script
+from scripts.commons.UI import UI
+from time import perf_counter
+import numpy as np
+import os
+import pickle
+
+
+class Network_Export():
+    '''
+    Export all pickled neural networks in /behaviors/custom to memory-mappable .npy files
+
+    Behaviors load networks with load_network(), which memory-maps the .npy file if it exists,
+    so that all agents share the same pages and skip unpickling (the .pkl file is used as fallback, also when
+    it changed after the export, which is detected through the hash written to <name>.npy.sha1).
+    For each network, the loading times and the maximum absolute difference between outputs are shown.
+    This utility does not require a server.
+    '''
+
+    def __init__(self, script:Script) -> None:
+        self.script = script
+
+    def execute(self):
+        dir = M.get_active_directory("/behaviors/custom/")
+        pkl_files = sorted(join(root, f) for root, _, files in os.walk(dir) for f in files if f.endswith(".pkl"))
+        rng = np.random.default_rng(0)
+        columns = [[],[],[],[],[]]
+
+        for pkl_file in pkl_files:
+            npy_file = splitext(pkl_file)[0] + ".npy"
+
+            t = perf_counter()
+            with open(pkl_file, 'rb') as f:
+                weights = pickle.load(f)
+            t_pkl = perf_counter() - t
+
+            export_network(weights, npy_file, pkl_file)
+
+            t = perf_counter()
+            layers = load_npy_network(npy_file)
+            t_npy = perf_counter() - t
+
+            obs = rng.uniform(-1, 1, len(weights[0][1][0])).astype(np.float32)
+            diff = np.max(np.abs(run_mlp(obs, weights) - MLP(layers)(obs)))
+
+            columns[0].append(pkl_file[len(dir):])
+            columns[1].append(f"{getsize(npy_file)/1024:.1f}")
+            columns[2].append(f"{t_pkl*1000:.3f}")
+            columns[3].append(f"{t_npy*1000:.3f}")
+            columns[4].append(f"{diff:.1e}")
+
+        UI.print_table(columns, ["Network",".npy size (kB)","Unpickle (ms)","Memory-map (ms)","Max abs diff"], alignment=["<",">",">",">",">"])
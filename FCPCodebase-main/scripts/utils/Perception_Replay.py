@@ -0,0 +1,118 @@
+from agent.Agent import Agent
+from communication.Perception_Recorder import Perception_Recorder
+from communication.Server_Comm import Server_Comm
+from communication.World_Parser import World_Parser
+from logs.Logger import Logger
+from os import listdir
+from os.path import isdir, isfile, join
+from scripts.commons.Script import Script
+from scripts.commons.UI import UI
+from time import perf_counter
+from world.World import World
+import cProfile
+import numpy as np
+
+
+class Perception_Replay():
+    '''
+    Record raw server messages and replay them offline through World_Parser.parse() + World.update()
+
+    Replaying does not require rcssserver3d, so the whole perception pipeline (including the localization
+    and ball predictor C++ modules) can be benchmarked or profiled in a deterministic and repeatable way.
+    When profiling, the cProfile stats are saved to the file 'profile', which can be opened with
+    pstats, snakeviz, or converted to a flame graph (e.g. with flameprof).
+
+    Note: during the replay, World.update() is called after every message (as in sync mode without lost packets)
+    '''
+    FOLDER = "./recordings/"
+
+    def __init__(self, script:Script) -> None:
+        self.script = script
+
+    def execute(self):
+        while True:
+            idx = UI.print_table([["Record","Replay","Replay & Profile"]], numbering=[True], prompt='Choose option (ctrl+c to return): ')[0]
+            if idx == 0:
+                self.record()
+            else:
+                folder = Perception_Replay.FOLDER
+                files = sorted(f for f in listdir(folder) if isfile(join(folder, f)) and f.endswith(".rec")) if isdir(folder) else []
+                if not files:
+                    print(f"No recordings found in '{Perception_Replay.FOLDER}'\n")
+                    continue
+                file = files[UI.print_list(files, prompt="Choose recording: ")[0]]
+                repetitions = UI.read_int("Number of repetitions: ", 1, 1000)
+                self.replay(join(Perception_Replay.FOLDER, file), repetitions, idx == 2)
+
+
+    def record(self):
+        a = self.script.args
+        steps = UI.read_int("Number of steps to record (50 steps = 1 second): ", 1, 1000000)
+
+        Server_Comm.record_folder = Perception_Replay.FOLDER
+        try:
+            # Args: Server IP, Agent Port, Monitor Port, Uniform No., Team name, Enable Log, Enable Draw
+            self.script.batch_create(Agent, ((a.i,a.p,a.m,a.u,a.t,False,False),))
+        finally:
+            Server_Comm.record_folder = None
+
+        p : Agent = self.script.players[-1]
+        for _ in range(steps):
+            p.think_and_send()
+            p.scom.receive()
+
+        print(f"Recorded {p.scom.recorder.no_of_frames} messages to '{Perception_Replay.FOLDER}{a.t}_{a.u}.rec'\n")
+        self.script.batch_terminate()
+
+
+    def hear_message(self, msg:bytearray, direction, timestamp:float) -> None:
+        pass
+
+
+    def replay(self, filename, repetitions, profile):
+        header = Perception_Recorder.read_header(filename)
+        frames = list(Perception_Recorder.read_frames(filename)) # load everything so that disk I/O is not measured
+        if not frames:
+            print("The recording is empty!\n")
+            return
+
+        parse_times = np.zeros((repetitions, len(frames)))
+        update_times = np.zeros((repetitions, len(frames)))
+        profiler = cProfile.Profile() if profile else None
+
+        for rep in range(repetitions):
+            # Args: Robot Type, Team Name, Uniform No., Play Mode Correction, Enable Draw, Logger, Host
+            world = World(header["robot_type"], header["team_name"], header["unum"], True, False, Logger(False, "replay"), "localhost")
+            parser = World_Parser(world, self.hear_message)
+            skipped_steps = 0
+
+            if profiler is not None: profiler.enable()
+            for i, (step, msg) in enumerate(frames):
+                t0 = perf_counter()
+                parser.parse(msg)
+                t1 = perf_counter()
+                world.update()
+                t2 = perf_counter()
+                parse_times[rep,i] = t1 - t0
+                update_times[rep,i] = t2 - t1
+                skipped_steps += step != world.step
+            if profiler is not None: profiler.disable()
+
+        if skipped_steps:
+            print(f"Warning: the recorded step did not match the replayed step in {skipped_steps} messages (lost packets?)")
+
+        columns = [[],[],[],[],[]]
+        for name, times in (("parse", parse_times), ("update", update_times), ("total", parse_times + update_times)):
+            times = times.flatten() * 1e6
+            columns[0].append(name)
+            columns[1].append(f"{np.mean(times):.1f}")
+            columns[2].append(f"{np.median(times):.1f}")
+            columns[3].append(f"{np.percentile(times, 99):.1f}")
+            columns[4].append(f"{np.max(times):.1f}")
+
+        print(f"\n{len(frames)} messages x {repetitions} repetitions (times in microseconds per message)")
+        UI.print_table(columns, ["Stage","Mean","Median","99th perc.","Max"], alignment=["<",">",">",">",">"])
+
+        if profiler is not None:
+            profiler.dump_stats("profile")
+            print("Profile saved to 'profile' (e.g. python -m pstats profile, or snakeviz profile)\n")
@@ -0,0 +1,245 @@
+from logs.Telemetry import Telemetry
+from scripts.commons.Script import Script
+from scripts.commons.UI import UI
+import numpy as np
+import os
+import pandas as pd
+import time
+
+
+class Voting_Replay():
+    '''
+    Offline replay of recorded ball observations with alternative broadcast schedulers and fusion rules
+
+    The recorded ball updates (see agent_logs/metrics_logger.py and logs/Telemetry.py) provide, for each agent and voting cycle,
+    the ball position seen by the agent (if any) and the agent position. Each recorded cycle is replayed as a frame
+    of `frame_ms` ms (the cycle duration of the recorded match), divided into broadcast slots of `interval` ms:
+        - the scheduler decides the owner of each slot, and the owner votes if it sees the ball
+          (a player that owns several slots in a frame keeps its last vote, as Voting_Table with replace=True)
+        - the confidence of a vote is a function of the distance between the agent and the ball (CONFIDENCE_MODELS)
+        - votes are fused at the end of the frame with weight confidence^power
+        - if there are no votes, the agent keeps its last estimate
+    Evaluation (leave-one-out): in every frame, each agent that sees the ball is evaluated with the estimate computed from
+    its teammates' votes only (what it would know without vision), and its own observation is the reference.
+        - error: distance between the estimate and the agent's observation
+        - latency: mean age of the fused votes (time from observation to the end of the frame),
+                   plus the age of the estimate if it was kept from a previous frame
+    All frames and agents are processed at once with numpy (no loop over frames), so parameter sweeps are fast.
+    Messages are never lost (no collisions), and the active players of Information_Scheduler are chosen
+    from the confidence in the current frame (instead of the reports heard in the last `window` ms).
+    This utility does not require a server.
+    '''
+
+    PLAYERS = 11
+    CONFIDENCE_MODELS = {
+        "inverse":     lambda d: np.maximum(1 / (d + 1), 0.1),   # Communicator.calculate_confidence_score
+        "inverse_sq":  lambda d: np.maximum(1 / (d * d + 1), 0.01),
+        "exponential": lambda d: np.maximum(np.exp(-d / 3), 0.01),
+    }
+
+    def __init__(self, script:Script) -> None:
+        self.script = script
+
+    @staticmethod
+    def load(path:str):
+        '''
+        Load recorded ball updates: parsed_logs.csv/.json or Parquet dataset (agent_logs/metrics_logger.py),
+        or telemetry file/directory (logs/Telemetry.py)
+
+        Returns
+        -------
+        obs : dict
+            replay data (see prepare)
+        '''
+        if path.endswith(".csv"):
+            df = pd.read_csv(path)
+        elif path.endswith(".json"):
+            df = pd.read_json(path)
+        elif path.endswith(Telemetry.EXT) or (os.path.isdir(path) and not any(f.endswith(".parquet") for f in os.listdir(path))):
+            df = Telemetry.load(path)
+        else:
+            df = pd.read_parquet(path)
+        return Voting_Replay.prepare(df)
+
+    @staticmethod
+    def prepare(df:pd.DataFrame, frame_ms:int=None):
+        '''
+        Convert recorded ball updates to replay data (first update of each agent in each cycle),
+        sorted by match (directory of the source log file), agent and cycle
+
+        Parameters
+        ----------
+        frame_ms : int
+            duration of a recorded cycle (ms); default: estimated from the server time (telemetry),
+            or 440 (cycle of the round-robin scheduler with 11 players and 40 ms slots)
+
+        Returns
+        -------
+        obs : dict
+            numpy arrays (one element per row): match, agent, cycle, frame (id of (match, cycle)), seen, vision (n,2), distance;
+            and frame_ms, frames (number of frames)
+        '''
+        df = df[df["cycle"].notna()]
+        if "source" in df and len(df):
+            source = df["source"].astype("category")
+            dirs = pd.Index([os.path.dirname(str(c)) for c in source.cat.categories])
+            match = pd.factorize(dirs)[0][source.cat.codes.to_numpy()]
+        else:
+            match = np.zeros(len(df), np.int64)
+        agent = df["agent_id"].to_numpy(np.int64)
+        cycle = df["cycle"].to_numpy(np.int64)
+
+        key = (match.astype(np.int64) << 40) | (agent << 32) | (cycle - (cycle.min() if len(cycle) else 0))
+        order = np.argsort(key, kind="stable")
+        first = order[np.r_[True, np.diff(key[order]) != 0]] if len(order) else order
+
+        if frame_ms is None:
+            frame_ms = 440
+            if "server_time" in df and len(first) > 1:
+                same = np.diff(key[first] >> 32) == 0 # consecutive rows of the same agent
+                dt, dc = np.diff(df["server_time"].to_numpy(np.int64)[first])[same], np.diff(cycle[first])[same]
+                if np.any(dc > 0):
+                    frame_ms = int(round(np.median(dt[dc > 0] / dc[dc > 0])))
+
+        vision = df[["vision_x", "vision_y"]].to_numpy(np.float64)[first]
+        agent_pos = df[["agent_pos_x", "agent_pos_y"]].to_numpy(np.float64)[first]
+        seen = ~np.isnan(vision).any(axis=1)
+        frame = pd.factorize((match[first].astype(np.int64) << 32) | (cycle[first] - (cycle.min() if len(cycle) else 0)))[0]
+
+        return {"match":match[first], "agent":agent[first], "cycle":cycle[first], "frame":frame, "seen":seen,
+                "vision":np.where(seen[:,None], vision, 0), "distance":np.linalg.norm(vision - agent_pos, axis=1),
+                "frame_ms":frame_ms, "frames":int(frame.max()) + 1 if len(frame) else 0}
+
+    @staticmethod
+    def get_slot_owners(obs, confidence, scheduler:str, slots:int, cycle_slots:int):
+        '''
+        Returns slot owners (unum) of each frame (frames x slots), for scheduler "round_robin" or "information"
+        (same rules as Round_Robin_Scheduler and Information_Scheduler in communication/Broadcast_Scheduler.py)
+        '''
+        P = Voting_Replay.PLAYERS
+        n_frames = obs["frames"]
+        frame_cycle = np.zeros(n_frames, np.int64)
+        frame_cycle[obs["frame"]] = obs["cycle"]
+        g = frame_cycle[:,None] * slots + np.arange(slots) # global slot index
+        owners = P - g % P                                  # round robin
+
+        if scheduler == "round_robin":
+            return owners
+
+        # Active players: teammates with the highest confidence that see the ball (at most cycle_slots-1 per frame)
+        s = np.flatnonzero(obs["seen"])
+        s = s[np.lexsort((obs["agent"][s], -confidence[s], obs["frame"][s]))]
+        f = obs["frame"][s]
+        rank = np.arange(len(s)) - np.searchsorted(f, f)
+        s, rank = s[rank < cycle_slots-1], rank[rank < cycle_slots-1]
+        active = np.zeros((n_frames, max(cycle_slots-1, 1)), np.int64)
+        active[obs["frame"][s], rank] = obs["agent"][s]
+        n_active = np.count_nonzero(active, axis=1)
+
+        slot, cycle = g % cycle_slots, g // cycle_slots
+        fi, si = np.nonzero((slot > 0) & (n_active[:,None] > 0))
+        owners[fi, si] = active[fi, (slot[fi, si] - 1) % n_active[fi]]
+
+        # Exploration slots: inactive players in round-robin order (descending unum)
+        fi, si = np.nonzero((slot == 0) & (n_active[:,None] > 0))
+        is_active = np.zeros((n_frames, P+1), bool)
+        is_active[np.arange(n_frames)[:,None], active] = True
+        inactive_rank = np.cumsum(~is_active[:, P:0:-1], axis=1) # number of inactive players from unum P down to each unum
+        k = cycle[fi, si] % (P - n_active[fi]) + 1
+        owners[fi, si] = P - np.argmax(inactive_rank[fi] == k[:,None], axis=1)
+        return owners
+
+    @staticmethod
+    def replay(obs, scheduler:str="information", interval:int=40, cycle_slots:int=3, power:float=2.0, confidence:str="inverse"):
+        '''
+        Replay recorded observations with a scheduler and fusion rule
+
+        Returns
+        -------
+        metrics : dict
+            error (mean, p95) (m), latency (mean, p95) (ms), availability (fraction of evaluations with an estimate),
+            messages per frame, and slot usage (fraction of slots with a vote)
+        '''
+        frame_ms = obs["frame_ms"]
+        slots = max(frame_ms // interval, 1)
+        f, agent, seen, vision = obs["frame"], obs["agent"], obs["seen"], obs["vision"]
+        conf = np.where(seen, np.round(Voting_Replay.CONFIDENCE_MODELS[confidence](np.nan_to_num(obs["distance"])), 2), 0)
+
+        #------------------------------------------- Votes (last slot owned by each agent that sees the ball)
+        n = obs["frames"]
+        owners = Voting_Replay.get_slot_owners(obs, conf, scheduler, slots, cycle_slots)
+        last = np.full((n, Voting_Replay.PLAYERS+1), -1) # last slot owned by each unum in each frame (-1: none)
+        for j in range(slots):
+            last[np.arange(n), owners[:,j]] = j
+        last_slot = last[f, agent]
+        votes = (last_slot >= 0) & seen
+        age = np.where(votes, frame_ms - last_slot * interval, 0) # time from observation to the end of the frame
+        w = np.where(votes, conf ** power, 0)
+
+        #------------------------------------------- Leave-one-out fusion at the end of each frame
+        sum_w, count = np.bincount(f, w, n), np.bincount(f, votes, n)
+        sum_wx, sum_wy = np.bincount(f, w * vision[:,0], n), np.bincount(f, w * vision[:,1], n)
+        sum_age = np.bincount(f, age, n)
+        others_w, others = sum_w[f] - w, count[f] - votes
+        valid = (others > 0) & (others_w > 0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            est = pd.DataFrame({
+                "x":       np.where(valid, (sum_wx[f] - w * vision[:,0]) / others_w, np.nan),
+                "y":       np.where(valid, (sum_wy[f] - w * vision[:,1]) / others_w, np.nan),
+                "latency": np.where(valid, (sum_age[f] - age) / others, np.nan),
+                "cycle":   np.where(valid, obs["cycle"], np.nan),
+            })
+
+        # Agents keep their last estimate (rows are sorted by match, agent and cycle)
+        est = est.groupby([obs["match"], agent], sort=False).ffill()
+        latency = est["latency"].to_numpy() + (obs["cycle"] - est["cycle"].to_numpy()) * frame_ms
+
+        #------------------------------------------- Evaluation of agents that see the ball
+        e = seen & est["x"].notna().to_numpy()
+        error = np.hypot(est["x"].to_numpy()[e] - vision[e,0], est["y"].to_numpy()[e] - vision[e,1])
+        percentile = lambda a: np.percentile(a, 95) if len(a) else np.nan
+        return {
+            "error_mean": np.mean(error) if len(error) else np.nan, "error_p95": percentile(error),
+            "latency_mean": np.mean(latency[e]) if len(error) else np.nan, "latency_p95": percentile(latency[e]),
+            "availability": np.count_nonzero(e) / max(np.count_nonzero(seen), 1),
+            "messages": np.count_nonzero(votes) / max(n, 1), "slot_usage": np.count_nonzero(votes) / max(n * slots, 1),
+        }
+
+    def execute(self):
+        default = "agent_logs/parsed_logs.parquet" # dataset of metrics_logger.py, or telemetry files written by the agents
+        if not os.path.exists(default):
+            default = "agent_logs"
+        path = input(f"Recorded logs (CSV/JSON/Parquet of metrics_logger.py, or telemetry directory) ('' for {default}): ") or default
+        obs = self.load(path)
+        print(f"\n{len(obs['agent'])} agent updates, {obs['frames']} frames of {obs['frame_ms']} ms\n")
+
+        strategies = [ # name, scheduler, interval, cycle slots, power, confidence model
+            ("Round robin",                      "round_robin", 40, 3, 2, "inverse"),
+            ("Information, 2 slots",             "information", 40, 2, 2, "inverse"),
+            ("Information, 3 slots (default)",   "information", 40, 3, 2, "inverse"),
+            ("Information, 4 slots",             "information", 40, 4, 2, "inverse"),
+            ("Information, 3 slots, 20 ms",      "information", 20, 3, 2, "inverse"),
+            ("Information, 3 slots, 80 ms",      "information", 80, 3, 2, "inverse"),
+            ("Information, 3 slots, power 0",    "information", 40, 3, 0, "inverse"),
+            ("Information, 3 slots, power 1",    "information", 40, 3, 1, "inverse"),
+            ("Information, 3 slots, power 4",    "information", 40, 3, 4, "inverse"),
+            ("Information, 3 slots, inverse_sq", "information", 40, 3, 2, "inverse_sq"),
+            ("Information, 3 slots, exp.",       "information", 40, 3, 2, "exponential"),
+        ]
+
+        columns = [[] for _ in range(7)]
+        t = time.perf_counter()
+        for name, *params in strategies:
+            m = self.replay(obs, *params)
+            columns[0].append(name)
+            columns[1].append(f"{m['error_mean']:.3f}")
+            columns[2].append(f"{m['error_p95']:.3f}")
+            columns[3].append(f"{m['latency_mean']:.0f}")
+            columns[4].append(f"{m['latency_p95']:.0f}")
+            columns[5].append(f"{m['availability']*100:.1f}")
+            columns[6].append(f"{m['messages']:.2f}")
+        t = time.perf_counter() - t
+
+        UI.print_table(columns, ["Strategy","Error (m)","Error p95 (m)","Latency (ms)","Latency p95 (ms)","Available %","Messages/frame"],
+                       alignment=["<",">",">",">",">",">",">"])
+        print(f"Replayed {len(strategies)} strategies in {t:.2f} s")
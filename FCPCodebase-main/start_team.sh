@@ -0,0 +1,8 @@
+#!/bin/bash
+export OMP_NUM_THREADS=1
+
+host=${1:-localhost}
+port=${2:-3100}
+
+# Optional: FCP_AGENTS_PER_WORKER (e.g. 3), FCP_CORES (e.g. 0,1,2,3) and FCP_INFERENCE_BROKER (e.g. 1), see Run_Team.py
+python3 ./Run_Team.py -i $host -p $port -t Research_Team -P 0 -D 0
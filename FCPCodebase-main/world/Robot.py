@@ -1,8 +1,8 @@
-from collections import deque
 from math import atan, pi, sqrt, tan
 from math_ops.Math_Ops import Math_Ops as M
 from math_ops.Matrix_3x3 import Matrix_3x3
 from math_ops.Matrix_4x4 import Matrix_4x4
+from math_ops.Ring_Buffer import Ring_Buffer
 from world.commons.Body_Part import Body_Part
 from world.commons.Joint_Info import Joint_Info
 import numpy as np
@@ -31,6 +31,9 @@ class Robot():
     # Recommended height for unofficial beam (near ground)
     BEAM_HEIGHTS = [0.4, 0.43, 0.4, 0.46, 0.4]
 
+    # Parsed robot XML files, shared by all robots in the same process (and by forked processes, through copy-on-write)
+    XML_ROOTS = dict()
+
 
     def __init__(self, unum:int, robot_type:int) -> None:
         robot_xml = "nao"+str(robot_type)+".xml" # Typical NAO file name
@@ -66,7 +69,7 @@ class Robot():
         self.loc_rotation_head_to_field = Matrix_3x3()   # Rotation matrix from head to field
         self.loc_rotation_field_to_head = Matrix_3x3()   # Rotation matrix from field to head
         self.loc_head_position = np.zeros(3)             # Absolute head position (m)
-        self.loc_head_position_history = deque(maxlen=40)# Absolute head position history (queue with up to 40 old positions at intervals of 0.04s, where index 0 is the previous position)
+        self.loc_head_position_history = Ring_Buffer(40) # Absolute head position history (up to 40 old positions at intervals of 0.04s, where index 0 is the previous position)
         self.loc_head_velocity = np.zeros(3)             # Absolute head velocity (m/s) (Warning: possibly noisy)
         self.loc_head_orientation = 0                    # Head orientation (deg)
         self.loc_is_up_to_date = False                   # False if this is not a visual step, or not enough elements are visible
@@ -161,8 +164,7 @@ class Robot():
 
         #------------------ parse robot xml
 
-        dir = M.get_active_directory("/world/commons/robots/")
-        robot_xml_root = xmlp.parse(dir + robot_xml).getroot()
+        robot_xml_root = Robot.get_xml_root(robot_xml)
 
         joint_no = 0
         for child in robot_xml_root:
@@ -184,6 +186,19 @@ class Robot():
 
         assert joint_no == self.no_of_joints, "The Robot XML and the robot type don't match!"
 
+        # Preformatted effectors command (only the speeds change between commands)
+        self.command_template = "".join(f"({ji.effector} %.5f)" for ji in self.joints_info).encode()
+        self.command_speeds = np.zeros(self.no_of_joints) # reusable buffer for the speeds sent to the server
+
+
+    @staticmethod
+    def get_xml_root(robot_xml:str):
+        ''' Returns root element of robot XML file (the file is parsed once per process, the returned tree must not be modified) '''
+        if robot_xml not in Robot.XML_ROOTS:
+            dir = M.get_active_directory("/world/commons/robots/")
+            Robot.XML_ROOTS[robot_xml] = xmlp.parse(dir + robot_xml).getroot()
+        return Robot.XML_ROOTS[robot_xml]
+
 
     def get_head_abs_vel(self, history_steps:int):
         '''
@@ -238,6 +253,49 @@ class Robot():
             self.joints_info[i].min = -self.joints_info[i].max
             self.joints_info[i].max = -aux
 
+        #------------------ structure-of-arrays kinematic model (used by update_pose)
+
+        # Transformation matrices are stored in contiguous stacks, and the Matrix_4x4 objects become views of these stacks
+        part_index = {name:i for i,name in enumerate(self.body_parts)}
+        self.body_parts_transform_stack = np.tile(np.identity(4), (len(self.body_parts),1,1)) # body part to head transformation matrices
+        self.joints_transform_stack = np.tile(np.identity(4), (self.no_of_joints,1,1))        # joint to head transformation matrices
+        for name, body_part in self.body_parts.items():
+            body_part.transform.m = self.body_parts_transform_stack[part_index[name]]
+        for j in range(self.no_of_joints):
+            self.joints_transform[j].m = self.joints_transform_stack[j]
+
+        masses = np.array([b.mass for b in self.body_parts.values()])
+        self.body_parts_mass_ratio = masses / np.sum(masses) # weights used to compute the center of mass
+
+        # Sort kinematic chain by depth, so that all joints whose parent body part is at the same depth are computed together
+        depth = {"head":0}
+        for body_part, j, child_body_part in self.fwd_kinematics_list:
+            depth[self.joints_info[j].anchor1_part] = depth[self.joints_info[j].anchor0_part] + 1
+        chain = sorted(self.fwd_kinematics_list, key=lambda e: depth[self.joints_info[e[1]].anchor0_part]) # stable sort
+
+        self.kin_joints  = np.array([j for _,j,_ in chain])                                              # joint indices
+        self.kin_parents = np.array([part_index[self.joints_info[j].anchor0_part] for j in self.kin_joints]) # parent body part indices
+        self.kin_children= np.array([part_index[self.joints_info[j].anchor1_part] for j in self.kin_joints]) # child body part indices
+        self.kin_anchor0 = np.array([self.joints_info[j].anchor0_axes for j in self.kin_joints])            # anchor in parent body part
+        self.kin_anchor1_neg = np.array([self.joints_info[j].anchor1_axes_neg for j in self.kin_joints])[:,:,None] # negative anchor in child body part
+
+        # Rodrigues' rotation formula: R = k*k^T + cos(a)*(I - k*k^T) + sin(a)*[k]x
+        axes = np.array([self.joints_info[j].axes for j in self.kin_joints])
+        self.kin_axes_outer = axes[:,:,None] * axes[:,None,:]
+        self.kin_axes_outer_complement = np.identity(3) - self.kin_axes_outer
+        self.kin_axes_cross = np.zeros((len(axes),3,3))
+        self.kin_axes_cross[:,0,1], self.kin_axes_cross[:,0,2] = -axes[:,2],  axes[:,1]
+        self.kin_axes_cross[:,1,0], self.kin_axes_cross[:,1,2] =  axes[:,2], -axes[:,0]
+        self.kin_axes_cross[:,2,0], self.kin_axes_cross[:,2,1] = -axes[:,1],  axes[:,0]
+
+        self.kin_local = np.tile(np.identity(4), (len(axes),1,1)) # child body part to parent body part transformation matrices
+        self.kin_levels = [] # list of (slice of kinematic chain, parents, children)
+        start = 0
+        for i in range(1, len(chain)+1):
+            if i == len(chain) or depth[self.joints_info[chain[i][1]].anchor0_part] != depth[self.joints_info[chain[start][1]].anchor0_part]:
+                self.kin_levels.append((slice(start,i), self.kin_parents[start:i], self.kin_children[start:i]))
+                start = i
+
 
     def update_localization(self, localization_raw, time_local_ms): 
 
@@ -253,7 +311,7 @@ class Robot():
             self.loc_head_z_last_update = time_local_ms
 
         # Save last position to history at every vision cycle (even if not up to date) (update_localization is only called at vision cycles)
-        self.loc_head_position_history.appendleft(np.copy(self.loc_head_position))
+        self.loc_head_position_history.append(self.loc_head_position, time_local_ms / 1000)
 
         if self.loc_is_up_to_date:
             time_diff = (time_local_ms - self.loc_last_update) / 1000
@@ -310,12 +368,14 @@ class Robot():
         Returns
         -------
         coord : `list` or ndarray
-            A numpy array is returned if is_batch is False, otherwise, a list of arrays is returned
+            A numpy array is returned if is_batch is False, otherwise, a list of arrays (or Matrix_4x4) is returned
         '''
-        head_to_bp_transform : Matrix_4x4 = self.body_parts[body_part_name].transform.invert()
+        head_to_bp_transform : Matrix_4x4 = self.body_parts[body_part_name].transform.invert(is_rigid=True)
         
         if is_batch:
-            return [head_to_bp_transform(c) for c in coords]
+            if len(coords) > 0 and type(coords[0]) == Matrix_4x4:
+                return [head_to_bp_transform(c) for c in coords]
+            return list(head_to_bp_transform(np.asarray(coords, float).reshape(-1,3))) # all positions are converted with a single matmul
         else:
             return head_to_bp_transform(coords)
 
@@ -358,16 +418,25 @@ class Robot():
         if self.fwd_kinematics_list is None:
             self._initialize_kinematics()
 
-        for body_part, j, child_body_part in self.fwd_kinematics_list:
-            ji = self.joints_info[j]
-            self.joints_transform[j].m[:] = body_part.transform.m
-            self.joints_transform[j].translate(ji.anchor0_axes, True)
-            child_body_part.transform.m[:] = self.joints_transform[j].m
-            child_body_part.transform.rotate_deg(ji.axes, self.joints_position[j], True)
-            child_body_part.transform.translate(ji.anchor1_axes_neg, True)
+        # child body part to parent body part: translate(anchor0) * rotate(axis, angle) * translate(-anchor1)
+        angles = self.joints_position[self.kin_joints] * (pi/180)
+        rot = self.kin_local[:,:3,:3]
+        rot[:] = self.kin_axes_outer
+        rot += np.cos(angles)[:,None,None] * self.kin_axes_outer_complement
+        rot += np.sin(angles)[:,None,None] * self.kin_axes_cross
+        self.kin_local[:,:3,3] = np.matmul(rot, self.kin_anchor1_neg)[:,:,0] + self.kin_anchor0
+
+        # body part to head, one level of the kinematic chain at a time
+        parts = self.body_parts_transform_stack
+        for level, parents, children in self.kin_levels:
+            parts[children] = np.matmul(parts[parents], self.kin_local[level])
+
+        # joint to head: parent body part to head * translate(anchor0)
+        joints = self.joints_transform_stack
+        joints[self.kin_joints] = parts[self.kin_parents]
+        joints[self.kin_joints,:3,3] += np.matmul(parts[self.kin_parents,:3,:3], self.kin_anchor0[:,:,None])[:,:,0]
 
-        self.rel_cart_CoM_position = np.average([b.transform.get_translation() for b in self.body_parts.values()], 0,
-                                                [b.mass                        for b in self.body_parts.values()])
+        self.rel_cart_CoM_position = np.matmul(self.body_parts_mass_ratio, parts[:,:3,3])
 
 
     def update_imu(self, time_local_ms):
@@ -411,9 +480,11 @@ class Robot():
 
             # convert proper acceleration to coordinate acceleration and fix rounding bias
             self.imu_weak_torso_acceleration = self.imu_torso_to_field_rotation.multiply(self.acc) + Robot.GRAVITY
-            self.imu_weak_torso_to_field_transform = Matrix_4x4.from_3x3_and_translation(self.imu_torso_to_field_rotation,self.imu_weak_torso_position)
-            self.imu_weak_head_to_field_transform = self.imu_weak_torso_to_field_transform.multiply(self.body_parts["torso"].transform.invert())
-            self.imu_weak_field_to_head_transform = self.imu_weak_head_to_field_transform.invert()
+            self.imu_weak_torso_to_field_transform.m[0:3,0:3] = self.imu_torso_to_field_rotation.m
+            self.imu_weak_torso_to_field_transform.m[0:3,3] = self.imu_weak_torso_position
+            self.imu_weak_head_to_field_transform.set_product(self.imu_weak_torso_to_field_transform, self.body_parts["torso"].transform.invert(is_rigid=True))
+            self.imu_weak_field_to_head_transform.m[:] = self.imu_weak_head_to_field_transform.m
+            self.imu_weak_field_to_head_transform.invert(True, is_rigid=True)
             p = self.imu_weak_head_to_field_transform(self.rel_cart_CoM_position)
             self.imu_weak_CoM_velocity = (p-self.imu_weak_CoM_position)/Robot.STEPTIME
             self.imu_weak_CoM_position = p
@@ -527,9 +598,10 @@ class Robot():
         '''
         Builds commands string from self.joints_target_speed
         '''
-        j_speed = self.joints_target_speed * self.FIX_EFFECTOR_MASK #Fix symmetry issues 3/4 (effectors)
-        cmd = "".join(f"({self.joints_info[i].effector} {j_speed[i]:.5f})" for i in range(self.no_of_joints)).encode('utf-8')
+        np.multiply(self.joints_target_speed, self.FIX_EFFECTOR_MASK, out=self.command_speeds) #Fix symmetry issues 3/4 (effectors)
+        cmd = self.command_template % tuple(self.command_speeds.tolist())
 
-        self.joints_target_last_speed = self.joints_target_speed           #1. both point to the same array
-        self.joints_target_speed = np.zeros_like(self.joints_target_speed) #2. create new array for joints_target_speed
+        # swap buffers: joints_target_last_speed gets the current speeds, joints_target_speed is reset
+        self.joints_target_last_speed, self.joints_target_speed = self.joints_target_speed, self.joints_target_last_speed
+        self.joints_target_speed.fill(0)
         return cmd
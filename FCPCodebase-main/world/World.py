@@ -1,11 +1,12 @@
-from collections import deque
 from cpp.ball_predictor import ball_predictor
 from cpp.localization import localization
 from logs.Logger import Logger
 from math import atan2, pi
 from math_ops.Matrix_4x4 import Matrix_4x4
+from math_ops.Ring_Buffer import Ring_Buffer
 from world.commons.Draw import Draw
 from world.commons.Other_Robot import Other_Robot
+from world.commons.Player_State_Table import Player_State_Table
 from world.Robot import Robot
 import numpy as np
 
@@ -72,12 +73,17 @@ class World():
         self.play_mode_group = None          # Certain play modes share characteristics, so it makes sense to group them
         self.flags_corners : dict = None     # corner flags, key=(x,y,z), always assume we play on the left side
         self.flags_posts : dict = None       # goal   posts, key=(x,y,z), always assume we play on the left side
+        self.landmarks = np.array([[0,1,*p,0,0,0] for p in World.FLAGS_CORNERS_POS] +
+                                  [[0,0,*p,0,0,0] for p in World.FLAGS_POSTS_POS], float) # corner flags and goal posts seen in last message, one row per landmark: (is visible, is corner, x,y,z, relative spherical pos)
+        self.visible_body_parts_rel_pos = np.zeros((0,3)) # cartesian relative position of all body parts of other robots seen in last message (see Other_Robot.body_parts_rel_rows)
+        self.visible_body_parts_owner = np.zeros(0, int)  # row of players_state (Player_State_Table) of the robot to which each visible body part belongs
+        self.visible_body_parts_type = np.zeros(0, int)   # index of each visible body part in Other_Robot.BODY_PARTS
         self.ball_rel_head_sph_pos = np.zeros(3)     # Ball position relative to head  (spherical coordinates) (m, deg, deg)
         self.ball_rel_head_cart_pos = np.zeros(3)    # Ball position relative to head  (cartesian coordinates) (m)
         self.ball_rel_torso_cart_pos = np.zeros(3)   # Ball position relative to torso (cartesian coordinates) (m)
-        self.ball_rel_torso_cart_pos_history = deque(maxlen=20) # Ball position relative to torso history (queue with up to 20 old positions at intervals of 0.04s, where index 0 is the previous position)
+        self.ball_rel_torso_cart_pos_history = Ring_Buffer(20) # Ball position relative to torso history (up to 20 old positions at intervals of 0.04s, where index 0 is the previous position)
         self.ball_abs_pos = np.zeros(3)              # Ball absolute position (up to date if self.ball_is_visible and self.robot.loc_is_up_to_date) (m)
-        self.ball_abs_pos_history = deque(maxlen=20) # Ball absolute position history (queue with up to 20 old positions at intervals of 0.04s, where index 0 is the previous position)
+        self.ball_abs_pos_history = Ring_Buffer(20)  # Ball absolute position history (up to 20 old positions at intervals of 0.04s, where index 0 is the previous position)
         self.ball_abs_pos_last_update = 0        # World.time_local_ms when self.ball_abs_pos was last updated by vision or radio
         self.ball_abs_vel = np.zeros(3)          # Ball velocity vector based on the last 2 known values of self.ball_abs_pos (m/s) (Warning: noisy if ball is distant, use instead get_ball_abs_vel)
         self.ball_abs_speed = 0                  # Ball scalar speed based on the last 2 known values of self.ball_abs_pos (m/s)    (Warning: noisy if ball is distant, use instead ||get_ball_abs_vel||)
@@ -89,13 +95,15 @@ class World():
         self.ball_2d_pred_pos = np.zeros((1,2))  # prediction of current and future 2D ball positions*
         self.ball_2d_pred_vel = np.zeros((1,2))  # prediction of current and future 2D ball velocities*
         self.ball_2d_pred_spd = np.zeros(1)      # prediction of current and future 2D ball linear speeds*
+        self.ball_2d_pred_last_update = 0        # World.time_local_ms when the prediction was last computed
         # *at intervals of 0.02 s until ball comes to a stop or gets out of bounds (according to prediction)
         self.lines = np.zeros((30,6))            # Position of visible lines, relative to head, start_pos+end_pos (spherical coordinates) (m, deg, deg, m, deg, deg)
         self.line_count = 0                      # Number of visible lines
         self.vision_last_update = 0                                   # World.time_local_ms when last vision update was received
         self.vision_is_up_to_date = False                             # True if the last server message contained vision information
-        self.teammates = [Other_Robot(i, True ) for i in range(1,12)] # List of teammates, ordered by unum
-        self.opponents = [Other_Robot(i, False) for i in range(1,12)] # List of opponents, ordered by unum
+        self.players_state = Player_State_Table()                     # State of all teammates and opponents (structure of arrays)
+        self.teammates = [Other_Robot(i, True,  self.players_state) for i in range(1,12)] # List of teammates, ordered by unum (views of players_state)
+        self.opponents = [Other_Robot(i, False, self.players_state) for i in range(1,12)] # List of opponents, ordered by unum (views of players_state)
         self.teammates[unum-1].is_self = True                         # This teammate is self
         self.draw = Draw(enable_draw, unum, host, 32769)              # Draw object for current player
         self.team_draw = Draw(enable_draw, 0, host, 32769)            # Draw object shared with teammates
@@ -247,10 +255,6 @@ class World():
 
             ball_pos = np.concatenate(( self.ball_rel_head_cart_pos, self.ball_cheat_abs_pos))
             
-            corners_list = [[key in self.flags_corners, 1.0, *key, *self.flags_corners.get(key,(0,0,0))] for key in World.FLAGS_CORNERS_POS]
-            posts_list   = [[key in self.flags_posts  , 0.0, *key, *self.flags_posts.get(  key,(0,0,0))] for key in World.FLAGS_POSTS_POS]
-            all_landmarks = np.array(corners_list + posts_list, float)
-
             # Compute localization
 
             loc = localization.compute(
@@ -260,7 +264,7 @@ class World():
                 self.ball_is_visible,
                 ball_pos,
                 r.cheat_abs_pos,
-                all_landmarks,
+                self.landmarks,
                 self.lines[0:self.line_count])  
 
             r.update_localization(loc, self.time_local_ms)
@@ -274,8 +278,8 @@ class World():
             me.state_ground_area = (r.loc_head_position[:2],0.2) # relevant for localization demo
 
             # Save last ball position to history at every vision cycle (even if not up to date) 
-            self.ball_abs_pos_history.appendleft(self.ball_abs_pos) # from vision or radio
-            self.ball_rel_torso_cart_pos_history.appendleft(self.ball_rel_torso_cart_pos)
+            self.ball_abs_pos_history.append(self.ball_abs_pos, self.time_local_ms / 1000) # from vision or radio
+            self.ball_rel_torso_cart_pos_history.append(self.ball_rel_torso_cart_pos, self.time_local_ms / 1000)
 
             '''
             Get ball position based on vision or play mode
@@ -316,25 +320,16 @@ class World():
                 self.is_ball_abs_pos_from_vision = True
 
             # Velocity decay for teammates and opponents (it is later neutralized if the velocity is updated)
-            for p in self.teammates:
-                p.state_filtered_velocity *= p.vel_decay
-            for p in self.opponents:
-                p.state_filtered_velocity *= p.vel_decay
+            players = self.players_state
+            players.velocity *= players.vel_decay[:,None]
 
             # Update teammates and opponents
             if r.loc_is_up_to_date:
-                for p in self.teammates:
-                    if not p.is_self:                     # if teammate is not self
-                        if p.is_visible:                  # if teammate is visible, execute full update
-                            self.update_other_robot(p)
-                        elif p.state_abs_pos is not None: # otherwise update its horizontal distance (assuming last known position)
-                            p.state_horizontal_dist = np.linalg.norm(r.loc_head_position[:2] - p.state_abs_pos[:2])
-
-                for p in self.opponents:
-                    if p.is_visible:                  # if opponent is visible, execute full update
-                        self.update_other_robot(p)
-                    elif p.state_abs_pos is not None: # otherwise update its horizontal distance (assuming last known position)
-                        p.state_horizontal_dist = np.linalg.norm(r.loc_head_position[:2] - p.state_abs_pos[:2])
+                visible = self.update_visible_robots()
+
+                # update horizontal distance of other robots that are not visible (assuming last known position)
+                rows = np.flatnonzero(~visible & ~players.is_self & (players.abs_pos_dim > 0))
+                players.horizontal_dist[rows] = np.linalg.norm(r.loc_head_position[:2] - players.abs_pos[rows,:2], axis=1)
 
         # Update prediction of ball position/velocity
         if self.play_mode_group != W.MG_OTHER: # not 'play on' nor 'game over', so ball must be stationary
@@ -343,13 +338,8 @@ class World():
             self.ball_2d_pred_spd = np.zeros(1)
 
         elif self.ball_abs_pos_last_update == self.time_local_ms: # make new prediction for new ball position (from vision or radio)
-
-            params = np.array([*self.ball_abs_pos[:2], *np.copy(self.get_ball_abs_vel(6)[:2])], np.float32)
-            pred_ret  = ball_predictor.predict_rolling_ball(params)
-            sample_no = len(pred_ret) // 5 * 2
-            self.ball_2d_pred_pos = pred_ret[:sample_no].reshape(-1, 2)
-            self.ball_2d_pred_vel = pred_ret[sample_no:sample_no*2].reshape(-1, 2)
-            self.ball_2d_pred_spd = pred_ret[sample_no*2:]
+            if self.ball_2d_pred_last_update != self.time_local_ms: # skip if the prediction was already computed (see set_ball_from_radio)
+                self.predict_ball(self.ball_abs_pos[:2], self.get_ball_abs_vel(6)[:2])
 
         elif len(self.ball_2d_pred_pos) > 1: # otherwise, advance to next predicted step, if available 
             self.ball_2d_pred_pos = self.ball_2d_pred_pos[1:]
@@ -359,19 +349,146 @@ class World():
         r.update_imu(self.time_local_ms)      # update imu (must be executed after localization)
 
 
-    def update_other_robot(self,other_robot : Other_Robot):
+    def predict_ball(self, pos_2d, vel_2d):
+        ''' Update prediction of current and future 2D ball positions/velocities/speeds, from current 2D position and velocity '''
+        params = np.array([*pos_2d, *vel_2d], np.float32)
+        pred_ret  = ball_predictor.predict_rolling_ball(params)
+        sample_no = len(pred_ret) // 5 * 2
+        self.ball_2d_pred_pos = pred_ret[:sample_no].reshape(-1, 2)
+        self.ball_2d_pred_vel = pred_ret[sample_no:sample_no*2].reshape(-1, 2)
+        self.ball_2d_pred_spd = pred_ret[sample_no*2:]
+        self.ball_2d_pred_last_update = self.time_local_ms
+
+
+    def set_ball_from_radio(self, pos_2d, vel_2d):
+        '''
+        Set ball position and velocity estimated by teammates (e.g. collaborative consensus), for the current time
+        The prediction (ball_2d_pred_pos, ...) is computed from the estimated velocity, since vision history is not available,
+        so that get_predicted_ball_pos() and get_intersection_point_with_ball() also work when the ball is not visible
+        '''
+        self.ball_abs_pos = np.array([*pos_2d, 0.042]) # assume ball is on ground
+        self.ball_abs_vel = np.array([*vel_2d, 0])
+        self.ball_abs_speed = np.linalg.norm(self.ball_abs_vel)
+        self.ball_abs_pos_last_update = self.time_local_ms
+        self.is_ball_abs_pos_from_vision = False
+        if self.play_mode_group == World.MG_OTHER: # otherwise, World.update assumes that the ball is stationary
+            self.predict_ball(pos_2d, vel_2d)
+
+
+    def update_visible_robots(self):
+        '''
+        Update the state of all visible robots (except self) based on the relative position of visible body parts
+        This is a batched version of update_other_robot(), where all body parts are transformed with a single matmul,
+        and each state variable is computed for all robots with a vectorized operation (see Player_State_Table)
+
+        Returns
+        -------
+        visible : ndarray
+            boolean array with one element per row of players_state, True if the robot was updated
+        '''
+        r = self.robot
+        t = self.players_state
+        HEAD, LLOWERARM, RLOWERARM, LFOOT, RFOOT = range(5) # indices of Other_Robot.BODY_PARTS
+
+        # absolute position of all visible body parts, with a single matmul
+        bps_abs_pos = r.loc_head_to_field_transform( self.visible_body_parts_rel_pos )
+
+        visible = np.zeros(Player_State_Table.SIZE, bool)
+        visible[self.visible_body_parts_owner] = True
+        visible &= ~t.is_self
+        rows = np.flatnonzero(visible)
+        if len(rows) == 0:
+            return visible
+
+        # keep the per-robot dict interface of body parts' absolute positions
+        for row in rows:
+            o = self.teammates[row] if row < 11 else self.opponents[row-11]
+            o.state_body_parts_abs_pos = dict(zip(o.body_parts_cart_rel_pos, bps_abs_pos[o.body_parts_rel_rows]))
+
+        # grid of body parts' absolute positions: (visible robot, body part, xyz), where `has` indicates which body parts were seen
+        idx = np.searchsorted(rows, self.visible_body_parts_owner) # index of visible robot (owners that are self are discarded below)
+        valid = visible[self.visible_body_parts_owner]
+        parts = np.zeros((len(rows), len(Other_Robot.BODY_PARTS), 3))
+        has = np.zeros((len(rows), len(Other_Robot.BODY_PARTS)), bool)
+        parts[idx[valid], self.visible_body_parts_type[valid]] = bps_abs_pos[valid]
+        has[idx[valid], self.visible_body_parts_type[valid]] = True
+
+        # auxiliary variables
+        avg_2d_pt = np.sum(parts[:,:,:2], axis=1) / np.sum(has, axis=1)[:,None] # 2D avg pos of visible body parts
+        head_is_visible = has[:,HEAD]
+        head = parts[:,HEAD]
+
+        # evaluate robot's state (unchanged if head is not visible)
+        t.fallen[rows[head_is_visible]] = head[head_is_visible,2] < 0.3
+
+        # compute velocity (only the x & y components are updated if head is not visible)
+        old_p = t.abs_pos[rows]
+        old_p[:,2] = np.where(t.abs_pos_dim[rows] == 3, old_p[:,2], head[:,2]) # if last position is 2D, we assume that the z coordinate did not change
+        new_p = np.where(head_is_visible[:,None], head, np.column_stack((avg_2d_pt, old_p[:,2]))) # if head is not visible, v.z = 0
+        decay = np.repeat(t.vel_decay[rows,None], 3, axis=1)
+        decay[~head_is_visible,2] = 1 # neutralize decay (except in the z-axis if head is not visible)
+        filtered = t.velocity[rows]
+
+        with np.errstate(divide='ignore', invalid='ignore'): # time difference is zero if the state was updated by radio in this step
+            velocity = (new_p - old_p) / ((self.time_local_ms - t.last_update[rows]) / 1000)[:,None]
+
+            # apply filter (if old position is known, and the robot was not beamed)
+            update = (t.abs_pos_dim[rows] > 0) & (np.linalg.norm(velocity - filtered, axis=1) < 4)
+            filtered /= decay # neutralize decay
+            filtered += t.vel_filter[rows,None] * (velocity-filtered)
+        t.velocity[rows[update]] = filtered[update]
+
+        # compute robot's position (preferably based on head): 3D head position, or 2D avg pos of visible body parts
+        t.abs_pos[rows] = np.where(head_is_visible[:,None], head, np.column_stack((avg_2d_pt, t.abs_pos[rows,2])))
+        t.abs_pos_dim[rows] = np.where(head_is_visible, 3, 2)
+
+        # compute robot's horizontal distance (head distance, or avg. distance of visible body parts)
+        t.horizontal_dist[rows] = np.linalg.norm(r.loc_head_position[:2] - t.abs_pos[rows,:2], axis=1)
+
+        # compute orientation based on pair of lower arms or feet, or average of both
+        has_arms = has[:,LLOWERARM] & has[:,RLOWERARM]
+        has_feet = has[:,LFOOT] & has[:,RFOOT]
+        arms_vec = parts[:,RLOWERARM] - parts[:,LLOWERARM]
+        feet_vec = parts[:,RFOOT] - parts[:,LFOOT]
+        lr_vec = np.where((has_arms & has_feet)[:,None], (arms_vec + feet_vec) / 2, np.where(has_arms[:,None], arms_vec, feet_vec))
+        has_lr = has_arms | has_feet
+        t.orientation[rows[has_lr]] = np.arctan2(lr_vec[has_lr,1], lr_vec[has_lr,0]) * 180 / pi + 90
+
+        # compute projection of player area on ground (circle), we don't need precision if the robot is farther than 4m
+        dist = np.linalg.norm(parts[:,:,:2] - avg_2d_pt[:,None], axis=2)
+        dist[~has] = 0
+        t.ground_center[rows] = avg_2d_pt
+        t.ground_radius[rows] = np.where(t.horizontal_dist[rows] < 4, np.max(dist, axis=1), 0.2)
+        t.has_ground_area[rows] = True
+
+        # update timestamp
+        t.last_update[rows] = self.time_local_ms
+
+        return visible
+
+
+    def update_other_robot(self,other_robot : Other_Robot, bps_abs_pos=None):
         ''' 
         Update other robot state based on the relative position of visible body parts
         (also updated by Radio, with the exception of state_orientation)
+
+        Parameters
+        ----------
+        other_robot : Other_Robot
+            visible robot
+        bps_abs_pos : ndarray
+            absolute position of all rows of World.visible_body_parts_rel_pos (if None, it is computed for this robot only)
         '''
         o = other_robot
         r = self.robot
 
         # update body parts absolute positions
-        o.state_body_parts_abs_pos = o.body_parts_cart_rel_pos.copy()
-        for bp, pos in o.body_parts_cart_rel_pos.items():
-            # Using the IMU could be beneficial if we see other robots but can't self-locate
-            o.state_body_parts_abs_pos[bp] = r.loc_head_to_field_transform( pos, False )
+        # Using the IMU could be beneficial if we see other robots but can't self-locate
+        if bps_abs_pos is None:
+            bps_abs_pos = r.loc_head_to_field_transform( self.visible_body_parts_rel_pos[o.body_parts_rel_rows] )
+        else:
+            bps_abs_pos = bps_abs_pos[o.body_parts_rel_rows]
+        o.state_body_parts_abs_pos = dict(zip(o.body_parts_cart_rel_pos, bps_abs_pos))
 
         # auxiliary variables 
         bps_apos = o.state_body_parts_abs_pos                 # read-only shortcut
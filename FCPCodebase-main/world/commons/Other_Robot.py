@@ -1,4 +1,4 @@
-import numpy as np
+from world.commons.Player_State_Table import Player_State_Table
 
 #Note: When other robot is seen, all previous body part positions are deleted
 # E.g. we see 5 body parts at 0 seconds -> body_parts_cart_rel_pos contains 5 elements
@@ -6,24 +6,139 @@ import numpy as np
 
 
 class Other_Robot():
-    def __init__(self, unum, is_teammate) -> None:
+    BODY_PARTS = ('head','llowerarm','rlowerarm','lfoot','rfoot') # body parts that can be seen (see World.visible_body_parts_type)
+    BODY_PART_INDEX = {name:i for i,name in enumerate(BODY_PARTS)}
+
+    def __init__(self, unum, is_teammate, table:Player_State_Table=None) -> None:
         self.unum = unum                # convenient variable to indicate uniform number (same as other robot's index + 1)
-        self.is_self = False            # convenient flag to indicate if this robot is self
         self.is_teammate = is_teammate  # convenient variable to indicate if this robot is from our team
+        self.table = Player_State_Table() if table is None else table # table where the state variables are stored
+        self.row = unum - 1 if is_teammate else unum + 10             # row of this robot in self.table
         self.is_visible = False # True if this robot was seen in the last message from the server (it doesn't mean we know its absolute location)
         self.body_parts_cart_rel_pos = dict()  # cartesian relative position of the robot's visible body parts
         self.body_parts_sph_rel_pos = dict()   # spherical relative position of the robot's visible body parts
-        self.vel_filter = 0.3                  # EMA filter coefficient applied to self.state_filtered_velocity
-        self.vel_decay  = 0.95                 # velocity decay at every vision cycle (neutralized if velocity is updated)
+        self.body_parts_rel_rows = slice(0,0)  # rows of World.visible_body_parts_rel_pos with the robot's visible body parts (same order as body_parts_cart_rel_pos)
 
 
         # State variables: these are computed when this robot is visible and when the original robot is able to self-locate
-        self.state_fallen = False              # true if the robot is lying down  (updated when head is visible)
-        self.state_last_update = 0             # World.time_local_ms when the state was last updated
-        self.state_horizontal_dist = 0         # horizontal head distance if head is visible, otherwise, average horizontal distance of visible body parts (the distance is updated by vision or radio when state_abs_pos gets a new value, but also when the other player is not visible, by assuming its last position)
-        self.state_abs_pos = None              # 3D head position if head is visible, otherwise, 2D average position of visible body parts, or, 2D radio head position
-        self.state_orientation = 0             # orientation based on pair of lower arms or feet, or average of both (WARNING: may be older than state_last_update)  
-        self.state_ground_area = None          # (pt_2d,radius) projection of player area on ground (circle), not precise if farther than 3m (for performance), useful for obstacle avoidance when it falls
+        # Most state variables are properties that read and write self.table (see below)
         self.state_body_parts_abs_pos = dict() # 3D absolute position of each body part
-        self.state_filtered_velocity = np.zeros(3) # 3D filtered velocity (m/s) (if the head is not visible, the 2D part is updated and v.z decays)
-       
\ No newline at end of file
+
+
+    #---------------------------------------------- Views of self.table
+
+    @property
+    def is_self(self) -> bool:
+        ''' convenient flag to indicate if this robot is self '''
+        return bool(self.table.is_self[self.row])
+
+    @is_self.setter
+    def is_self(self, value):
+        self.table.is_self[self.row] = value
+
+    @property
+    def vel_filter(self) -> float:
+        ''' EMA filter coefficient applied to self.state_filtered_velocity '''
+        return float(self.table.vel_filter[self.row])
+
+    @vel_filter.setter
+    def vel_filter(self, value):
+        self.table.vel_filter[self.row] = value
+
+    @property
+    def vel_decay(self) -> float:
+        ''' velocity decay at every vision cycle (neutralized if velocity is updated) '''
+        return float(self.table.vel_decay[self.row])
+
+    @vel_decay.setter
+    def vel_decay(self, value):
+        self.table.vel_decay[self.row] = value
+
+    @property
+    def state_fallen(self) -> bool:
+        ''' true if the robot is lying down  (updated when head is visible) '''
+        return bool(self.table.fallen[self.row])
+
+    @state_fallen.setter
+    def state_fallen(self, value):
+        self.table.fallen[self.row] = value
+
+    @property
+    def state_last_update(self) -> int:
+        ''' World.time_local_ms when the state was last updated '''
+        return int(self.table.last_update[self.row])
+
+    @state_last_update.setter
+    def state_last_update(self, value):
+        self.table.last_update[self.row] = value
+
+    @property
+    def state_horizontal_dist(self) -> float:
+        '''
+        horizontal head distance if head is visible, otherwise, average horizontal distance of visible body parts
+        (the distance is updated by vision or radio when state_abs_pos gets a new value, but also when the other player is not visible, by assuming its last position)
+        '''
+        return float(self.table.horizontal_dist[self.row])
+
+    @state_horizontal_dist.setter
+    def state_horizontal_dist(self, value):
+        self.table.horizontal_dist[self.row] = value
+
+    @property
+    def state_abs_pos(self):
+        '''
+        3D head position if head is visible, otherwise, 2D average position of visible body parts, or, 2D radio head position
+        (None if unknown)
+        WARNING: live view of this robot's row in the Player_State_Table, changed by later updates (copy it to keep the value)
+        '''
+        dim = self.table.abs_pos_dim[self.row]
+        return None if dim == 0 else self.table.abs_pos[self.row,:dim]
+
+    @state_abs_pos.setter
+    def state_abs_pos(self, value):
+        if value is None:
+            self.table.abs_pos_dim[self.row] = 0
+        else:
+            self.table.abs_pos[self.row,:len(value)] = value
+            self.table.abs_pos_dim[self.row] = len(value)
+
+    @property
+    def state_orientation(self) -> float:
+        ''' orientation based on pair of lower arms or feet, or average of both (WARNING: may be older than state_last_update) '''
+        return float(self.table.orientation[self.row])
+
+    @state_orientation.setter
+    def state_orientation(self, value):
+        self.table.orientation[self.row] = value
+
+    @property
+    def state_ground_area(self):
+        '''
+        (pt_2d,radius) projection of player area on ground (circle), not precise if farther than 3m (for performance),
+        useful for obstacle avoidance when it falls (None if unknown)
+        WARNING: pt_2d is a live view of this robot's row in the Player_State_Table, changed by later updates (copy it to keep the value)
+        '''
+        if not self.table.has_ground_area[self.row]:
+            return None
+        return (self.table.ground_center[self.row], float(self.table.ground_radius[self.row]))
+
+    @state_ground_area.setter
+    def state_ground_area(self, value):
+        if value is None:
+            self.table.has_ground_area[self.row] = False
+        else:
+            self.table.ground_center[self.row] = value[0]
+            self.table.ground_radius[self.row] = value[1]
+            self.table.has_ground_area[self.row] = True
+
+    @property
+    def state_filtered_velocity(self):
+        '''
+        3D filtered velocity (m/s) (if the head is not visible, the 2D part is updated and v.z decays)
+        WARNING: live view of this robot's row in the Player_State_Table, changed by later updates (copy it to keep the value)
+        '''
+        return self.table.velocity[self.row]
+
+    @state_filtered_velocity.setter
+    def state_filtered_velocity(self, value):
+        self.table.velocity[self.row] = value
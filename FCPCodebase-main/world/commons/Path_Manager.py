@@ -85,46 +85,48 @@ class Path_Manager():
         ball_2d = w.ball_abs_pos[:2]
         obstacles = []
 
-        # 'comparator' is a variable local to the lambda, which captures the current value of (w.time_local_ms - max_age)
-        check_age = lambda last_update, comparator = w.time_local_ms - max_age : last_update > 0 and last_update >= comparator
-        
+        # recently seen close players (teammates and opponents), see Player_State_Table
+        players = w.players_state
+        is_close = players.get_recent(w.time_local_ms, max_age) & (players.horizontal_dist < max_distance)
+
         #---------------------------------------------- Get recently seen close teammates
         if include_teammates:
             soft_radius = 1.1 if mode == Path_Manager.MODE_DRIBBLE else 0.6 # soft radius: repulsive force is max at center and fades
 
-            def get_hard_radius(t):
-                if t.unum in priority_unums:
-                    return 1.0 # extra distance for priority roles
-                else:
-                    return t.state_ground_area[1]+0.2
+            rows = np.flatnonzero(is_close & players.is_teammate & ~players.is_self)
+            is_priority = np.isin(players.unum[rows], priority_unums)
 
             # Get close teammates (center, hard radius, soft radius, force)
-            obstacles.extend( (*t.state_ground_area[0],
-                            get_hard_radius(t),
-                            1.5 if t.unum in priority_unums else soft_radius, 
-                            1.0) # repulsive force 
-            for t in w.teammates if not t.is_self and check_age(t.state_last_update) and t.state_horizontal_dist < max_distance)
+            obstacles.extend( map(tuple, np.column_stack((
+                players.ground_center[rows],
+                np.where(is_priority, 1.0, players.ground_radius[rows]+0.2), # extra distance for priority roles
+                np.where(is_priority, 1.5, soft_radius),
+                np.ones(len(rows)) # repulsive force
+            )).tolist()))
 
         #---------------------------------------------- Get recently seen close opponents
         if include_opponents: 
 
+            rows = np.flatnonzero(is_close & ~players.is_teammate)
+
             # soft radius: repulsive force is max at center and fades
             if mode == Path_Manager.MODE_AGGRESSIVE:
                 soft_radius = 0.6
-                hard_radius = lambda o : 0.2
+                hard_radius = np.full(len(rows), 0.2)
             elif mode == Path_Manager.MODE_DRIBBLE:
                 soft_radius = 2.3
-                hard_radius = lambda o : o.state_ground_area[1]+0.9
+                hard_radius = players.ground_radius[rows]+0.9
             else:
                 soft_radius = 1.0
-                hard_radius = lambda o : o.state_ground_area[1]+0.2
+                hard_radius = players.ground_radius[rows]+0.2
 
             # Get close opponents (center, hard radius, soft radius, force)
-            obstacles.extend( (*o.state_ground_area[0],
-                            hard_radius(o),
-                            soft_radius,
-                            1.5 if o.unum == 1 else 1.0) # repulsive force (extra for their GK)
-            for o in w.opponents if o.state_last_update > 0 and w.time_local_ms - o.state_last_update <= max_age and o.state_horizontal_dist < max_distance)
+            obstacles.extend( map(tuple, np.column_stack((
+                players.ground_center[rows],
+                hard_radius,
+                np.full(len(rows), soft_radius),
+                np.where(players.unum[rows] == 1, 1.5, 1.0) # repulsive force (extra for their GK)
+            )).tolist()))
 
         #---------------------------------------------- Get play mode restrictions
         if include_play_mode_restrictions:
@@ -0,0 +1,43 @@
+import numpy as np
+
+
+class Player_State_Table():
+    '''
+    State of all teammates and opponents as a structure of arrays, where each row represents a player:
+    rows 0-10 are teammates with unum 1-11, and rows 11-21 are opponents with unum 1-11
+
+    Each Other_Robot object is a view of its row (e.g. Other_Robot.state_abs_pos reads and writes abs_pos[row]),
+    so that queries about all players (e.g. distance to ball) can be computed with a single vectorized operation.
+    '''
+    SIZE = 22
+    TEAMMATES = slice(0,11)
+    OPPONENTS = slice(11,22)
+
+    def __init__(self) -> None:
+        n = Player_State_Table.SIZE
+        self.unum = np.tile(np.arange(1,12), 2)            # uniform number of each row
+        self.is_teammate = np.arange(n) < 11               # True if row represents a teammate
+        self.is_self = np.zeros(n, bool)                   # True if row represents self
+        self.abs_pos = np.zeros((n,3))                     # see Other_Robot.state_abs_pos (only the first abs_pos_dim columns are valid)
+        self.abs_pos_dim = np.zeros(n, np.int8)            # number of valid coordinates in abs_pos: 0 (unknown position), 2 or 3
+        self.velocity = np.zeros((n,3))                    # see Other_Robot.state_filtered_velocity
+        self.last_update = np.zeros(n, np.int64)           # see Other_Robot.state_last_update
+        self.fallen = np.zeros(n, bool)                    # see Other_Robot.state_fallen
+        self.horizontal_dist = np.zeros(n)                 # see Other_Robot.state_horizontal_dist
+        self.orientation = np.zeros(n)                     # see Other_Robot.state_orientation
+        self.ground_center = np.zeros((n,2))               # see Other_Robot.state_ground_area (center)
+        self.ground_radius = np.zeros(n)                   # see Other_Robot.state_ground_area (radius)
+        self.has_ground_area = np.zeros(n, bool)           # False if state_ground_area is None
+        self.vel_filter = np.full(n, 0.3)                  # see Other_Robot.vel_filter
+        self.vel_decay = np.full(n, 0.95)                  # see Other_Robot.vel_decay
+
+
+    def get_sq_dist_2d(self, pt_2d):
+        ''' Squared horizontal distance between the position of each player and `pt_2d` (meaningless for unknown positions) '''
+        diff = self.abs_pos[:,:2] - pt_2d
+        return np.einsum("ij,ij->i", diff, diff)
+
+
+    def get_recent(self, time_local_ms:int, max_age:float):
+        ''' Players whose state was updated in the last `max_age` milliseconds (excluding players that were never seen) '''
+        return (self.last_update > 0) & (self.last_update >= time_local_ms - max_age)